@@ -0,0 +1,376 @@
+"""
+Prueba de carga de la API completa: siembra un volumen realista de datos
+(usuarios × tareas × sesiones de foco, más notas) y recorre todas las rutas
+de `main.py` con clientes HTTP concurrentes (httpx sobre ASGI, en proceso).
+Por ruta informa p50/p95/p99, peticiones por segundo y RPCs / documentos
+leídos de Firestore por petición (de la cabecera Server-Timing).
+
+Por defecto usa el backend en memoria; para el emulador de Firestore:
+TASKO_STORAGE=firestore FIRESTORE_EMULATOR_HOST=localhost:8080.
+
+    python -m benchmarks.loadtest                                  # preset small
+    python -m benchmarks.loadtest --preset medium --concurrency 50
+    python -m benchmarks.loadtest --users 1000 --tasks 200 --focus 50   # 10M sesiones: emulador
+    python -m benchmarks.loadtest --only focus --requests 500
+
+Línea base (benchmarks/baseline.json, generada con el preset small):
+
+    python -m benchmarks.loadtest --save-baseline benchmarks/baseline.json
+    python -m benchmarks.loadtest --baseline benchmarks/baseline.json   # exit 1 si hay regresión
+
+Solo las RPCs y los documentos leídos por petición son deterministas, y son
+lo único que decide el exit code. La latencia depende de la máquina y de la
+carga del momento: se informa como aviso, y con --gate-latency también falla
+si el p95 supera a la base en --latency-tolerance y en --latency-floor-ms.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+os.environ.setdefault("TASKO_STORAGE", "memory")
+# scrypt con coste bajo: sembrar miles de usuarios con el de producción tarda minutos
+os.environ.setdefault("TASKO_SCRYPT_N", "1024")
+
+import logging  # noqa: E402
+
+import httpx  # noqa: E402
+
+import crud  # noqa: E402
+import database  # noqa: E402
+import main  # noqa: E402
+from models import TaskCreate, User  # noqa: E402
+
+
+PRESETS = {
+    #          usuarios, tareas/usuario, sesiones/tarea, notas/usuario
+    "small":  (20, 50, 5, 10),
+    "medium": (200, 100, 10, 20),
+    "large":  (1000, 200, 50, 50),
+}
+
+WORDS = ("reunión", "informe", "cliente", "proyecto", "revisión", "factura", "diseño", "entrega",
+         "presupuesto", "llamada", "equipo", "campaña", "contrato", "examen", "viaje", "compra")
+TAGS = ("trabajo", "personal", "urgente", "estudio", "casa", "salud")
+STATUSES = ("Pendiente", "En progreso", "Completada")
+PRIORITIES = ("Baja", "Media", "Alta")
+PASSWORD = "benchmark"
+
+_SERVER_TIMING = re.compile(r'desc="(\d+) rpcs, (\d+) docs"')
+
+
+# ——— Siembra ———
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.sample(WORDS, 3)).capitalize()
+
+def _due(rng: random.Random) -> str:
+    return (datetime.utcnow() + timedelta(days=rng.randint(-30, 60))).strftime("%d-%m-%Y")
+
+def _task_payload(rng: random.Random, user_id: str) -> dict:
+    return {
+        "title": _title(rng),
+        "description": " ".join(rng.choices(WORDS, k=12)),
+        "due_date": _due(rng),
+        "user_id": user_id,
+        "status": rng.choice(STATUSES),
+        "priority": rng.choice(PRIORITIES),
+        "tags": rng.sample(TAGS, rng.randint(0, 2)),
+        "steps": [{"description": w} for w in rng.sample(WORDS, rng.randint(0, 3))],
+    }
+
+async def seed(rng: random.Random, users: int, tasks: int, focus: int, notes: int, victims: int) -> dict:
+    """
+    Siembra los datos y devuelve los ids que usan los escenarios. Las
+    sesiones de foco se escriben directamente (repartidas en 90 días, un 5%
+    sin user_id como los registros antiguos) y los totales y buckets se
+    derivan con recompute_focus_rollups / rebuild_focus_buckets.
+    """
+    db = database.get_db()
+    ctx: Dict[str, list] = {"users": [], "emails": [], "tasks": [], "task_owner": {}, "focus": [], "notes": []}
+
+    for i in range(users):
+        ctx["emails"].append(f"user{i}@bench.tasko.dev")
+        ctx["users"].append((await crud.create_user(User(email=ctx["emails"][-1], password=PASSWORD)))["id"])
+    ctx["victim_users"] = [
+        (await crud.create_user(User(email=f"victim{i}@bench.tasko.dev", password=PASSWORD)))["id"] for i in range(victims)
+    ]
+
+    payloads = [_task_payload(rng, uid) for uid in ctx["users"] for _ in range(tasks)]
+    payloads += [_task_payload(rng, rng.choice(ctx["users"])) for _ in range(victims)]
+    ids: List[str] = []
+    for i in range(0, len(payloads), crud.MAX_BATCH_ITEMS):
+        chunk = payloads[i:i + crud.MAX_BATCH_ITEMS]
+        result = await crud.create_tasks_batch([TaskCreate(**p) for p in chunk])
+        ids += [r["id"] for r in result["results"]]
+    ctx["tasks"], ctx["victim_tasks"] = ids[:len(ids) - victims], ids[len(ids) - victims:]
+    ctx["task_owner"] = {tid: p["user_id"] for tid, p in zip(ids, payloads)}
+    task_tags = {tid: p["tags"] for tid, p in zip(ids, payloads)}
+
+    now = datetime.utcnow()
+    writes = []
+    for tid in ctx["tasks"]:
+        for _ in range(focus):
+            ref = database.collection("focus_times").document()
+            legacy = rng.random() < 0.05
+            writes.append((len(writes), [("set", ref, {
+                "task_id": tid,
+                "user_id": None if legacy else ctx["task_owner"][tid],
+                "minutes": rng.randint(5, 90),
+                "tags": None if legacy else task_tags[tid],
+                "created_at": now - timedelta(days=rng.randint(0, 89), minutes=rng.randint(0, 1440)),
+                "updated_at": None,
+            })]))
+            ctx["focus"].append(ref.id)
+    await crud._commit_items(writes)
+    await crud.recompute_focus_rollups()
+    await crud.rebuild_focus_buckets()
+
+    for uid in ctx["users"]:
+        for _ in range(notes):
+            note = await crud.create_note(uid, _title(rng), " ".join(rng.choices(WORDS, k=20)), rng.sample(TAGS, 1))
+            ctx["notes"].append(note["id"])
+    ctx["victim_notes"] = [
+        (await crud.create_note(rng.choice(ctx["users"]), "Borrar", "texto"))["id"] for _ in range(victims)
+    ]
+
+    if hasattr(db, "reset_stats"):
+        db.reset_stats()
+    return ctx
+
+
+# ——— Escenarios: (nombre, grupo, generador de la petición) ———
+#
+# El generador recibe (ctx, i, rng) y devuelve (método, url, kwargs de httpx).
+
+Request = Tuple[str, str, dict]
+
+def _pick(ctx, key, rng):
+    return rng.choice(ctx[key])
+
+def _victim(ctx, key, i):
+    return ctx[key][i % len(ctx[key])]
+
+def _today(delta: int = 0) -> str:
+    return (datetime.utcnow() + timedelta(days=delta)).strftime("%d-%m-%Y")
+
+SCENARIOS: List[Tuple[str, str, Callable[[dict, int, random.Random], Request]]] = [
+    ("GET /",                                 "misc",  lambda c, i, r: ("GET", "/", {})),
+    ("GET /simular-tiempos",                  "misc",  lambda c, i, r: ("GET", "/simular-tiempos", {})),
+    ("GET /metrics",                          "misc",  lambda c, i, r: ("GET", "/metrics", {})),
+    ("GET /debug/collections",                "misc",  lambda c, i, r: ("GET", "/debug/collections", {})),
+    ("GET /debug/sample",                     "misc",  lambda c, i, r: ("GET", "/debug/sample", {})),
+    ("GET /debug/cache",                      "misc",  lambda c, i, r: ("GET", "/debug/cache", {})),
+    ("GET /debug/search",                     "misc",  lambda c, i, r: ("GET", "/debug/search", {})),
+    ("GET /debug/mirror",                     "misc",  lambda c, i, r: ("GET", "/debug/mirror", {})),
+
+    ("GET /users?limit",                      "users", lambda c, i, r: ("GET", "/users", {"params": {"limit": 50}})),
+    ("GET /users/{id}",                       "users", lambda c, i, r: ("GET", f"/users/{_pick(c, 'users', r)}", {})),
+    ("GET /users/{id}/dashboard",             "users", lambda c, i, r: ("GET", f"/users/{_pick(c, 'users', r)}/dashboard", {})),
+    ("POST /login",                           "users", lambda c, i, r: ("POST", "/login", {"json": {"email": _pick(c, "emails", r), "password": PASSWORD}})),
+    ("POST /users",                           "users", lambda c, i, r: ("POST", "/users", {"json": {"email": f"new{i}.{r.random():.6f}@bench.tasko.dev", "password": PASSWORD}})),
+    ("PUT /users/{id}",                       "users", lambda c, i, r: ("PUT", f"/users/{_victim(c, 'victim_users', i)}", {"json": {"email": f"moved{i}.{r.random():.6f}@bench.tasko.dev", "password": PASSWORD}})),
+
+    ("GET /tasks?limit",                      "tasks", lambda c, i, r: ("GET", "/tasks", {"params": {"limit": 50}})),
+    ("GET /tasks?status&limit",               "tasks", lambda c, i, r: ("GET", "/tasks", {"params": {"status": r.choice(STATUSES), "limit": 50}})),
+    ("GET /tasks/{id}",                       "tasks", lambda c, i, r: ("GET", f"/tasks/{_pick(c, 'tasks', r)}", {})),
+    ("GET /tasks/user/{id}",                  "tasks", lambda c, i, r: ("GET", f"/tasks/user/{_pick(c, 'users', r)}", {})),
+    ("GET /tasks/user/{id}?filters",          "tasks", lambda c, i, r: ("GET", f"/tasks/user/{_pick(c, 'users', r)}", {"params": {"priority": r.choice(PRIORITIES), "order_by": "due_date"}})),
+    ("GET /tasks/user/{id}/due",              "tasks", lambda c, i, r: ("GET", f"/tasks/user/{_pick(c, 'users', r)}/due", {"params": {"after": _today(), "before": _today(7)}})),
+    ("POST /tasks",                           "tasks", lambda c, i, r: ("POST", "/tasks", {"json": _task_payload(r, _pick(c, "users", r))})),
+    ("POST /tasks/batch",                     "tasks", lambda c, i, r: ("POST", "/tasks/batch", {"json": [_task_payload(r, _pick(c, "users", r)) for _ in range(10)]})),
+    ("PUT /tasks/batch",                      "tasks", lambda c, i, r: ("PUT", "/tasks/batch", {"json": [
+        {**_task_payload(r, c["task_owner"][t]), "id": t} for t in r.sample(c["tasks"], 10)]})),
+    ("PUT /tasks/{id}",                       "tasks", lambda c, i, r: ("PUT", f"/tasks/{(t := _pick(c, 'tasks', r))}", {"json": _task_payload(r, c["task_owner"][t])})),
+    ("PATCH /tasks/{id}",                     "tasks", lambda c, i, r: ("PATCH", f"/tasks/{_pick(c, 'tasks', r)}", {"json": {"completed": r.random() < 0.5, "add_tags": [r.choice(TAGS)]}})),
+    ("DELETE /tasks/{id}",                    "tasks", lambda c, i, r: ("DELETE", f"/tasks/{_victim(c, 'victim_tasks', i)}", {})),
+
+    ("GET /search",                           "notes", lambda c, i, r: ("GET", "/search", {"params": {"user_id": _pick(c, "users", r), "q": r.choice(WORDS)[:4]}})),
+    ("GET /notes?limit",                      "notes", lambda c, i, r: ("GET", "/notes", {"params": {"limit": 50}})),
+    ("GET /notes/user/{id}",                  "notes", lambda c, i, r: ("GET", f"/notes/user/{_pick(c, 'users', r)}", {})),
+    ("GET /notes/{id}",                       "notes", lambda c, i, r: ("GET", f"/notes/{_pick(c, 'notes', r)}", {})),
+    ("POST /notes",                           "notes", lambda c, i, r: ("POST", "/notes", {"json": {"user_id": _pick(c, "users", r), "title": _title(r), "texto": "texto", "tags": [r.choice(TAGS)]}})),
+    ("PUT /notes/{id}",                       "notes", lambda c, i, r: ("PUT", f"/notes/{_pick(c, 'notes', r)}", {"json": {"user_id": _pick(c, "users", r), "title": _title(r), "texto": "editado"}})),
+    ("DELETE /notes/{id}",                    "notes", lambda c, i, r: ("DELETE", f"/notes/{_victim(c, 'victim_notes', i)}", {})),
+
+    ("GET /tasks/{id}/focus-times",           "focus", lambda c, i, r: ("GET", f"/tasks/{_pick(c, 'tasks', r)}/focus-times", {})),
+    ("GET /focus-times/summary/{id}",         "focus", lambda c, i, r: ("GET", f"/focus-times/summary/{_pick(c, 'users', r)}", {})),
+    ("GET /focus-times/stats/{id}",           "focus", lambda c, i, r: ("GET", f"/focus-times/stats/{_pick(c, 'users', r)}", {"params": {"from": _today(-89), "bucket": "week", "group_by": "tag"}})),
+    ("POST /focus-times",                     "focus", lambda c, i, r: ("POST", "/focus-times", {"json": {"task_id": _pick(c, "tasks", r), "minutes": r.randint(5, 60)}})),
+    ("POST /focus-times/batch",               "focus", lambda c, i, r: ("POST", "/focus-times/batch", {"json": [{"task_id": _pick(c, "tasks", r), "minutes": 10} for _ in range(10)]})),
+    ("PUT /focus-times/{id}",                 "focus", lambda c, i, r: ("PUT", f"/focus-times/{_pick(c, 'focus', r)}", {"json": {"minutes": r.randint(5, 90)}})),
+
+    # Al final: borra usuarios de reserva (y su índice de email)
+    ("DELETE /users/{id}",                    "users", lambda c, i, r: ("DELETE", f"/users/{_victim(c, 'victim_users', i)}", {})),
+]
+
+
+# ——— Ejecución ———
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+async def run_scenario(client: httpx.AsyncClient, ctx: dict, build, requests: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    plan = [build(ctx, i, rng) for i in range(requests)]
+    latencies: List[float] = []
+    rpcs: List[int] = []
+    docs: List[int] = []
+    errors: Dict[int, int] = {}
+    queue = iter(plan)
+
+    async def worker():
+        for method, url, kwargs in queue:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+            match = _SERVER_TIMING.search(response.headers.get("server-timing", ""))
+            if match:
+                rpcs.append(int(match.group(1)))
+                docs.append(int(match.group(2)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p95_ms": round(_percentile(latencies, 95), 3),
+        "p99_ms": round(_percentile(latencies, 99), 3),
+        "rps": round(requests / elapsed, 1),
+        "rpcs_per_request": round(statistics.fmean(rpcs), 3) if rpcs else None,
+        "docs_per_request": round(statistics.fmean(docs), 3) if docs else None,
+    }
+
+
+def compare(results: dict, baseline: dict, rpc_tolerance: float, latency_tolerance: float,
+            latency_floor_ms: float) -> Tuple[List[str], List[str]]:
+    """
+    Regresiones respecto a la línea base: (RPCs y documentos por petición,
+    p95). Las primeras son deterministas; las de latencia son orientativas.
+    """
+    counts, latency = [], []
+    for name, base in baseline.get("scenarios", {}).items():
+        current = results["scenarios"].get(name)
+        if current is None:
+            continue
+        for key, label in (("rpcs_per_request", "RPCs"), ("docs_per_request", "docs")):
+            if base.get(key) is not None and current.get(key) is not None:
+                limit = base[key] * (1 + rpc_tolerance) + 0.05
+                if current[key] > limit:
+                    counts.append(f"{name}: {current[key]} {label}/petición (base {base[key]})")
+        # Relativo y con un suelo absoluto: en rutas de pocos ms, el ruido del
+        # planificador o de otro proceso ya duplica el p95 sin cambiar el código
+        limit = max(base["p95_ms"] * (1 + latency_tolerance), base["p95_ms"] + latency_floor_ms)
+        if current["p95_ms"] > limit:
+            latency.append(f"{name}: p95 {current['p95_ms']} ms (base {base['p95_ms']} ms)")
+    return counts, latency
+
+
+async def amain(args) -> int:
+    users, tasks, focus, notes = PRESETS[args.preset]
+    users, tasks = args.users or users, args.tasks or tasks
+    focus = args.focus if args.focus is not None else focus
+    notes = args.notes if args.notes is not None else notes
+    scenarios = [s for s in SCENARIOS if not args.only or s[1] in args.only]
+    victims = args.requests
+
+    # Sin los logs INFO de la API ni de httpx por cada petición
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    random.seed(args.seed)  # ids del backend en memoria
+    rng = random.Random(args.seed)
+    print(f"🌱 Sembrando {users} usuarios × {tasks} tareas × {focus} sesiones, {notes} notas/usuario "
+          f"({database.storage_backend()})...")
+    start = time.perf_counter()
+    ctx = await seed(rng, users, tasks, focus, notes, victims)
+    print(f"   listo en {time.perf_counter() - start:.1f} s\n")
+
+    results = {
+        "meta": {
+            "preset": args.preset, "users": users, "tasks_per_user": tasks, "focus_per_task": focus,
+            "notes_per_user": notes, "requests": args.requests, "concurrency": args.concurrency,
+            "backend": database.storage_backend(), "python": platform.python_version(),
+        },
+        "scenarios": {},
+    }
+    print(f"{'ruta':<34}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'rpcs':>7}{'docs':>8}  errores")
+    total_requests, total_start = 0, time.perf_counter()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        for index, (name, _, build) in enumerate(scenarios):
+            r = await run_scenario(client, ctx, build, args.requests, args.concurrency, args.seed + index)
+            results["scenarios"][name] = r
+            total_requests += r["requests"]
+            fmt = lambda v, w: f"{v:>{w}}" if v is not None else f"{'-':>{w}}"  # noqa: E731
+            print(f"{name:<34}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['rps']:>9.0f}"
+                  f"{fmt(r['rpcs_per_request'], 7)}{fmt(r['docs_per_request'], 8)}  {r['errors'] or ''}")
+    elapsed = time.perf_counter() - total_start
+    results["total"] = {"requests": total_requests, "seconds": round(elapsed, 2), "rps": round(total_requests / elapsed, 1)}
+    print(f"\nTotal: {total_requests} peticiones en {elapsed:.1f} s ({total_requests / elapsed:.0f} req/s)")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"💾 Línea base guardada en {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("preset") != args.preset:
+            print(f"⚠️  La línea base es del preset {baseline.get('meta', {}).get('preset')!r}, no {args.preset!r}")
+        problems, slower = compare(results, baseline, args.rpc_tolerance, args.latency_tolerance, args.latency_floor_ms)
+        if slower:
+            print(f"{'❌' if args.gate_latency else '⚠️ '} p95 por encima de la línea base"
+                  f"{'' if args.gate_latency else ' (orientativo; --gate-latency para fallar)'}:")
+            for p in slower:
+                print(f"   {p}")
+            if args.gate_latency:
+                problems += slower
+        if problems:
+            print("❌ Regresiones respecto a la línea base:")
+            for p in problems:
+                print(f"   {p}")
+            return 1
+        print("✅ Sin regresiones respecto a la línea base")
+    return 0
+
+
+def main_cli() -> Optional[int]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small", help="Volumen de datos")
+    parser.add_argument("--users", type=int, help="Usuarios (sustituye al preset)")
+    parser.add_argument("--tasks", type=int, help="Tareas por usuario")
+    parser.add_argument("--focus", type=int, help="Sesiones de foco por tarea")
+    parser.add_argument("--notes", type=int, help="Notas por usuario")
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por ruta")
+    parser.add_argument("--concurrency", type=int, default=10, help="Clientes concurrentes")
+    parser.add_argument("--only", nargs="+", choices=["misc", "users", "tasks", "notes", "focus"], help="Solo estos grupos de rutas")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", help="Comparar con esta línea base (exit 1 si hay regresión)")
+    parser.add_argument("--save-baseline", help="Guardar los resultados como línea base")
+    parser.add_argument("--rpc-tolerance", type=float, default=0.1, help="Aumento de RPCs y docs/petición admitido (0.1 = +10%%)")
+    parser.add_argument("--gate-latency", action="store_true", help="Fallar también si el p95 empeora (por defecto solo avisa)")
+    parser.add_argument("--latency-tolerance", type=float, default=1.0, help="Aumento de p95 admitido (1.0 = +100%%)")
+    parser.add_argument("--latency-floor-ms", type=float, default=25.0, help="Aumento de p95 siempre admitido, en ms")
+    return asyncio.run(amain(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,93 @@
+"""
+CPU por escritura de la normalización de tareas (sin E/S):
+
+  - antes:  el bloque que se repetía en create_task/update_task (copiado
+            aquí tal cual como referencia)
+  - ahora:  crud._build_task_data (etapa única con tablas de búsqueda)
+
+    python -m benchmarks.normalization
+    python -m benchmarks.normalization --writes 50000
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+os.environ.setdefault("TASKO_STORAGE", "memory")
+
+import crud  # noqa: E402
+from models import TaskCreate  # noqa: E402
+
+
+def _legacy_normalize_status(status: str) -> str:
+    sl = status.lower()
+    if sl in ["pendiente", "pendientes"]:
+        return "Pendiente"
+    if "en progreso" in sl:
+        return "En progreso"
+    if sl in ["completa", "completada"]:
+        return "Completada"
+    return "Pendiente"
+
+def _legacy_normalize_priority(priority: str) -> str:
+    pl = priority.capitalize()
+    return pl if pl in crud.VALID_PRIORITIES else "Media"
+
+def _legacy_build(task: TaskCreate) -> dict:
+    data = task.dict()
+    data["status"] = _legacy_normalize_status(data.get("status", "Pendiente"))
+    if data["status"] not in crud.VALID_STATUSES:
+        raise ValueError("estado")
+    data["priority"] = _legacy_normalize_priority(data.get("priority", "Media"))
+    if data["priority"] not in crud.VALID_PRIORITIES:
+        raise ValueError("prioridad")
+    tags = data.get("tags")
+    data["tags"] = tags if isinstance(tags, list) else []
+    steps = data.get("steps")
+    normalized_steps = []
+    if isinstance(steps, list):
+        for s in steps:
+            if isinstance(s, dict):
+                desc = s.get("description")
+                if desc:
+                    normalized_steps.append({"description": desc, "completed": bool(s.get("completed", False))})
+            else:
+                desc = getattr(s, "description", None)
+                comp = getattr(s, "completed", False)
+                if desc:
+                    normalized_steps.append({"description": desc, "completed": bool(comp)})
+    data["steps"] = normalized_steps
+    datetime.strptime(data["due_date"], "%d-%m-%Y")
+    return data
+
+
+def _per_write(fn, tasks) -> float:
+    start = time.perf_counter()
+    for t in tasks:
+        fn(t)
+    return (time.perf_counter() - start) / len(tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writes", type=int, default=20_000)
+    args = parser.parse_args()
+
+    tasks = [
+        TaskCreate(
+            title=f"Tarea {i}", due_date="05-03-2030", user_id="u", status="En progreso", priority="Alta",
+            tags=["a", "b"], steps=[{"description": f"Paso {j}"} for j in range(5)],
+        )
+        for i in range(args.writes)
+    ]
+
+    print(f"{'etapa':<10}{'µs/escritura':>14}")
+    before = _per_write(_legacy_build, tasks)
+    after = _per_write(crud._build_task_data, tasks)
+    print(f"{'antes':<10}{before * 1e6:>14.2f}")
+    print(f"{'ahora':<10}{after * 1e6:>14.2f}")
+    print(f"aceleración: x{before / after:.2f}")
+
+
+if __name__ == "__main__":
+    main()
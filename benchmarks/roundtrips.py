@@ -0,0 +1,51 @@
+"""
+Cuenta las RPCs, lecturas y escrituras de cada mutación de `crud` contra
+el backend en memoria (mismo recuento que facturaría Firestore).
+
+    python -m benchmarks.roundtrips
+"""
+import asyncio
+import os
+
+os.environ.setdefault("TASKO_STORAGE", "memory")
+
+import crud  # noqa: E402
+import database  # noqa: E402
+from models import FocusTimeCreate, FocusTimeUpdate, TaskCreate, TaskPartialUpdate, TaskUpdate, User  # noqa: E402
+
+
+def _task(user_id: str, title: str = "Tarea") -> dict:
+    return {"title": title, "due_date": "01-02-2030", "user_id": user_id}
+
+
+async def main():
+    db = database.get_db()
+
+    user = await crud.create_user(User(email="bench@tasko.dev", password="secreto"))
+    uid = user["id"]
+    task = await crud.create_task(TaskCreate(**_task(uid)))
+    victim = await crud.create_task(TaskCreate(**_task(uid, "Borrar")))
+    note = await crud.create_note(uid, "Nota", "texto")
+    spare = await crud.create_note(uid, "Borrar", "texto")
+    focus = await crud.create_focus_time(FocusTimeCreate(task_id=task["id"], minutes=10))
+
+    operations = [
+        ("update_task",       lambda: crud.update_task(task["id"], TaskUpdate(**_task(uid, "Editada")))),
+        ("patch_task",        lambda: crud.patch_task(task["id"], TaskPartialUpdate(completed=True))),
+        ("delete_task",       lambda: crud.delete_task(victim["id"])),
+        ("update_user",       lambda: crud.update_user(uid, User(email="bench2@tasko.dev", password="secreto"))),
+        ("update_note",       lambda: crud.update_note(note["id"], "Nota", "otro texto")),
+        ("delete_note",       lambda: crud.delete_note(spare["id"])),
+        ("update_focus_time", lambda: crud.update_focus_time(focus["id"], FocusTimeUpdate(minutes=25))),
+        ("delete_user",       lambda: crud.delete_user(uid)),
+    ]
+
+    print(f"{'operación':<20}{'rpcs':>6}{'lecturas':>10}{'escrituras':>12}")
+    for name, op in operations:
+        db.reset_stats()
+        await op()
+        print(f"{name:<20}{db.stats['rpcs']:>6}{db.stats['reads']:>10}{db.stats['writes']:>12}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""
+Compara el coste de serializar listados grandes de tareas:
+
+  - response_model: lo que hacía FastAPI antes (validar cada tarea contra
+    List[TaskInDB] y codificar con jsonable_encoder + json)
+  - fast path:      project() + FastJSONResponse (orjson), sin re-validar
+
+    python -m benchmarks.serialization            # 10 000 tareas
+    python -m benchmarks.serialization --tasks 50000 --repeat 5
+"""
+import argparse
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from models import TaskInDB
+from responses import FastJSONResponse, project_all
+
+
+def _tasks(n: int) -> List[dict]:
+    return [
+        {
+            "id": f"task{i:06d}",
+            "title": f"Tarea {i}",
+            "description": "Descripción de prueba " * 3,
+            "due_date": "05-03-2030",
+            "due_date_iso": "2030-03-05",
+            "completed": i % 3 == 0,
+            "user_id": f"user{i % 50}",
+            "status": "Pendiente",
+            "priority": "Media",
+            "tags": ["trabajo", "urgente"],
+            "steps": [{"description": f"Paso {j}", "completed": j == 0} for j in range(3)],
+            "justification": "",
+            "focus_total_minutes": 25,
+        }
+        for i in range(n)
+    ]
+
+
+def _validated(records: List[dict]) -> bytes:
+    # Equivalente a response_model=List[TaskInDB]: validación + serialización
+    return JSONResponse(jsonable_encoder([TaskInDB(**r) for r in records])).body
+
+def _fast(records: List[dict]) -> bytes:
+    return FastJSONResponse(project_all(records, TaskInDB)).body
+
+
+def _best(fn, records, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(records)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    records = _tasks(args.tasks)
+    assert len(_fast(records)) > 0
+
+    print(f"{'ruta':<16}{'ms':>10}{'tareas/s':>14}")
+    results = {}
+    for name, fn in (("response_model", _validated), ("fast path", _fast)):
+        seconds = _best(fn, records, args.repeat)
+        results[name] = seconds
+        print(f"{name:<16}{seconds * 1000:>10.1f}{args.tasks / seconds:>14,.0f}")
+    print(f"aceleración: x{results['response_model'] / results['fast path']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+
+# ——— Caché LRU + TTL por proceso ———
+#
+# Cada caché tiene tamaño máximo (LRU) y tiempo de vida por entrada. Las
+# entradas pueden llevar etiquetas para invalidar de golpe todo lo que
+# dependa de algo (p. ej. todos los listados que contienen una tarea).
+#
+# Configuración por variables de entorno:
+#   TASKO_CACHE_SIZE / TASKO_CACHE_TTL            valores por defecto
+#   TASKO_CACHE_<NOMBRE>_SIZE / _TTL              por caché (p. ej. TASKO_CACHE_TASKS_TTL)
+# Un tamaño 0 desactiva la caché.
+
+DEFAULT_SIZE = int(os.getenv("TASKO_CACHE_SIZE", "1024"))
+DEFAULT_TTL  = float(os.getenv("TASKO_CACHE_TTL", "30"))
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, name: str, maxsize: int = DEFAULT_SIZE, ttl: float = DEFAULT_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Hashable, set] = {}
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires, value, _ = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = ()) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._remove(key)
+            tags = tuple(tags)
+            self._data[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if self._remove(key):
+                self.invalidations += 1
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        """Elimina todas las entradas marcadas con `tag`."""
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                if self._remove(key):
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._tags.clear()
+
+    def configure(self, maxsize: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if maxsize is not None:
+                self.maxsize = maxsize
+                while len(self._data) > max(maxsize, 0):
+                    self._remove(next(iter(self._data)))
+                    self.evictions += 1
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size":          len(self._data),
+            "maxsize":       self.maxsize,
+            "ttl":           self.ttl,
+            "hits":          self.hits,
+            "misses":        self.misses,
+            "hit_rate":      round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions":     self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+_registry: Dict[str, TTLCache] = {}
+
+def get_cache(name: str, ttl: Optional[float] = None) -> TTLCache:
+    """
+    Devuelve (creándola si hace falta) la caché `name`, configurada desde el
+    entorno. `ttl` sustituye a TASKO_CACHE_TTL como valor por defecto.
+    """
+    if name not in _registry:
+        prefix = f"TASKO_CACHE_{name.upper()}"
+        _registry[name] = TTLCache(
+            name,
+            maxsize=int(os.getenv(f"{prefix}_SIZE", DEFAULT_SIZE)),
+            ttl=float(os.getenv(f"{prefix}_TTL", DEFAULT_TTL if ttl is None else ttl)),
+        )
+    return _registry[name]
+
+def all_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: c.stats() for name, c in _registry.items()}
+
+def clear_all() -> None:
+    for c in _registry.values():
+        c.clear()
@@ -1,51 +1,250 @@
+import asyncio
+import logging
+import os
+import sys
+from collections import defaultdict
 from fastapi import HTTPException
 from typing import Optional, List
-from models import User, Note, TaskCreate, TaskUpdate, TaskInDB, FocusTimeCreate, FocusTimeUpdate, FocusTimeInDB
-from database import db
-from datetime import datetime
-from google.cloud.firestore_v1 import ArrayUnion
-from typing import List, Dict
+from models import User, Note, TaskCreate, TaskUpdate, TaskInDB, TaskBatchUpdate, TaskFilters, TaskPartialUpdate, FocusTimeCreate, FocusTimeUpdate, FocusTimeInDB
+from database import collection, get_db, transactional
+from datetime import datetime, timedelta
+from google.cloud.firestore_v1 import ArrayRemove, ArrayUnion, Increment
+from google.api_core.exceptions import AlreadyExists, NotFound
+from typing import List, Dict, AsyncIterator, Callable, Set
 from models import FocusSummaryOut
+from pagination import ASCENDING, DESCENDING, paginate
+from cache import MISSING, get_cache
+import metrics
+import mirror
+import search
+from security import hash_password_async, is_hashed, verify_password_async
+
+logger = logging.getLogger(__name__)
+
+
+# ——— Cachés de lectura ———
+# Lecturas por id y listados por usuario; cada escritura invalida lo que toca.
+# Los listados se etiquetan con ("user", user_id) y ("task", task_id) para
+# poder invalidar todos los que contienen una tarea concreta.
+
+# Los logins guardan el hash de la contraseña: un cambio de contraseña o un
+# borrado hecho en otro worker no invalida esta caché, así que su vida es de
+# segundos (solo absorbe ráfagas), no la de las demás
+LOGIN_CACHE_TTL = 2.0
+
+task_cache       = get_cache("tasks")
+user_cache       = get_cache("users")
+login_cache      = get_cache("logins", ttl=LOGIN_CACHE_TTL)
+note_cache       = get_cache("notes")
+user_tasks_cache = get_cache("user_tasks")
+
+def _invalidate_task(task_id: str, user_id: Optional[str] = None) -> None:
+    task_cache.delete(task_id)
+    user_tasks_cache.invalidate_tag(("task", task_id))
+    if user_id:
+        user_tasks_cache.invalidate_tag(("user", user_id))
+
+# Con el espejo on_snapshot activo, los cambios hechos por otros workers
+# también invalidan las cachés de este proceso.
+mirror.mirrors["tareas"].add_listener(lambda tid, old, new: _invalidate_task(tid, (new or old or {}).get("user_id")))
+mirror.mirrors["notes"].add_listener(lambda nid, old, new: note_cache.delete(nid))
+# ...y mantienen al día el índice de búsqueda
+mirror.mirrors["tareas"].add_listener(lambda tid, old, new: _reindex("task", tid, new))
+mirror.mirrors["notes"].add_listener(lambda nid, old, new: _reindex("note", nid, new))
+mirror.mirrors["users"].add_listener(lambda uid, old, new: user_cache.delete(uid))
+mirror.mirrors["users"].add_listener(lambda uid, old, new: login_cache.invalidate_tag(("user", uid)))
+
+
+def _reindex(kind: str, doc_id: str, record: Optional[dict]) -> None:
+    if record is None:
+        search.index.remove(kind, doc_id)
+    else:
+        search.index.index_record(kind, doc_id, record)
 
 
 # ——— Usuarios ———
 
-def get_all_users():
-    return [doc.to_dict() | {"id": doc.id} for doc in db.collection("users").stream()]
+def _must_exist():
+    """Precondición de escritura: el documento debe existir (si no, NotFound)."""
+    return get_db().write_option(exists=True)
+
+# Campos de usuario que nunca salen en una respuesta (con el hash se puede
+# atacar la contraseña offline)
+USER_PRIVATE_FIELDS = ("password",)
+
+def public_user(record: dict) -> dict:
+    return {k: v for k, v in record.items() if k not in USER_PRIVATE_FIELDS}
+
+async def get_all_users():
+    m = mirror.get_mirror("users")
+    if m is not None:
+        return [public_user(r) for r in m.all()]
+    return [public_user(doc.to_dict() | {"id": doc.id}) async for doc in collection("users").stream()]
 
-def get_user_by_id(user_id):
-    doc = db.collection("users").document(user_id).get()
+async def get_users_page(limit: Optional[int] = None, cursor: Optional[str] = None) -> dict:
+    """Página de usuarios ordenada por id."""
+    page = await paginate(collection("users"), limit, cursor)
+    return {"items": [public_user(r) for r in page["items"]], "next_cursor": page["next_cursor"]}
+
+async def get_user_by_id(user_id):
+    # Las lecturas por id no usan el espejo: el listener aplica las escrituras
+    # de este mismo worker con retraso, y la caché se invalida al escribir
+    cached = user_cache.get(user_id)
+    if cached is not MISSING:
+        return dict(cached)
+    doc = await collection("users").document(user_id).get()
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    return doc.to_dict() | {"id": doc.id}
+    record = public_user(doc.to_dict() | {"id": doc.id})
+    user_cache.set(user_id, record)
+    return dict(record)
+
+# Índice email -> usuario: `email_index/{email normalizado}` guarda el user_id y
+# el hash de la contraseña, así /login es una única lectura por id (y la
+# creación con create() garantiza emails únicos).
+EMAIL_INDEX = "email_index"
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
 
-def create_user(user: User):
-    new_ref = db.collection("users").document()
-    new_ref.set(user.dict())
-    return {"id": new_ref.id, **user.dict()}
+def _email_ref(email: str):
+    # "/" no es válido en un id de documento
+    return collection(EMAIL_INDEX).document(normalize_email(email).replace("/", "%2F"))
 
-def update_user(user_id: str, user: User):
-    ref = db.collection("users").document(user_id)
-    if not ref.get().exists:
+def _forget_login(*emails: Optional[str]) -> None:
+    for email in emails:
+        if email:
+            login_cache.delete(normalize_email(email))
+
+async def create_user(user: User):
+    data = {"email": normalize_email(user.email), "password": await hash_password_async(user.password)}
+    ref = collection("users").document()
+    batch = get_db().batch()
+    batch.create(_email_ref(data["email"]), {"user_id": ref.id, "password": data["password"]})
+    batch.set(ref, data)
+    try:
+        await batch.commit()
+    except AlreadyExists:
+        raise HTTPException(status_code=409, detail="Ya existe un usuario con ese email")
+    _forget_login(data["email"])
+    return {"id": ref.id, **public_user(data)}
+
+@transactional
+async def _update_user_tx(transaction, ref, data: dict) -> Optional[str]:
+    snap = await ref.get(transaction=transaction)
+    if not snap.exists:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    ref.update(user.dict())
+    old_email = snap.to_dict().get("email")
+    entry = {"user_id": ref.id, "password": data["password"]}
+    if old_email and normalize_email(old_email) == data["email"]:
+        transaction.set(_email_ref(data["email"]), entry)
+    else:
+        if old_email:
+            transaction.delete(_email_ref(old_email))
+        transaction.create(_email_ref(data["email"]), entry)
+    transaction.update(ref, data)
+    return old_email
+
+async def update_user(user_id: str, user: User):
+    data = {"email": normalize_email(user.email), "password": await hash_password_async(user.password)}
+    ref = collection("users").document(user_id)
+    try:
+        old_email = await _update_user_tx(get_db().transaction(), ref, data)
+    except AlreadyExists:
+        raise HTTPException(status_code=409, detail="Ya existe un usuario con ese email")
+    user_cache.delete(user_id)
+    _forget_login(old_email, data["email"])
     return {"status": "updated"}
 
-def delete_user(user_id: str):
-    ref = db.collection("users").document(user_id)
-    if not ref.get().exists:
+@transactional
+async def _delete_user_tx(transaction, ref) -> Optional[str]:
+    snap = await ref.get(transaction=transaction)
+    if not snap.exists:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    ref.delete()
+    email = snap.to_dict().get("email")
+    if email:
+        transaction.delete(_email_ref(email))
+    transaction.delete(_dashboard_ref(ref.id))
+    transaction.delete(ref)
+    return email
+
+async def delete_user(user_id: str):
+    ref = collection("users").document(user_id)
+    email = await _delete_user_tx(get_db().transaction(), ref)
+    user_cache.delete(user_id)
+    _forget_login(email)
+    search.index.drop_user(user_id)
     return {"status": "deleted"}
 
-def login_user(email: str, password: str):
-    users_ref = db.collection("users")
-    query = users_ref.where("email", "==", email).where("password", "==", password).stream()
-    found = [doc for doc in query]
-    if not found:
+async def _load_login_entry(email: str, raw_email: str) -> Optional[dict]:
+    """Entrada {user_id, password} del índice, o None si el email no existe."""
+    snap = await _email_ref(email).get()
+    if snap.exists:
+        return snap.to_dict()
+    # Usuarios anteriores al índice (sin migrar): consulta por email; tras
+    # el primer login correcto quedan indexados.
+    query = collection("users").where("email", "in", list({email, raw_email.strip()})).limit(1)
+    async for doc in query.stream():
+        return {"user_id": doc.id, "password": doc.to_dict().get("password")}
+    return None
+
+async def _store_credentials(user_id: str, email: str, password: str) -> dict:
+    """Guarda el hash actual de la contraseña en el usuario y en el índice."""
+    entry = {"user_id": user_id, "password": await hash_password_async(password)}
+    batch = get_db().batch()
+    batch.set(_email_ref(email), entry)
+    batch.update(collection("users").document(user_id), {"email": email, "password": entry["password"]})
+    await batch.commit()
+    user_cache.delete(user_id)
+    return entry
+
+async def login_user(email: str, password: str):
+    key = normalize_email(email)
+    # Caché positiva y negativa: absorbe ráfagas de logins (p. ej. tras un despliegue)
+    entry = login_cache.get(key)
+    if entry is MISSING:
+        entry = await _load_login_entry(key, email)
+        login_cache.set(key, entry, tags=[("user", entry["user_id"])] if entry else ())
+    if entry is None:
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
-    return {"status": "success", "user_id": found[0].id}
 
+    ok, needs_rehash = await verify_password_async(password, entry.get("password"))
+    if not ok:
+        raise HTTPException(status_code=401, detail="Credenciales inválidas")
+    if needs_rehash:
+        # Contraseña en texto plano o con parámetros antiguos: se re-hashea ahora
+        login_cache.set(key, await _store_credentials(entry["user_id"], key, password), tags=[("user", entry["user_id"])])
+    return {"status": "success", "user_id": entry["user_id"]}
+
+async def migrate_user_credentials(dry_run: bool = False) -> Dict[str, int]:
+    """
+    Hashea las contraseñas guardadas en texto plano, normaliza los emails y
+    construye `email_index`. Si dos usuarios comparten email solo se indexa
+    el primero (por id); el resto se cuentan como conflictos.
+    """
+    scanned, conflicts = 0, 0
+    item_writes, indexed = [], set()
+    async for doc in collection("users").stream():
+        scanned += 1
+        data = doc.to_dict()
+        email = normalize_email(data.get("email") or "")
+        if not email or email in indexed:
+            conflicts += 1
+            continue
+        indexed.add(email)
+        password = data.get("password") or ""
+        if not is_hashed(password):
+            password = await hash_password_async(password)
+        item_writes.append((len(item_writes), [
+            ("set", _email_ref(email), {"user_id": doc.id, "password": password}),
+            ("update", doc.reference, {"email": email, "password": password}),
+        ]))
+
+    if not dry_run:
+        await _commit_items(item_writes)
+        user_cache.clear()
+        login_cache.clear()
+    return {"scanned": scanned, "indexed": len(item_writes), "conflicts": conflicts}
 
 
 # ——— Tareas ———
@@ -53,209 +252,655 @@ def login_user(email: str, password: str):
 VALID_STATUSES    = ["Pendiente", "En progreso", "Completada"]
 VALID_PRIORITIES  = ["Baja", "Media", "Alta"]
 
+# Tablas de normalización: una búsqueda en dict por valor en lugar de
+# comparaciones y búsquedas de subcadenas. Incluyen los valores canónicos
+# (los que ya llegan validados por Pydantic) para resolverlos sin .lower().
+_STATUS_LOOKUP = {
+    **{s: s for s in VALID_STATUSES},
+    "pendiente":   "Pendiente",
+    "pendientes":  "Pendiente",
+    "en progreso": "En progreso",
+    "completa":    "Completada",
+    "completada":  "Completada",
+}
+_PRIORITY_LOOKUP = {**{p: p for p in VALID_PRIORITIES}, **{p.lower(): p for p in VALID_PRIORITIES}}
+
 def normalize_status(status: str) -> str:
-    sl = status.lower()
-    if sl in ["pendiente", "pendientes"]:
-        return "Pendiente"
-    if "en progreso" in sl:
-        return "En progreso"
-    if sl in ["completa", "completada"]:
-        return "Completada"
-    return "Pendiente"
+    status = getattr(status, "value", status)  # Status (Enum) o texto libre
+    ns = _STATUS_LOOKUP.get(status)
+    if ns is None:
+        sl = status.strip().lower()
+        ns = _STATUS_LOOKUP.get(sl) or ("En progreso" if "en progreso" in sl else "Pendiente")
+    return ns
 
 def normalize_priority(priority: str) -> str:
-    pl = priority.capitalize()
-    return pl if pl in VALID_PRIORITIES else "Media"
+    priority = getattr(priority, "value", priority)
+    return _PRIORITY_LOOKUP.get(priority) or _PRIORITY_LOOKUP.get(priority.strip().lower(), "Media")
+
+# Máximo de operaciones por WriteBatch
+BATCH_LIMIT = 500
+
+# Máximo de ítems aceptados en una petición de escritura por lotes
+MAX_BATCH_ITEMS = 1000
+
+# Copia de due_date en formato YYYY-MM-DD: ordena como la fecha y permite
+# consultas por rango en Firestore (dd-mm-YYYY no lo permite)
+DUE_ISO_FIELD = "due_date_iso"
+
+# Campos por los que se puede ordenar (?order_by=campo, "-campo" para descendente)
+TASK_ORDER_FIELDS = {
+    "due_date": DUE_ISO_FIELD,
+    "title":    "title",
+    "status":   "status",
+    "priority": "priority",
+}
+
+# Campos que se pueden pedir con ?fields= (el id siempre se devuelve)
+TASK_FIELDS = (
+    "title", "description", "due_date", "completed", "user_id",
+    "status", "priority", "tags", "steps", "justification",
+)
+
+def due_date_to_iso(due_date: str) -> str:
+    """dd-mm-YYYY (ya validado) -> YYYY-MM-DD."""
+    return f"{due_date[6:10]}-{due_date[3:5]}-{due_date[0:2]}"
+
+def _parse_due_filter(value: str) -> str:
+    """Acepta dd-mm-YYYY o YYYY-MM-DD y devuelve YYYY-MM-DD; 400 si no es una fecha."""
+    for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise HTTPException(status_code=400, detail="La fecha debe estar en formato dd-mm-YYYY")
+
+# Filtros que, junto con un orden o un rango de fechas, necesitan índice
+# compuesto. firestore.indexes.json tiene uno por cada combinación de
+# [user_id] + [como mucho uno de estos] + campo de orden (ASC y DESC); las
+# consultas solo con igualdades no lo necesitan (Firestore combina los
+# índices simples). Otras combinaciones fallarían con FAILED_PRECONDITION,
+# así que se rechazan antes con 400.
+TASK_INDEXED_FILTERS = {
+    "tag":       "tags",
+    "status":    "status",
+    "priority":  "priority",
+    "completed": "completed",
+}
+
+def _task_order(order_by: Optional[str], has_due_range: bool = False, fixed: Set[str] = frozenset()) -> List[tuple]:
+    if not order_by:
+        return [(DUE_ISO_FIELD, ASCENDING)] if has_due_range else []
+    direction = DESCENDING if order_by.startswith("-") else ASCENDING
+    name = order_by.lstrip("-")
+    if name not in TASK_ORDER_FIELDS:
+        raise HTTPException(status_code=400, detail=f"order_by inválido. Usa uno de {list(TASK_ORDER_FIELDS)}")
+    field = TASK_ORDER_FIELDS[name]
+    # Firestore exige ordenar primero por el campo del filtro de rango
+    if has_due_range and field != DUE_ISO_FIELD:
+        raise HTTPException(status_code=400, detail="Con un rango de fechas solo se puede ordenar por due_date")
+    # Ordenar por un campo fijado con una igualdad no cambia nada (y pediría otro índice)
+    if field in fixed:
+        return []
+    return [(field, direction)]
+
+def _check_task_indexes(filters: TaskFilters, order: List[tuple]) -> None:
+    """400 si la consulta necesitaría un índice compuesto que no está declarado."""
+    active = [name for name in TASK_INDEXED_FILTERS if getattr(filters, name) is not None]
+    if order and len(active) > 1:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Con order_by o un rango de fechas solo se admite uno de los filtros {list(TASK_INDEXED_FILTERS)}",
+        )
+
+def _task_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Campos pedidos con ?fields= (validados, sin el id), o None si no se pidió proyección."""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip() and f.strip() != "id"]
+    invalid = [f for f in requested if f not in TASK_FIELDS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Campos desconocidos: {invalid}. Usa {list(TASK_FIELDS)}")
+    return requested
+
+def _task_projection(requested: List[str], order: List[tuple]) -> List[str]:
+    # Los campos de orden hacen falta para construir el cursor de la página
+    return requested + [field for field, _ in order if field not in requested]
+
+def _trim_fields(items: List[dict], requested: List[str]) -> List[dict]:
+    """Deja en cada tarea solo los campos pedidos y el id (quita los de orden añadidos al select)."""
+    keep = set(requested) | {"id"}
+    return [{k: v for k, v in item.items() if k in keep} for item in items]
 
 # ——— CRUD de tareas ———
 
-def get_all_tasks() -> List[dict]:
+async def get_all_tasks() -> List[dict]:
     """
     Devuelve todas las tareas con su id incluido.
     """
-    return [doc.to_dict() | {"id": doc.id} for doc in db.collection("tareas").stream()]
+    m = mirror.get_mirror("tareas")
+    if m is not None:
+        return m.all()
+    return [doc.to_dict() | {"id": doc.id} async for doc in collection("tareas").stream()]
+
+async def iter_all_tasks() -> AsyncIterator[dict]:
+    """
+    Recorre todas las tareas sin materializar la colección: un dict por documento.
+    """
+    m = mirror.get_mirror("tareas")
+    if m is not None:
+        for record in m.all():
+            yield record
+        return
+    async for doc in collection("tareas").stream():
+        yield doc.to_dict() | {"id": doc.id}
 
-def get_task_by_id(task_id: str) -> dict:
+async def get_task_by_id(task_id: str) -> dict:
     """
     Obtiene la tarea por ID; lanza 404 si no existe.
     """
-    doc = db.collection("tareas").document(task_id).get()
+    # Sin espejo (ver get_user_by_id): la caché ve enseguida las escrituras propias
+    cached = task_cache.get(task_id)
+    if cached is not MISSING:
+        return dict(cached)
+    doc = await collection("tareas").document(task_id).get()
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Tarea no encontrada")
-    return doc.to_dict() | {"id": doc.id}
+    record = doc.to_dict() | {"id": doc.id}
+    task_cache.set(task_id, record)
+    return dict(record)
 
-def create_task(task: TaskCreate) -> dict:
+def _normalize_task_fields(data: dict) -> dict:
     """
-    Crea una nueva tarea. Recibe TaskCreate (sin id) y devuelve dict con id y campos.
+    Etapa única de normalización de tareas (crear, PUT, PATCH y lotes).
+    Solo toca los campos presentes, así que sirve también para parciales.
+    Los tipos y formatos ya los validó Pydantic: aquí solo se canonizan
+    valores y se añade `due_date_iso`. Modifica `data` y lo devuelve.
     """
-    data = task.dict()
-
-    # Normaliza y valida status
-    data["status"] = normalize_status(data.get("status", "Pendiente"))
-    if data["status"] not in VALID_STATUSES:
-        raise HTTPException(status_code=400, detail=f"Estado inválido. Usa uno de {VALID_STATUSES}")
-
-    # Normaliza y valida priority
-    data["priority"] = normalize_priority(data.get("priority", "Media"))
-    if data["priority"] not in VALID_PRIORITIES:
-        raise HTTPException(status_code=400, detail=f"Prioridad inválida. Usa uno de {VALID_PRIORITIES}")
-
-    # Asegurar tags como lista de strings
-    tags = data.get("tags")
-    data["tags"] = tags if isinstance(tags, list) else []
-
-    # Procesar steps como lista de dicts válidos
-    steps = data.get("steps")
-    normalized_steps = []
-    if isinstance(steps, list):
-        for s in steps:
-            # Cada s es instancia de Step o dict equivalente validado por Pydantic
-            if isinstance(s, dict):
-                desc = s.get("description")
-                if desc:
-                    normalized_steps.append({
-                        "description": desc,
-                        "completed": bool(s.get("completed", False))
-                    })
-            else:
-                # En general con TaskCreate, steps ya es lista de dicts válidos, pero convertimos seguro:
-                try:
-                    desc = getattr(s, "description", None)
-                    comp = getattr(s, "completed", False)
-                    if desc:
-                        normalized_steps.append({
-                            "description": desc,
-                            "completed": bool(comp)
-                        })
-                except:
-                    pass
-    data["steps"] = normalized_steps
-
-    # Verifica formato de due_date (Pydantic ya lo validó, pero repetimos por si acaso)
-    try:
-        datetime.strptime(data["due_date"], "%d-%m-%Y")
-    except ValueError:
-        raise HTTPException(status_code=400, detail="La fecha debe estar en formato dd-mm-YYYY")
+    if "status" in data:
+        data["status"] = normalize_status(data["status"])
+    if "priority" in data:
+        data["priority"] = normalize_priority(data["priority"])
+    if "tags" in data:
+        data["tags"] = data["tags"] or []
+    if "steps" in data:
+        # Tras .dict() los Step ya son dicts; se descartan los pasos vacíos
+        data["steps"] = [
+            {"description": s["description"], "completed": bool(s.get("completed"))}
+            for s in data["steps"] or () if s.get("description")
+        ]
+    if "due_date" in data:
+        data[DUE_ISO_FIELD] = due_date_to_iso(data["due_date"])
+    return data
+
+def _build_task_data(task: TaskCreate) -> dict:
+    """Documento completo de una tarea (TaskCreate/TaskUpdate) listo para guardar."""
+    return _normalize_task_fields(task.dict())
 
-    # `description`, `justification` ya validados por Pydantic con longitud, etc.
+async def create_task(task: TaskCreate) -> dict:
+    """
+    Crea una nueva tarea. Recibe TaskCreate (sin id) y devuelve dict con id y campos.
+    """
+    data = _build_task_data(task)
 
     # Guarda en Firestore
-    ref = db.collection("tareas").document()
-    ref.set(data)
+    ref = collection("tareas").document()
+    if DASHBOARD_ENABLED:
+        await _write_with_dashboard_tx(get_db().transaction(), ref, "tareas", data, "create")
+    else:
+        await ref.set(data)
+    _invalidate_task(ref.id, data["user_id"])
+    _reindex("task", ref.id, data)
     return {"id": ref.id, **data}
 
-def update_task(task_id: str, task: TaskUpdate) -> dict:
+async def update_task(task_id: str, task: TaskUpdate) -> dict:
     """
     Actualiza una tarea existente por ID. Recibe TaskUpdate (todos los campos requeridos sin id).
     Devuelve el documento completo actualizado (con id).
     """
-    ref = db.collection("tareas").document(task_id)
-    doc = ref.get()
-    if not doc.exists:
-        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    ref = collection("tareas").document(task_id)
+    data = _build_task_data(task)
 
-    data = task.dict()
-
-    # Normaliza y valida status
-    data["status"] = normalize_status(data.get("status", "Pendiente"))
-    if data["status"] not in VALID_STATUSES:
-        raise HTTPException(status_code=400, detail=f"Estado inválido. Usa uno de {VALID_STATUSES}")
-
-    # Normaliza y valida priority
-    data["priority"] = normalize_priority(data.get("priority", "Media"))
-    if data["priority"] not in VALID_PRIORITIES:
-        raise HTTPException(status_code=400, detail=f"Prioridad inválida. Usa uno de {VALID_PRIORITIES}")
-
-    # Asegurar tags como lista de strings
-    tags = data.get("tags")
-    data["tags"] = tags if isinstance(tags, list) else []
-
-    # Procesar steps como lista de dicts válidos
-    steps = data.get("steps")
-    normalized_steps = []
-    if isinstance(steps, list):
-        for s in steps:
-            if isinstance(s, dict):
-                desc = s.get("description")
-                if desc:
-                    normalized_steps.append({
-                        "description": desc,
-                        "completed": bool(s.get("completed", False))
-                    })
-            else:
-                # Si viniera instancia Pydantic:
-                try:
-                    desc = getattr(s, "description", None)
-                    comp = getattr(s, "completed", False)
-                    if desc:
-                        normalized_steps.append({
-                            "description": desc,
-                            "completed": bool(comp)
-                        })
-                except:
-                    pass
-    data["steps"] = normalized_steps
-
-    # Verifica formato de due_date
+    # Actualiza en Firestore (update() lanza NotFound si la tarea no existe)
     try:
-        datetime.strptime(data["due_date"], "%d-%m-%Y")
-    except ValueError:
-        raise HTTPException(status_code=400, detail="La fecha debe estar en formato dd-mm-YYYY")
+        if DASHBOARD_ENABLED:
+            old = await _write_with_dashboard_tx(get_db().transaction(), ref, "tareas", data, "update")
+            _invalidate_task(task_id, old.get("user_id"))
+        else:
+            await ref.update(data)
+    except NotFound:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    _invalidate_task(task_id, data["user_id"])
+    _reindex("task", task_id, data)
+
+    # PUT reemplaza todos los campos del modelo: la respuesta sale de lo escrito
+    return {"id": task_id, **data}
 
-    # Actualiza en Firestore
-    ref.update(data)
+# Campos por los que se filtran los listados cacheados de get_tasks_by_user
+_LISTING_FILTER_FIELDS = frozenset({"user_id", "tags", "status"})
 
-    # Retorna el documento completo actualizado
-    updated = db.collection("tareas").document(task_id).get()
-    return updated.to_dict() | {"id": updated.id}
+def _apply_step_updates(steps: Optional[List[dict]], step_updates: List[dict]) -> List[dict]:
+    steps = [dict(st) for st in steps or []]
+    for upd in step_updates:
+        i = upd["index"]
+        if i >= len(steps):
+            raise HTTPException(status_code=400, detail=f"La tarea no tiene paso {i}")
+        steps[i].update({k: v for k, v in upd.items() if k != "index" and v is not None})
+    return steps
 
-def delete_task(task_id: str) -> dict:
+@transactional
+async def _patch_steps_tx(transaction, ref, changes: dict, step_updates: List[dict]) -> Optional[str]:
+    # Solo se leen `steps` y el dueño: el resto de campos se escriben sin mirar el documento
+    snap = await ref.get(field_paths=["steps", "user_id"], transaction=transaction)
+    if not snap.exists:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    data = snap.to_dict() or {}
+    steps = _apply_step_updates(data.get("steps"), step_updates)
+    transaction.update(ref, {**changes, "steps": steps})
+    return data.get("user_id")
+
+async def patch_task(task_id: str, task: TaskPartialUpdate) -> dict:
     """
-    Elimina la tarea; devuelve {"status":"deleted"} o lanza 404 si no existe.
+    Escribe solo los campos enviados (rutas de campo de Firestore), sin leer
+    la tarea. `add_tags`/`remove_tags` usan ArrayUnion/ArrayRemove y
+    `step_updates` modifica pasos concretos en una transacción que solo lee
+    `steps` y `user_id`. Si cambian tags/status y el dueño no está en caché,
+    se lee su `user_id` para invalidar sus listados.
+    Devuelve {"id", "updated": [campos escritos]}.
     """
-    ref = db.collection("tareas").document(task_id)
-    if not ref.get().exists:
+    fields = task.dict(exclude_unset=True)
+    add_tags = fields.pop("add_tags", None)
+    remove_tags = fields.pop("remove_tags", None)
+    step_updates = fields.pop("step_updates", None)
+    changes = _normalize_task_fields({k: v for k, v in fields.items() if v is not None})
+
+    if add_tags and remove_tags:
+        raise HTTPException(status_code=400, detail="Usa add_tags o remove_tags, no ambos a la vez")
+    if (add_tags or remove_tags) and "tags" in changes:
+        raise HTTPException(status_code=400, detail="tags no se puede combinar con add_tags/remove_tags")
+    if step_updates and "steps" in changes:
+        raise HTTPException(status_code=400, detail="steps no se puede combinar con step_updates")
+    if add_tags:
+        changes["tags"] = ArrayUnion(add_tags)
+    if remove_tags:
+        changes["tags"] = ArrayRemove(remove_tags)
+    if not changes and not step_updates:
+        raise HTTPException(status_code=400, detail="No hay campos que actualizar")
+
+    ref = collection("tareas").document(task_id)
+    cached = task_cache.get(task_id)
+    owner = cached.get("user_id") if cached is not MISSING else None
+    try:
+        if DASHBOARD_ENABLED:
+            # El dashboard necesita el estado anterior: lectura en la transacción
+            old = await _write_with_dashboard_tx(get_db().transaction(), ref, "tareas", changes, "update", step_updates)
+            owner = old.get("user_id")
+        elif step_updates:
+            owner = await _patch_steps_tx(get_db().transaction(), ref, changes, step_updates)
+        else:
+            # update() ya exige que la tarea exista
+            await ref.update(changes)
+    except NotFound:
         raise HTTPException(status_code=404, detail="Tarea no encontrada")
-    ref.delete()
-    return {"status": "deleted"}
+    # Las etiquetas ("task", id) cubren los listados que ya la contenían; si
+    # cambia un campo por el que se filtran, la tarea puede entrar en otros
+    # listados del dueño. Si no se sabe quién es (ni caché ni lectura previa),
+    # se lee solo `user_id` tras escribir: un documento, en vez de vaciar los
+    # listados de todos los usuarios.
+    _invalidate_task(task_id, changes.get("user_id"))
+    if _LISTING_FILTER_FIELDS.intersection(changes):
+        owner = changes.get("user_id") or owner
+        if not owner:
+            snap = await ref.get(field_paths=["user_id"])
+            owner = (snap.to_dict() or {}).get("user_id") if snap.exists else None
+        if owner:
+            user_tasks_cache.invalidate_tag(("user", owner))
+    _reindex("task", task_id, changes)
+    return {"id": task_id, "updated": sorted(set(changes) | ({"steps"} if step_updates else set()))}
 
-def get_tasks_by_user(user_id: str, tag: Optional[str] = None, status: Optional[str] = None) -> List[dict]:
+async def delete_task(task_id: str) -> dict:
     """
-    Obtiene tareas de un usuario, opcionalmente filtradas por etiqueta o estado.
+    Elimina la tarea; devuelve {"status":"deleted"} o lanza 404 si no existe.
     """
-    query = db.collection("tareas").where("user_id", "==", user_id)
+    ref = collection("tareas").document(task_id)
+    try:
+        if DASHBOARD_ENABLED:
+            await _write_with_dashboard_tx(get_db().transaction(), ref, "tareas", None, "delete")
+        else:
+            await ref.delete(option=_must_exist())
+    except NotFound:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    _invalidate_task(task_id)
+    _reindex("task", task_id, None)
+    return {"status": "deleted"}
+
+def _task_query(
+    user_id: Optional[str] = None,
+    tag: Optional[str] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    completed: Optional[bool] = None,
+    due_from: Optional[str] = None,
+    due_to: Optional[str] = None,
+):
+    query = collection("tareas")
+    if user_id:
+        query = query.where("user_id", "==", user_id)
     if tag:
         query = query.where("tags", "array_contains", tag)
     if status:
         ns = normalize_status(status)
         query = query.where("status", "==", ns)
-    return [doc.to_dict() | {"id": doc.id} for doc in query.stream()]
+    if priority:
+        query = query.where("priority", "==", normalize_priority(priority))
+    if completed is not None:
+        query = query.where("completed", "==", completed)
+    if due_from:
+        query = query.where(DUE_ISO_FIELD, ">=", _parse_due_filter(due_from))
+    if due_to:
+        query = query.where(DUE_ISO_FIELD, "<=", _parse_due_filter(due_to))
+    return query
+
+async def get_tasks_by_user(user_id: str, tag: Optional[str] = None, status: Optional[str] = None) -> List[dict]:
+    """
+    Obtiene tareas de un usuario, opcionalmente filtradas por etiqueta o estado.
+    """
+    m = mirror.get_mirror("tareas")
+    if m is not None:
+        ns = normalize_status(status) if status else None
+        return [
+            r for r in m.where("user_id", user_id)
+            if (not tag or tag in (r.get("tags") or [])) and (not ns or r.get("status") == ns)
+        ]
+    key = (user_id, tag, status)
+    cached = user_tasks_cache.get(key)
+    if cached is not MISSING:
+        return list(cached)
+    query = _task_query(user_id, tag, status)
+    records = [doc.to_dict() | {"id": doc.id} async for doc in query.stream()]
+    tags = [("user", user_id)] + [("task", r["id"]) for r in records]
+    user_tasks_cache.set(key, records, tags=tags)
+    return list(records)
+
+async def get_tasks_due(
+    user_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    include_completed: bool = False,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    Tareas de un usuario con fecha límite en [after, before), ordenadas por
+    fecha (vencidas: before=hoy; próximas: after=hoy). Es una sola consulta
+    por rango sobre `due_date_iso`, sin recorrer las tareas en el cliente.
+    """
+    query = collection("tareas").where("user_id", "==", user_id)
+    if not include_completed:
+        query = query.where("completed", "==", False)
+    if after:
+        query = query.where(DUE_ISO_FIELD, ">=", _parse_due_filter(after))
+    if before:
+        query = query.where(DUE_ISO_FIELD, "<", _parse_due_filter(before))
+    order = [(DUE_ISO_FIELD, ASCENDING)]
+
+    if limit is not None or cursor is not None:
+        return await paginate(query, limit, cursor, order)
+    query = query.order_by(DUE_ISO_FIELD, direction=ASCENDING)
+    return [doc.to_dict() | {"id": doc.id} async for doc in query.stream()]
+
+async def migrate_due_dates(user_id: Optional[str] = None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Rellena `due_date_iso` en las tareas guardadas antes de que existiera
+    (o con un valor desfasado). Las tareas con due_date ilegible se cuentan
+    como inválidas y no se tocan.
+    """
+    query = collection("tareas").where("user_id", "==", user_id) if user_id else collection("tareas")
+    pending, scanned, invalid = [], 0, 0
+    async for doc in query.select(["due_date", DUE_ISO_FIELD]).stream():
+        scanned += 1
+        data = doc.to_dict()
+        try:
+            iso = _parse_due_filter(data.get("due_date") or "")
+        except HTTPException:
+            invalid += 1
+            continue
+        if data.get(DUE_ISO_FIELD) != iso:
+            pending.append((doc.id, iso))
+
+    if not dry_run and pending:
+        await _commit_items([
+            (i, [("update", collection("tareas").document(tid), {DUE_ISO_FIELD: iso})])
+            for i, (tid, iso) in enumerate(pending)
+        ])
+        task_cache.clear()
+        user_tasks_cache.clear()
+    return {"scanned": scanned, "updated": len(pending), "invalid": invalid}
+
+async def query_tasks(
+    filters: TaskFilters,
+    user_id: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    Lista tareas (de un usuario o de todos) con filtros, orden y proyección
+    resueltos en Firestore. Con `limit`/`cursor` devuelve una página
+    {"items", "next_cursor"}; si no, la lista completa.
+    """
+    query = _task_query(
+        user_id, filters.tag, filters.status, filters.priority,
+        filters.completed, filters.due_from, filters.due_to,
+    )
+    fixed = {TASK_INDEXED_FILTERS[name] for name in ("status", "priority") if getattr(filters, name)}
+    order = _task_order(filters.order_by, has_due_range=bool(filters.due_from or filters.due_to), fixed=fixed)
+    _check_task_indexes(filters, order)
+    requested = _task_fields(filters.fields)
+    if requested is not None:
+        query = query.select(_task_projection(requested, order))
 
-def get_tasks_by_status(status: Optional[str] = None) -> List[dict]:
+    if limit is not None or cursor is not None:
+        # paginate construye next_cursor con la tarea completa; después se recorta
+        page = await paginate(query, limit, cursor, order)
+        if requested is not None:
+            page["items"] = _trim_fields(page["items"], requested)
+        return page
+    for field, direction in order:
+        query = query.order_by(field, direction=direction)
+    items = [doc.to_dict() | {"id": doc.id} async for doc in query.stream()]
+    return _trim_fields(items, requested) if requested is not None else items
+
+async def get_tasks_by_status(status: Optional[str] = None) -> List[dict]:
     """
     Obtiene tareas filtradas por estado; si status es None o "Todas", devuelve todas.
     """
-    q = db.collection("tareas")
+    q = collection("tareas")
     if status and status != "Todas":
         ns = normalize_status(status)
         q = q.where("status", "==", ns)
-    return [doc.to_dict() | {"id": doc.id} for doc in q.stream()]
+    return [doc.to_dict() | {"id": doc.id} async for doc in q.stream()]
+
+
+# ——— Escrituras por lotes ———
+
+def _check_batch_size(items: list) -> None:
+    if not items:
+        raise HTTPException(status_code=400, detail="El lote está vacío")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH_ITEMS} elementos por lote")
+
+async def _commit_items(item_writes: List[tuple], results: Optional[List[dict]] = None) -> None:
+    """
+    Escribe las operaciones (tipo, ref, datos) de cada ítem en WriteBatch de
+    hasta BATCH_LIMIT operaciones, sin partir nunca un ítem entre dos batches.
+    Si un batch falla, sus ítems se marcan como error en `results` (o se
+    propaga la excepción si no se pasan resultados).
+    """
+    chunks: List[List[tuple]] = [[]]
+    ops = 0
+    for index, writes in item_writes:
+        if ops + len(writes) > BATCH_LIMIT and chunks[-1]:
+            chunks.append([])
+            ops = 0
+        chunks[-1].append((index, writes))
+        ops += len(writes)
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        batch = get_db().batch()
+        for _, writes in chunk:
+            for kind, ref, data in writes:
+                if kind == "merge":
+                    batch.set(ref, data, merge=True)
+                else:
+                    getattr(batch, kind)(ref, data)
+        try:
+            await batch.commit()
+        except Exception as e:
+            if results is None:
+                raise
+            for index, _ in chunk:
+                results[index] = {"index": index, "id": results[index].get("id"), "status": "error", "error": str(e)}
+
+def _batch_summary(results: List[dict]) -> dict:
+    failed = sum(1 for r in results if r["status"] == "error")
+    return {"results": results, "succeeded": len(results) - failed, "failed": failed}
+
+async def create_tasks_batch(tasks: List[TaskCreate]) -> dict:
+    """
+    Crea varias tareas en pocas RPCs. Devuelve el resultado por ítem
+    ({index, id, status, error}) en el mismo orden recibido.
+    """
+    _check_batch_size(tasks)
+    results: List[dict] = []
+    item_writes = []
+    for i, task in enumerate(tasks):
+        try:
+            data = _build_task_data(task)
+        except HTTPException as e:
+            results.append({"index": i, "id": None, "status": "error", "error": e.detail})
+            continue
+        ref = collection("tareas").document()
+        results.append({"index": i, "id": ref.id, "status": "created", "error": None, "user_id": data["user_id"]})
+        item_writes.append((i, [("set", ref, data)]))
+
+    await _mark_dashboards_stale(r.get("user_id") for r in results)
+    await _commit_items(item_writes, results)
+    for i, ((_, ref, data),) in item_writes:
+        if results[i]["status"] == "created":
+            _reindex("task", ref.id, data)
+    for r in results:
+        if r["status"] == "created":
+            _invalidate_task(r["id"], r.get("user_id"))
+        r.pop("user_id", None)
+    return _batch_summary(results)
+
+async def update_tasks_batch(items: List[TaskBatchUpdate]) -> dict:
+    """
+    Actualiza varias tareas completas. Comprueba la existencia de todas con
+    una sola lectura (get_all) y escribe por lotes.
+    """
+    _check_batch_size(items)
+    refs = [collection("tareas").document(item.id) for item in items]
+    # id -> dueño actual (hace falta para el dashboard si la tarea cambia de usuario)
+    existing = {snap.id: snap.to_dict().get("user_id") async for snap in get_db().get_all(refs) if snap.exists}
+
+    results: List[dict] = []
+    item_writes = []
+    for i, (item, ref) in enumerate(zip(items, refs)):
+        if item.id not in existing:
+            results.append({"index": i, "id": item.id, "status": "error", "error": "Tarea no encontrada"})
+            continue
+        try:
+            data = _build_task_data(item)
+        except HTTPException as e:
+            results.append({"index": i, "id": item.id, "status": "error", "error": e.detail})
+            continue
+        data.pop("id", None)
+        results.append({"index": i, "id": item.id, "status": "updated", "error": None, "user_id": data["user_id"]})
+        item_writes.append((i, [("update", ref, data)]))
+
+    await _mark_dashboards_stale([r.get("user_id") for r in results] + list(existing.values()))
+    await _commit_items(item_writes, results)
+    for i, ((_, ref, data),) in item_writes:
+        if results[i]["status"] == "updated":
+            _reindex("task", ref.id, data)
+    for r in results:
+        if r["status"] == "updated":
+            _invalidate_task(r["id"], r.get("user_id"))
+        r.pop("user_id", None)
+    return _batch_summary(results)
 
 
 # ——— Notas ———
 
-def get_all_notes() -> List[dict]:
+async def get_all_notes() -> List[dict]:
     """Devuelve todas las notas almacenadas."""
-    return [doc.to_dict() | {"id": doc.id} for doc in db.collection("notes").stream()]
+    m = mirror.get_mirror("notes")
+    if m is not None:
+        return m.all()
+    return [doc.to_dict() | {"id": doc.id} async for doc in collection("notes").stream()]
+
+async def iter_all_notes() -> AsyncIterator[dict]:
+    """Recorre todas las notas sin cargarlas en memoria."""
+    m = mirror.get_mirror("notes")
+    if m is not None:
+        for record in m.all():
+            yield record
+        return
+    async for doc in collection("notes").stream():
+        yield doc.to_dict() | {"id": doc.id}
+
+async def get_notes_page(limit: Optional[int] = None, cursor: Optional[str] = None) -> dict:
+    """Página de notas ordenada por id."""
+    return await paginate(collection("notes"), limit, cursor)
+
+# Listados por usuario: de la más reciente a la más antigua
+NOTES_ORDER = [("updated_at", DESCENDING)]
+
+def _notes_query(user_id: Optional[str] = None, tag: Optional[str] = None):
+    query = collection("notes")
+    if user_id:
+        query = query.where("user_id", "==", user_id)
+    if tag:
+        query = query.where("tags", "array_contains", tag)
+    return query
 
-def get_note_by_id(note_id: str) -> dict:
+async def query_notes(
+    user_id: Optional[str] = None,
+    tag: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    Notas de un usuario (y/o con una etiqueta), por `updated_at` descendente.
+    Con `limit`/`cursor` devuelve una página {"items", "next_cursor"}; si no,
+    la lista completa. Cuesta lo que tenga el usuario, no toda la colección.
+    """
+    if limit is not None or cursor is not None:
+        return await paginate(_notes_query(user_id, tag), limit, cursor, NOTES_ORDER)
+
+    m = mirror.get_mirror("notes")
+    if m is not None and user_id:
+        records = [r for r in m.where("user_id", user_id) if not tag or tag in (r.get("tags") or [])]
+        return sorted(records, key=lambda r: (str(r.get("updated_at") or ""), r["id"]), reverse=True)
+    query = _notes_query(user_id, tag).order_by("updated_at", direction=DESCENDING)
+    return [doc.to_dict() | {"id": doc.id} async for doc in query.stream()]
+
+async def get_note_by_id(note_id: str) -> dict:
     """Devuelve una nota por su ID."""
-    doc = db.collection("notes").document(note_id).get()
+    # Sin espejo (ver get_user_by_id)
+    cached = note_cache.get(note_id)
+    if cached is not MISSING:
+        return dict(cached)
+    doc = await collection("notes").document(note_id).get()
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Nota no encontrada")
-    return doc.to_dict() | {"id": doc.id}
+    record = doc.to_dict() | {"id": doc.id}
+    note_cache.set(note_id, record)
+    return dict(record)
 
-def create_note(user_id: str, title: str, texto: str, tags: Optional[List[str]] = None) -> dict:
+async def create_note(user_id: str, title: str, texto: str, tags: Optional[List[str]] = None) -> dict:
     """Crea una nueva nota con los campos definidos en el modelo."""
     now = datetime.utcnow().isoformat()
     data = {
@@ -266,121 +911,760 @@ def create_note(user_id: str, title: str, texto: str, tags: Optional[List[str]]
         "created_at": now,
         "updated_at": now
     }
-    ref = db.collection("notes").document()
-    ref.set(data)
+    ref = collection("notes").document()
+    if DASHBOARD_ENABLED:
+        await _write_with_dashboard_tx(get_db().transaction(), ref, "notes", data, "create")
+    else:
+        await ref.set(data)
+    _reindex("note", ref.id, data)
     return {"id": ref.id, **data}
 
-def update_note(note_id: str, title: str, texto: str, tags: Optional[List[str]] = None) -> dict:
+async def update_note(note_id: str, title: str, texto: str, tags: Optional[List[str]] = None) -> dict:
     """Actualiza los campos `title`, `texto` y `tags` de una nota existente."""
-    ref = db.collection("notes").document(note_id)
-    if not ref.get().exists:
-        raise HTTPException(status_code=404, detail="Nota no encontrada")
-
+    ref = collection("notes").document(note_id)
     update_data = {
         "updated_at": datetime.utcnow().isoformat(),
         "texto": texto,
         "title": title,
         "tags": tags or []
     }
-    ref.update(update_data)
+    try:
+        if DASHBOARD_ENABLED:
+            await _write_with_dashboard_tx(get_db().transaction(), ref, "notes", update_data, "update")
+        else:
+            await ref.update(update_data)
+    except NotFound:
+        raise HTTPException(status_code=404, detail="Nota no encontrada")
+    note_cache.delete(note_id)
+    _reindex("note", note_id, update_data)
     return {"status": "updated", **update_data}
 
-def delete_note(note_id: str) -> dict:
+async def delete_note(note_id: str) -> dict:
     """Elimina una nota por su ID."""
-    ref = db.collection("notes").document(note_id)
-    if not ref.get().exists:
+    ref = collection("notes").document(note_id)
+    try:
+        if DASHBOARD_ENABLED:
+            await _write_with_dashboard_tx(get_db().transaction(), ref, "notes", None, "delete")
+        else:
+            await ref.delete(option=_must_exist())
+    except NotFound:
         raise HTTPException(status_code=404, detail="Nota no encontrada")
-    ref.delete()
+    note_cache.delete(note_id)
+    _reindex("note", note_id, None)
     return {"status": "deleted"}
 
 
 # FOCUS TIME
-FOCUSCOL = db.collection("focus_times")
-TASKCOL  = db.collection("tareas")
+# Máximo de valores admitidos por Firestore en un filtro `in`
+IN_QUERY_LIMIT = 30
+
+# Total acumulado de minutos en foco, mantenido en el propio doc de la tarea
+FOCUS_TOTAL_FIELD = "focus_total_minutes"
 
 
 async def create_focus_time(data: FocusTimeCreate) -> Dict:
     # Leer la tarea para obtener user_id
-    task_snap = TASKCOL.document(data.task_id).get()
+    task_ref = collection("tareas").document(data.task_id)
+    task_snap = await task_ref.get()
     if not task_snap.exists:
         raise ValueError(f"Tarea con id {data.task_id} no encontrada")
-    user_id = task_snap.to_dict().get("user_id")
+    task = task_snap.to_dict()
+    user_id = task.get("user_id")
 
-    # Guardar nuevo FocusTime con user_id
+    # Guardar nuevo FocusTime con user_id y sumar al total de la tarea
+    # (y al bucket diario) en la misma escritura
     now = datetime.utcnow()
     payload = {
         "task_id":    data.task_id,
         "user_id":    user_id,
         "minutes":    data.minutes,
+        "tags":       task.get("tags") or [],
         "created_at": now,
         "updated_at": None
     }
-    doc_ref = FOCUSCOL.document()
-    doc_ref.set(payload)
+    doc_ref = collection("focus_times").document()
+    batch = get_db().batch()
+    batch.set(doc_ref, payload)
+    batch.update(task_ref, {FOCUS_TOTAL_FIELD: Increment(data.minutes)})
+    for _, ref, value in _dashboard_focus_write(user_id, data.minutes) + _focus_bucket_write(payload, data.minutes):
+        batch.set(ref, value, merge=True)
+    await batch.commit()
+    _invalidate_task(data.task_id)
     return {"id": doc_ref.id, **payload}
 
 
-async def update_focus_time(focus_id: str, data: FocusTimeUpdate) -> Dict:
-    # Verificar existencia
-    doc_ref = FOCUSCOL.document(focus_id)
-    snap = doc_ref.get()
+@transactional
+async def _apply_focus_update(transaction, doc_ref, minutes: int, now: datetime, rollup: bool = True) -> Dict:
+    snap = await doc_ref.get(transaction=transaction)
     if not snap.exists:
-        raise ValueError(f"FocusTime con id {focus_id} no encontrado")
+        raise ValueError(f"FocusTime con id {doc_ref.id} no encontrado")
+    data = snap.to_dict()
+    task_ref = collection("tareas").document(data["task_id"])
+
+    # Solo los registros antiguos sin user_id necesitan leer la tarea (y el
+    # dashboard, que suma por el dueño actual de la tarea)
+    owner = data.get("user_id")
+    if owner is None or (DASHBOARD_ENABLED and rollup):
+        task_snap = await task_ref.get(transaction=transaction)
+        owner = task_snap.to_dict().get("user_id") if task_snap.exists else None
+        if data.get("user_id") is None:
+            data["user_id"] = owner
+
+    transaction.update(doc_ref, {"minutes": minutes, "updated_at": now})
+    delta = minutes - data.get("minutes", 0)
+    if delta and rollup:
+        transaction.update(task_ref, {FOCUS_TOTAL_FIELD: Increment(delta)})
+        for _, ref, value in _dashboard_focus_write(owner, delta):
+            transaction.set(ref, value, merge=True)
+    # El bucket es el del día de la sesión y no depende de que la tarea exista
+    for _, ref, value in _focus_bucket_write(data, delta):
+        transaction.set(ref, value, merge=True)
+    return {"id": snap.id, **data, "minutes": minutes, "updated_at": now}
 
-    # Actualizar minutos y timestamp
+
+async def update_focus_time(focus_id: str, data: FocusTimeUpdate) -> Dict:
+    # Actualiza minutos y aplica la diferencia al total de la tarea en una transacción
     now = datetime.utcnow()
-    doc_ref.update({"minutes": data.minutes, "updated_at": now})
-    updated = doc_ref.get()
-    return {"id": updated.id, **updated.to_dict()}
+    doc_ref = collection("focus_times").document(focus_id)
+    try:
+        record = await _apply_focus_update(get_db().transaction(), doc_ref, data.minutes, now)
+    except NotFound:
+        # La tarea ya no existe: solo se actualiza la sesión
+        record = await _apply_focus_update(get_db().transaction(), doc_ref, data.minutes, now, rollup=False)
+    _invalidate_task(record["task_id"])
+    return record
 
 
-async def get_focus_by_task(task_id: str) -> List[Dict]:
+async def create_focus_times_batch(items: List[FocusTimeCreate]) -> Dict:
     """
-    Devuelve todos los FocusTime de una tarea, ordenados por fecha,
-    e incluye user_id incluso si el doc antiguo no lo tenía.
+    Registra varias sesiones de foco. Lee todas las tareas implicadas con una
+    sola RPC (get_all) y escribe cada sesión junto con su incremento del
+    total de la tarea en el mismo WriteBatch.
     """
-    docs = FOCUSCOL.where("task_id", "==", task_id).order_by("created_at").stream()
-    result: List[Dict] = []
+    _check_batch_size(items)
+    task_ids = list(dict.fromkeys(item.task_id for item in items))
+    tasks = {
+        snap.id: snap.to_dict()
+        async for snap in get_db().get_all([collection("tareas").document(tid) for tid in task_ids])
+        if snap.exists
+    }
 
-    for d in docs:
-        data = d.to_dict()
+    now = datetime.utcnow()
+    results: List[Dict] = []
+    item_writes = []
+    for i, item in enumerate(items):
+        if item.task_id not in tasks:
+            results.append({"index": i, "id": None, "status": "error", "error": f"Tarea con id {item.task_id} no encontrada"})
+            continue
+        task = tasks[item.task_id]
+        payload = {
+            "task_id":    item.task_id,
+            "user_id":    task.get("user_id"),
+            "minutes":    item.minutes,
+            "tags":       task.get("tags") or [],
+            "created_at": now,
+            "updated_at": None
+        }
+        doc_ref = collection("focus_times").document()
+        results.append({"index": i, "id": doc_ref.id, "status": "created", "error": None})
+        item_writes.append((i, [
+            ("set", doc_ref, payload),
+            ("update", collection("tareas").document(item.task_id), {FOCUS_TOTAL_FIELD: Increment(item.minutes)}),
+            *_dashboard_focus_write(payload["user_id"], item.minutes),
+            *_focus_bucket_write(payload, item.minutes),
+        ]))
 
-        # Si falta user_id, recupéralo de la tarea
-        if "user_id" not in data or data.get("user_id") is None:
-            task_snap = TASKCOL.document(task_id).get()
-            data["user_id"] = task_snap.to_dict().get("user_id") if task_snap.exists else None
+    await _commit_items(item_writes, results)
+    for tid in task_ids:
+        _invalidate_task(tid)
+    return _batch_summary(results)
 
-        result.append({
-            "id":          d.id,
-            "task_id":     data["task_id"],
-            "user_id":     data["user_id"],
-            "minutes":     data["minutes"],
-            "created_at":  data["created_at"],
-            "updated_at":  data["updated_at"],
-        })
 
-    return result
+FOCUS_ORDER = [("created_at", ASCENDING)]
+_FOCUS_FIELDS = ("task_id", "user_id", "minutes", "created_at", "updated_at")
+
+async def get_focus_by_task(
+    task_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    defer: Optional[Callable] = None,
+):
+    """
+    Devuelve los FocusTime de una tarea ordenados por fecha: la lista
+    completa, o una página {"items", "next_cursor"} si se indica
+    `limit`/`cursor` (cursor sobre created_at).
+
+    Los registros antiguos sin user_id se completan con el dueño de la tarea,
+    que se lee una sola vez por petición. Además se reparan en segundo plano
+    para que la lectura extra desaparezca: `defer(fn, *args)` programa la
+    reparación (p. ej. BackgroundTasks.add_task); por defecto se lanza como
+    tarea de asyncio.
+    """
+    query = collection("focus_times").where("task_id", "==", task_id)
+    if limit is not None or cursor is not None:
+        result = await paginate(query, limit, cursor, FOCUS_ORDER)
+        records = result["items"]
+    else:
+        query = query.order_by("created_at", direction=ASCENDING)
+        records = result = [doc.to_dict() | {"id": doc.id} async for doc in query.stream()]
+
+    legacy = [r for r in records if r.get("user_id") is None]
+    if legacy:
+        task_snap = await collection("tareas").document(task_id).get()
+        owner = task_snap.to_dict().get("user_id") if task_snap.exists else None
+        for r in legacy:
+            r["user_id"] = owner
+        if owner is not None:
+            _schedule(defer, _repair_focus_owners, [r["id"] for r in legacy], owner)
+
+    items = [{"id": r["id"], **{f: r.get(f) for f in _FOCUS_FIELDS}} for r in records]
+    if isinstance(result, dict):
+        return {"items": items, "next_cursor": result["next_cursor"]}
+    return items
+
+
+_background_tasks: Set[asyncio.Task] = set()
+
+def _schedule(defer: Optional[Callable], fn: Callable, *args) -> None:
+    if defer is not None:
+        defer(fn, *args)
+        return
+    # Guardamos la referencia: el loop solo mantiene referencias débiles
+    task = asyncio.get_running_loop().create_task(fn(*args))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def _repair_focus_owners(focus_ids: List[str], owner: str) -> None:
+    """Escribe el user_id que faltaba en FocusTime antiguos (en lotes, sin bloquear la respuesta)."""
+    try:
+        await _commit_items([
+            (i, [("update", collection("focus_times").document(fid), {"user_id": owner})])
+            for i, fid in enumerate(focus_ids)
+        ])
+    except Exception:
+        logger.exception("No se pudo reparar user_id en %d FocusTime", len(focus_ids))
 
 
 async def get_total_focus_time_by_user(user_id: str) -> List[Dict]:
     """
-    Agrupa y suma minutos de FocusTime por tarea de un usuario,
-    devolviendo lista ordenada descendente.
+    Devuelve los minutos de FocusTime por tarea de un usuario, ordenados
+    descendente. Lee los totales precalculados en cada tarea, sin recorrer
+    `focus_times`.
     """
-    # 1) Todas las tareas del usuario
-    task_snaps = list(TASKCOL.where("user_id", "==", user_id).stream())
-    if not task_snaps:
-        return []
+    task_snaps = collection("tareas").where("user_id", "==", user_id).select(["title", FOCUS_TOTAL_FIELD]).stream()
 
     summary: List[Dict] = []
-    # 2) Para cada tarea, suma sus focus_times
-    for t in task_snaps:
-        tid   = t.id
-        title = t.to_dict().get("title", "Sin título")
-        focus_snaps = list(FOCUSCOL.where("task_id", "==", tid).stream())
-        total = sum(f.to_dict().get("minutes", 0) for f in focus_snaps)
+    async for t in task_snaps:
+        data = t.to_dict()
+        total = data.get(FOCUS_TOTAL_FIELD) or 0
         if total > 0:
-            summary.append({"task_id": tid, "task_title": title, "total_minutes": total})
+            summary.append({"task_id": t.id, "task_title": data.get("title", "Sin título"), "total_minutes": total})
+
+    return sorted(summary, key=lambda x: x["total_minutes"], reverse=True)
+
+
+async def recompute_focus_rollups(user_id: Optional[str] = None) -> int:
+    """
+    Recalcula `focus_total_minutes` de las tareas (de un usuario o de todas)
+    a partir de `focus_times`. Sirve de backfill inicial y para corregir
+    desviaciones. Devuelve el número de tareas modificadas.
+    """
+    task_query = collection("tareas").where("user_id", "==", user_id) if user_id else collection("tareas")
+    stored = {t.id: t.to_dict().get(FOCUS_TOTAL_FIELD) async for t in task_query.select([FOCUS_TOTAL_FIELD]).stream()}
+
+    totals: Dict[str, int] = defaultdict(int)
+    focus_query = collection("focus_times").where("user_id", "==", user_id) if user_id else collection("focus_times")
+    async for f in focus_query.select(["task_id", "minutes"]).stream():
+        data = f.to_dict()
+        totals[data.get("task_id")] += data.get("minutes", 0)
+    if user_id:
+        # Los registros antiguos sin user_id solo se encuentran por task_id
+        await _add_legacy_focus_minutes(list(stored), totals)
+
+    changed = [tid for tid, value in stored.items() if (value or 0) != totals.get(tid, 0)]
+    await _commit_items([
+        (i, [("update", collection("tareas").document(tid), {FOCUS_TOTAL_FIELD: totals.get(tid, 0)})])
+        for i, tid in enumerate(changed)
+    ])
+    task_cache.clear()
+    user_tasks_cache.clear()
+    return len(changed)
+
+
+async def _add_legacy_focus_minutes(task_ids: List[str], totals: Dict[str, int]) -> None:
+    """
+    Suma los FocusTime antiguos (sin user_id) de las tareas indicadas.
+    Usa consultas `in` de hasta IN_QUERY_LIMIT tareas, así que cuesta
+    len(task_ids) / IN_QUERY_LIMIT lecturas en lugar de una por tarea.
+    """
+    for i in range(0, len(task_ids), IN_QUERY_LIMIT):
+        chunk = task_ids[i:i + IN_QUERY_LIMIT]
+        query = collection("focus_times").where("task_id", "in", chunk).select(["task_id", "minutes", "user_id"])
+        async for f in query.stream():
+            data = f.to_dict()
+            if data.get("user_id") is None:
+                totals[data.get("task_id")] += data.get("minutes", 0)
+
+
+# ——— Estadísticas de foco por periodos ———
+#
+# Cada sesión suma sus minutos a un documento diario por usuario,
+# `focus_buckets/{user_id}_{YYYY-MM-DD}` (día UTC de creación de la sesión):
+#
+#   {user_id, day, total_minutes, by_task: {task_id: min}, by_tag: {tag: min}}
+#
+# Se mantienen con Increment en la misma escritura que la sesión, así que
+# cualquier rango se responde leyendo como mucho un documento pequeño por
+# día con actividad. Una sesión cuenta entera para cada etiqueta que tenía
+# su tarea al registrarse (guardadas en la propia sesión).
+# rebuild_focus_buckets los recalcula desde `focus_times`.
+
+FOCUS_BUCKETS = "focus_buckets"
+FOCUS_STATS_BUCKETS = ("day", "week", "month")
+FOCUS_STATS_GROUPS = {"task": "by_task", "tag": "by_tag"}
+FOCUS_STATS_MAX_DAYS = int(os.getenv("TASKO_FOCUS_STATS_MAX_DAYS", "1100"))
+FOCUS_STATS_DEFAULT_DAYS = 30
+# A partir de cuántos días leídos se agrega con NumPy (si está instalado)
+FOCUS_STATS_NUMPY_MIN_DAYS = int(os.getenv("TASKO_FOCUS_STATS_NUMPY_MIN", "90"))
+
+def _focus_bucket_ref(user_id: str, day: str):
+    return collection(FOCUS_BUCKETS).document(f"{user_id}_{day}")
+
+def _focus_bucket_write(session: dict, minutes: int) -> List[tuple]:
+    """Escritura (merge con Increment) que suma `minutes` al bucket diario de la sesión."""
+    user_id = session.get("user_id")
+    if not user_id or not minutes or not session.get("created_at"):
+        return []
+    day = session["created_at"].strftime("%Y-%m-%d")
+    data = {
+        "user_id": user_id,
+        "day": day,
+        "total_minutes": Increment(minutes),
+        "by_task": {session["task_id"]: Increment(minutes)},
+    }
+    # Un mapa vacío en un set con merge sustituiría el existente
+    if session.get("tags"):
+        data["by_tag"] = {tag: Increment(minutes) for tag in session["tags"]}
+    return [("merge", _focus_bucket_ref(user_id, day), data)]
+
+
+def _numpy():
+    # Import diferido: NumPy solo se carga si alguna consulta lo necesita
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def _bucket_start(day: str, bucket: str) -> str:
+    if bucket == "day":
+        return day
+    d = datetime.strptime(day, "%Y-%m-%d")
+    if bucket == "week":
+        d -= timedelta(days=d.weekday())  # semanas ISO, de lunes a domingo
+    else:
+        d = d.replace(day=1)
+    return d.strftime("%Y-%m-%d")
+
+def _merge_focus_buckets(days: List[dict], bucket: str, group_field: Optional[str]) -> List[dict]:
+    """Agrupa los documentos diarios en periodos (día, semana o mes) con Python puro."""
+    merged: Dict[str, dict] = {}
+    for doc in days:
+        start = _bucket_start(doc["day"], bucket)
+        out = merged.setdefault(start, {"start": start, "total_minutes": 0, "groups": defaultdict(int)})
+        out["total_minutes"] += doc.get("total_minutes") or 0
+        if group_field:
+            for key, minutes in (doc.get(group_field) or {}).items():
+                out["groups"][key] += minutes
+    return [merged[k] for k in sorted(merged)]
+
+def _merge_focus_buckets_numpy(np, days: List[dict], bucket: str, group_field: Optional[str]) -> List[dict]:
+    """Mismo resultado que _merge_focus_buckets, vectorizado para rangos largos."""
+    day_arr = np.array([doc["day"] for doc in days], dtype="datetime64[D]")
+    if bucket == "week":
+        # 1970-01-01 fue jueves: (días + 3) % 7 es el día de la semana con lunes = 0
+        starts = day_arr - (day_arr.astype("int64") + 3) % 7
+    elif bucket == "month":
+        starts = day_arr.astype("datetime64[M]").astype("datetime64[D]")
+    else:
+        starts = day_arr
+    labels, index = np.unique(starts, return_inverse=True)
+
+    totals = np.zeros(len(labels), dtype="int64")
+    np.add.at(totals, index, np.array([doc.get("total_minutes") or 0 for doc in days], dtype="int64"))
+
+    groups = [{} for _ in labels]
+    if group_field:
+        keys: Dict[str, int] = {}
+        rows, cols, values = [], [], []
+        for i, doc in enumerate(days):
+            for key, minutes in (doc.get(group_field) or {}).items():
+                rows.append(index[i])
+                cols.append(keys.setdefault(key, len(keys)))
+                values.append(minutes)
+        if keys:
+            matrix = np.zeros((len(labels), len(keys)), dtype="int64")
+            np.add.at(matrix, (np.array(rows), np.array(cols)), np.array(values, dtype="int64"))
+            names = list(keys)
+            for row, col in zip(*np.nonzero(matrix)):
+                groups[row][names[col]] = int(matrix[row, col])
+
+    return [
+        {"start": str(label), "total_minutes": int(total), "groups": group}
+        for label, total, group in zip(labels, totals, groups)
+    ]
+
+async def get_focus_stats(
+    user_id: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    bucket: str = "day",
+    group_by: Optional[str] = None,
+) -> dict:
+    """
+    Minutos en foco de un usuario entre dos fechas (inclusive, dd-mm-YYYY o
+    YYYY-MM-DD), agregados por día, semana o mes y opcionalmente por tarea o
+    etiqueta. Por defecto, los últimos FOCUS_STATS_DEFAULT_DAYS días.
+    """
+    if bucket not in FOCUS_STATS_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket inválido. Usa uno de {list(FOCUS_STATS_BUCKETS)}")
+    if group_by is not None and group_by not in FOCUS_STATS_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by inválido. Usa uno de {list(FOCUS_STATS_GROUPS)}")
+    end = _parse_due_filter(date_to) if date_to else datetime.utcnow().strftime("%Y-%m-%d")
+    start = _parse_due_filter(date_from) if date_from else \
+        (datetime.strptime(end, "%Y-%m-%d") - timedelta(days=FOCUS_STATS_DEFAULT_DAYS - 1)).strftime("%Y-%m-%d")
+    span = (datetime.strptime(end, "%Y-%m-%d") - datetime.strptime(start, "%Y-%m-%d")).days + 1
+    if span < 1:
+        raise HTTPException(status_code=400, detail="`from` debe ser anterior o igual a `to`")
+    if span > FOCUS_STATS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango no puede superar {FOCUS_STATS_MAX_DAYS} días")
+
+    group_field = FOCUS_STATS_GROUPS.get(group_by)
+    fields = ["day", "total_minutes"] + ([group_field] if group_field else [])
+    query = (collection(FOCUS_BUCKETS)
+             .where("user_id", "==", user_id)
+             .where("day", ">=", start)
+             .where("day", "<=", end)
+             .select(fields))
+    days = [doc.to_dict() async for doc in query.stream()]
+
+    np = _numpy() if len(days) >= FOCUS_STATS_NUMPY_MIN_DAYS else None
+    if np is not None:
+        buckets = _merge_focus_buckets_numpy(np, days, bucket, group_field)
+    else:
+        buckets = _merge_focus_buckets(days, bucket, group_field)
+    for b in buckets:
+        if group_field:
+            b["groups"] = dict(sorted(b["groups"].items(), key=lambda kv: (-kv[1], kv[0])))
+        else:
+            del b["groups"]
+
+    return {
+        "user_id": user_id,
+        "from": start,
+        "to": end,
+        "bucket": bucket,
+        "group_by": group_by,
+        "total_minutes": sum(b["total_minutes"] for b in buckets),
+        "buckets": buckets,
+    }
+
+
+async def rebuild_focus_buckets(user_id: Optional[str] = None) -> int:
+    """
+    Recalcula los buckets diarios (de un usuario o de todos) desde
+    `focus_times`: backfill inicial y corrección de desviaciones. Las
+    sesiones antiguas sin user_id o sin etiquetas toman las de su tarea.
+    Devuelve el número de buckets escritos.
+    """
+    task_query = collection("tareas").where("user_id", "==", user_id) if user_id else collection("tareas")
+    tasks = {t.id: t.to_dict() async for t in task_query.select(["user_id", "tags"]).stream()}
+
+    fields = ["task_id", "user_id", "minutes", "tags", "created_at"]
+    sessions: List[dict] = []
+    if user_id:
+        query = collection("focus_times").where("user_id", "==", user_id).select(fields)
+        sessions += [f.to_dict() async for f in query.stream()]
+        # Los registros antiguos sin user_id solo se encuentran por task_id
+        task_ids = list(tasks)
+        for i in range(0, len(task_ids), IN_QUERY_LIMIT):
+            query = collection("focus_times").where("task_id", "in", task_ids[i:i + IN_QUERY_LIMIT]).select(fields)
+            async for f in query.stream():
+                data = f.to_dict()
+                if data.get("user_id") is None:
+                    sessions.append(data)
+    else:
+        sessions = [f.to_dict() async for f in collection("focus_times").select(fields).stream()]
+
+    buckets: Dict[tuple, dict] = {}
+    for session in sessions:
+        task = tasks.get(session.get("task_id")) or {}
+        owner = session.get("user_id") or task.get("user_id")
+        if not owner or not session.get("created_at"):
+            continue
+        tags = session["tags"] if session.get("tags") is not None else task.get("tags") or []
+        day = session["created_at"].strftime("%Y-%m-%d")
+        minutes = session.get("minutes") or 0
+        doc = buckets.setdefault((owner, day), {
+            "user_id": owner, "day": day, "total_minutes": 0,
+            "by_task": defaultdict(int), "by_tag": defaultdict(int),
+        })
+        doc["total_minutes"] += minutes
+        doc["by_task"][session["task_id"]] += minutes
+        for tag in tags:
+            doc["by_tag"][tag] += minutes
+
+    existing_query = collection(FOCUS_BUCKETS).where("user_id", "==", user_id) if user_id else collection(FOCUS_BUCKETS)
+    fresh = {f"{owner}_{day}" for owner, day in buckets}
+    stale = [d.id async for d in existing_query.select([]).stream() if d.id not in fresh]
+    writes = [
+        ("set", _focus_bucket_ref(owner, day), {**doc, "by_task": dict(doc["by_task"]), "by_tag": dict(doc["by_tag"])})
+        for (owner, day), doc in buckets.items()
+    ] + [("delete", collection(FOCUS_BUCKETS).document(doc_id), None) for doc_id in stale]
+    await _commit_items([(i, [w]) for i, w in enumerate(writes)])
+    return len(buckets)
+
+
+# ——— Dashboard por usuario ———
+#
+# Con TASKO_DASHBOARD=1 cada usuario tiene un documento `dashboards/{user_id}`
+# con todo lo que pide la pantalla de inicio: contadores de tareas por
+# estado y prioridad, las próximas tareas por fecha límite, las notas
+# recientes y el total de minutos en foco. Las escrituras de tareas y notas
+# lo actualizan en la misma transacción (los focos, con Increment en el
+# mismo batch), así que GET /users/{id}/dashboard es una sola lectura.
+#
+# Si el documento no existe o está marcado `stale` (escrituras por lotes,
+# migraciones) se reconstruye desde cero en la siguiente lectura.
+# scripts/rebuild_dashboards repara desviaciones.
+
+DASHBOARD_ENABLED = os.getenv("TASKO_DASHBOARD", "0") == "1"
+DASHBOARD_UPCOMING = int(os.getenv("TASKO_DASHBOARD_UPCOMING", "5"))
+DASHBOARD_RECENT_NOTES = int(os.getenv("TASKO_DASHBOARD_NOTES", "5"))
+
+_UPCOMING_FIELDS = ("title", "due_date", DUE_ISO_FIELD, "status", "priority")
+_RECENT_NOTE_FIELDS = ("title", "updated_at")
+
+def _dashboard_ref(user_id: str):
+    return collection("dashboards").document(user_id)
+
+def _empty_dashboard(user_id: str) -> dict:
+    return {
+        "user_id": user_id,
+        "tasks": {
+            "total": 0,
+            "completed": 0,
+            "by_status": {s: 0 for s in VALID_STATUSES},
+            "by_priority": {p: 0 for p in VALID_PRIORITIES},
+        },
+        "upcoming": [],
+        "recent_notes": [],
+        "focus_total_minutes": 0,
+    }
+
+def _is_complete_dashboard(data: Optional[dict]) -> bool:
+    # Un Increment de foco sobre un dashboard inexistente deja un doc parcial
+    return bool(data) and "tasks" in data and not data.get("stale")
+
+def _upcoming_key(entry: dict) -> tuple:
+    return entry.get(DUE_ISO_FIELD) or "", entry["id"]
+
+def _note_key(entry: dict) -> tuple:
+    return str(entry.get("updated_at") or ""), entry["id"]
+
+def _upcoming_entry(task_id: str, task: dict) -> Optional[dict]:
+    if task.get("completed") or not task.get(DUE_ISO_FIELD):
+        return None
+    return {"id": task_id, **{f: task.get(f) for f in _UPCOMING_FIELDS}}
+
+def _note_entry(note_id: str, note: dict) -> dict:
+    return {"id": note_id, **{f: note.get(f) for f in _RECENT_NOTE_FIELDS}}
+
+def _rank(entries: List[dict], item_id: str, entry: Optional[dict], key, size: int, reverse: bool = False):
+    """
+    Sustituye `item_id` por `entry` en una lista top-N ordenada. Devuelve
+    (lista, hace_falta_rellenar). Si la lista estaba llena solo es fiable
+    hasta su último elemento: lo que quede detrás puede no ser el siguiente
+    real, y entonces hay que volver a consultar.
+    """
+    bound = key(entries[-1]) if len(entries) >= size else None
+    ranked = [e for e in entries if e["id"] != item_id]
+    if entry is not None:
+        ranked.append(entry)
+    if bound is not None:
+        ranked = [e for e in ranked if (key(e) >= bound if reverse else key(e) <= bound)]
+    ranked.sort(key=key, reverse=reverse)
+    return ranked[:size], bound is not None and len(ranked) < size
+
+def _count_task(dash: dict, task: dict, sign: int) -> None:
+    counts = dash["tasks"]
+    counts["total"] += sign
+    if task.get("completed"):
+        counts["completed"] += sign
+    status = normalize_status(task.get("status") or "Pendiente")
+    priority = normalize_priority(task.get("priority") or "Media")
+    counts["by_status"][status] = counts["by_status"].get(status, 0) + sign
+    counts["by_priority"][priority] = counts["by_priority"].get(priority, 0) + sign
+    dash["focus_total_minutes"] = dash.get("focus_total_minutes", 0) + sign * (task.get(FOCUS_TOTAL_FIELD) or 0)
+
+def _apply_task_change(dash: dict, task_id: str, old: Optional[dict], new: Optional[dict]) -> bool:
+    if old is not None:
+        _count_task(dash, old, -1)
+    if new is not None:
+        _count_task(dash, new, +1)
+    entry = _upcoming_entry(task_id, new) if new is not None else None
+    dash["upcoming"], refill = _rank(dash["upcoming"], task_id, entry, _upcoming_key, DASHBOARD_UPCOMING)
+    return refill
+
+def _apply_note_change(dash: dict, note_id: str, old: Optional[dict], new: Optional[dict]) -> bool:
+    entry = _note_entry(note_id, new) if new is not None else None
+    dash["recent_notes"], refill = _rank(
+        dash["recent_notes"], note_id, entry, _note_key, DASHBOARD_RECENT_NOTES, reverse=True,
+    )
+    return refill
+
+def _upcoming_query(user_id: str):
+    return (
+        collection("tareas").where("user_id", "==", user_id).where("completed", "==", False)
+        .order_by(DUE_ISO_FIELD).select(list(_UPCOMING_FIELDS) + ["completed"])
+    )
+
+def _recent_notes_query(user_id: str):
+    return (
+        collection("notes").where("user_id", "==", user_id)
+        .order_by("updated_at", direction=DESCENDING).select(list(_RECENT_NOTE_FIELDS))
+    )
+
+_DASHBOARD_KINDS = {
+    # colección: (aplicar cambio, consulta de relleno, entrada, clave, tamaño, campo de la lista, descendente)
+    "tareas": (_apply_task_change, _upcoming_query, _upcoming_entry, _upcoming_key, DASHBOARD_UPCOMING, "upcoming", False),
+    "notes":  (_apply_note_change, _recent_notes_query, _note_entry, _note_key, DASHBOARD_RECENT_NOTES, "recent_notes", True),
+}
+
+async def _stage_dashboard_change(transaction, kind: str, item_id: str, old: Optional[dict], new: Optional[dict]) -> None:
+    """
+    Aplica a los dashboards afectados (del dueño anterior y del nuevo) el
+    cambio de una tarea o nota. Hace todas las lecturas antes de escribir,
+    como exige Firestore en las transacciones.
+    """
+    apply, refill_query, make_entry, key, size, list_field, reverse = _DASHBOARD_KINDS[kind]
+    owners = dict.fromkeys(u for u in ((old or {}).get("user_id"), (new or {}).get("user_id")) if u)
+
+    staged = {}
+    for uid in owners:
+        snap = await _dashboard_ref(uid).get(transaction=transaction)
+        dash = snap.to_dict() if snap.exists else None
+        if not _is_complete_dashboard(dash):
+            continue  # se construirá entero en la próxima lectura
+        o = old if old is not None and old.get("user_id") == uid else None
+        n = new if new is not None and new.get("user_id") == uid else None
+        if apply(dash, item_id, o, n):
+            # La lista top-N se quedó corta: se rellena con una consulta
+            # (que aún no ve esta escritura, de ahí que se re-aplique)
+            entries = []
+            async for doc in await transaction.get(refill_query(uid).limit(size + 1)):
+                e = make_entry(doc.id, doc.to_dict())
+                if e is not None and e["id"] != item_id:
+                    entries.append(e)
+            dash[list_field], _ = _rank(entries, item_id, make_entry(item_id, n) if n else None, key, size, reverse)
+        staged[uid] = dash
+
+    now = datetime.utcnow()
+    for uid, dash in staged.items():
+        transaction.set(_dashboard_ref(uid), dash | {"updated_at": now})
+
+@transactional
+async def _write_with_dashboard_tx(
+    transaction, ref, kind: str, data: Optional[dict], mode: str, step_updates: Optional[List[dict]] = None,
+) -> Optional[dict]:
+    """
+    Escribe una tarea o nota (mode: create/update/delete) y sus dashboards en
+    la misma transacción. Devuelve el documento anterior (None al crear).
+    """
+    old = None
+    if mode != "create":
+        snap = await ref.get(transaction=transaction)
+        if not snap.exists:
+            detail = "Tarea no encontrada" if kind == "tareas" else "Nota no encontrada"
+            raise HTTPException(status_code=404, detail=detail)
+        old = snap.to_dict()
+    if step_updates:
+        data = {**data, "steps": _apply_step_updates(old.get("steps"), step_updates)}
+    new = None if mode == "delete" else (old or {}) | data
+
+    await _stage_dashboard_change(transaction, kind, ref.id, old, new)
+    if mode == "create":
+        transaction.create(ref, data)
+    elif mode == "update":
+        transaction.update(ref, data)
+    else:
+        transaction.delete(ref)
+    return old
+
+def _dashboard_focus_write(user_id: Optional[str], minutes: int) -> List[tuple]:
+    """Escritura (tipo, ref, datos) que suma minutos de foco al dashboard del usuario."""
+    if not DASHBOARD_ENABLED or not user_id or not minutes:
+        return []
+    return [("merge", _dashboard_ref(user_id), {"focus_total_minutes": Increment(minutes)})]
+
+async def _mark_dashboards_stale(user_ids) -> None:
+    """Para escrituras por lotes: el dashboard se reconstruye en la próxima lectura."""
+    user_ids = [u for u in dict.fromkeys(user_ids) if u]
+    if not DASHBOARD_ENABLED or not user_ids:
+        return
+    await _commit_items([(i, [("merge", _dashboard_ref(u), {"stale": True})]) for i, u in enumerate(user_ids)])
+
+async def _build_dashboard(user_id: str) -> dict:
+    """Calcula el dashboard desde cero (una consulta de tareas y otra de notas)."""
+    dash = _empty_dashboard(user_id)
+    fields = list(dict.fromkeys(_UPCOMING_FIELDS + ("completed", "user_id", FOCUS_TOTAL_FIELD)))
+    upcoming = []
+    async for doc in collection("tareas").where("user_id", "==", user_id).select(fields).stream():
+        task = doc.to_dict()
+        _count_task(dash, task, +1)
+        entry = _upcoming_entry(doc.id, task)
+        if entry is not None:
+            upcoming.append(entry)
+    dash["upcoming"] = sorted(upcoming, key=_upcoming_key)[:DASHBOARD_UPCOMING]
+    dash["recent_notes"] = [
+        _note_entry(doc.id, doc.to_dict())
+        async for doc in _recent_notes_query(user_id).limit(DASHBOARD_RECENT_NOTES).stream()
+    ]
+    dash["updated_at"] = datetime.utcnow()
+    return dash
+
+async def rebuild_dashboard(user_id: str) -> dict:
+    dash = await _build_dashboard(user_id)
+    await _dashboard_ref(user_id).set(dash)
+    return dash
+
+async def rebuild_dashboards(user_id: Optional[str] = None) -> int:
+    """
+    Reconstruye los dashboards (de un usuario o de todos). No es
+    transaccional: una escritura concurrente puede requerir otra pasada.
+    """
+    user_ids = [user_id] if user_id else [doc.id async for doc in collection("users").select([]).stream()]
+    for uid in user_ids:
+        await rebuild_dashboard(uid)
+    return len(user_ids)
+
+async def search_user_content(user_id: str, q: str, limit: int = 20, kinds: Optional[List[str]] = None) -> List[dict]:
+    """Búsqueda de texto en las tareas y notas de un usuario (ver search.py)."""
+    return await search.index.search(user_id, q, limit, kinds)
+
+async def get_dashboard(user_id: str) -> dict:
+    """
+    Dashboard del usuario: una lectura si está activo y al día; si no existe
+    o está obsoleto se reconstruye. Sin TASKO_DASHBOARD se calcula al vuelo.
+    """
+    if not DASHBOARD_ENABLED:
+        return await _build_dashboard(user_id)
+    snap = await _dashboard_ref(user_id).get()
+    data = snap.to_dict() if snap.exists else None
+    if not _is_complete_dashboard(data):
+        data = await rebuild_dashboard(user_id)
+    return data
+
 
-    # 3) Ordenar por total_minutes desc.
-    return sorted(summary, key=lambda x: x["total_minutes"], reverse=True)
\ No newline at end of file
+# Latencia, RPCs y lecturas por función pública en /metrics
+metrics.instrument_module(sys.modules[__name__])
@@ -1,67 +1,174 @@
 import os
 import json
+import sys
+import threading
 import traceback
-from dotenv import load_dotenv
-from google.cloud import firestore
-from google.oauth2 import service_account
 
 # ————— Carga de entorno —————
-# En producción (Vercel) no usa .env, pero local sí.
+# En producción (Vercel) no usa .env, pero local sí. Se carga al importar
+# este módulo, antes que los demás de la app: varios leen sus flags del
+# entorno al importarse (TASKO_MIRROR, TASKO_DASHBOARD, TASKO_CACHE_*...).
+# python-dotenv es ligero; lo caro es el SDK de Firestore, que sigue diferido.
+from dotenv import load_dotenv
 load_dotenv()
 
-# Detecta si queremos usar el emulador local
-USE_EMULATOR = bool(os.getenv("FIRESTORE_EMULATOR_HOST"))
-
-try:
-    if USE_EMULATOR:
-        # Conexión a emulador local
-        # Asegúrate de arrancar el emulador con:
-        #   gcloud beta emulators firestore start --project=demo-project
-        # y de exportar:
-        #   export FIRESTORE_EMULATOR_HOST="localhost:8080"
-        print("🔧 Conectando a Firestore en modo EMULADOR")
-        db = firestore.Client(project="demo-project")
+import metrics  # noqa: E402
+
+# ————— Inicialización perezosa —————
+# Credenciales, el SDK de Firestore (~250 ms de imports) y el cliente se
+# cargan en el primer acceso a la base de datos. Así un arranque en frío en
+# Vercel que solo sirve rutas como `/` no paga nada de esto (ver
+# scripts/profile_startup.py).
+
+def storage_backend() -> str:
+    """Backend de almacenamiento: "firestore" (por defecto) o "memory" (motor en memoria, sin credenciales)."""
+    return os.getenv("TASKO_STORAGE", "firestore").lower()
+
+def use_emulator() -> bool:
+    # Detecta si queremos usar el emulador local
+    return bool(os.getenv("FIRESTORE_EMULATOR_HOST"))
+
+
+def _create_firestore_client(client_cls=None):
+    from google.cloud import firestore
+    from google.oauth2 import service_account
+
+    client_cls = client_cls or firestore.AsyncClient
+    emulator = use_emulator()
+    try:
+        if emulator:
+            # Conexión a emulador local
+            # Asegúrate de arrancar el emulador con:
+            #   gcloud beta emulators firestore start --project=demo-project
+            # y de exportar:
+            #   export FIRESTORE_EMULATOR_HOST="localhost:8080"
+            print("🔧 Conectando a Firestore en modo EMULADOR")
+            client = client_cls(project="demo-project")
+        else:
+            # Conexión a Firestore real usando credenciales en ENV VARS
+            print("🔐 Conectando a Firestore con credenciales desde ENV VARS")
+
+            svc_json = os.getenv("SERVICE_ACCOUNT_KEY")
+            if not svc_json:
+                raise RuntimeError("⚠️ ENV VAR `SERVICE_ACCOUNT_KEY` vacía o no definida.")
+
+            # Si tu JSON está en Base64, descoméntalo:
+            # import base64
+            # svc_json = base64.b64decode(svc_json).decode("utf-8")
+
+            info = json.loads(svc_json)
+            creds = service_account.Credentials.from_service_account_info(info)
+
+            project_id = os.getenv("FIRESTORE_PROJECT_ID")
+            if not project_id:
+                raise RuntimeError("⚠️ ENV VAR `FIRESTORE_PROJECT_ID` vacía o no definida.")
+
+            client = client_cls(project=project_id, credentials=creds)
+
+        print(f"[Firestore] Uso emulador? {emulator}")
+        if not emulator:
+            print(f"[Firestore] Proyecto = {project_id}")
+        return client
+
+    except Exception:
+        # Capturamos cualquier fallo en la inicialización y lo logeamos
+        print("❌ Error inicializando Firestore:")
+        traceback.print_exc()
+        # Re-lanzamos para que Vercel marque la función como caída y veas el log
+        raise
+
+
+def _create_client():
+    backend = storage_backend()
+    if backend == "memory":
+        import memory_store
+        print("🧪 Usando almacenamiento EN MEMORIA (TASKO_STORAGE=memory)")
+        client = memory_store.MemoryClient()
+    elif backend == "firestore":
+        client = _create_firestore_client()
     else:
-        # Conexión a Firestore real usando credenciales en ENV VARS
-        print("🔐 Conectando a Firestore con credenciales desde ENV VARS")
+        raise RuntimeError(f"⚠️ TASKO_STORAGE desconocido: {backend!r} (usa 'firestore' o 'memory')")
+    # RPCs y lecturas por petición y por función de crud en /metrics
+    metrics.instrument_client(client)
+    return client
+
+
+db = None
+_db_lock = threading.Lock()
+
+
+# ————— Interfaz de almacenamiento —————
+# `crud` accede siempre a través de estas funciones, nunca a un cliente
+# capturado al importar, para poder sustituir el backend (p. ej. un
+# MemoryClient limpio por prueba o benchmark).
+
+def get_db():
+    global db
+    if db is None:
+        with _db_lock:
+            if db is None:
+                db = _create_client()
+    return db
 
-        svc_json = os.getenv("SERVICE_ACCOUNT_KEY")
-        if not svc_json:
-            raise RuntimeError("⚠️ ENV VAR `SERVICE_ACCOUNT_KEY` vacía o no definida.")
+def set_db(client):
+    global db
+    db = client
 
-        # Si tu JSON está en Base64, descoméntalo:
-        # import base64
-        # svc_json = base64.b64decode(svc_json).decode("utf-8")
+def collection(name: str):
+    return get_db().collection(name)
 
-        info = json.loads(svc_json)
-        creds = service_account.Credentials.from_service_account_info(info)
+def _is_memory(obj, cls_name: str) -> bool:
+    # memory_store solo está importado si se usa el backend en memoria
+    memory_store = sys.modules.get("memory_store")
+    return memory_store is not None and isinstance(obj, getattr(memory_store, cls_name))
 
-        project_id = os.getenv("FIRESTORE_PROJECT_ID")
-        if not project_id:
-            raise RuntimeError("⚠️ ENV VAR `FIRESTORE_PROJECT_ID` vacía o no definida.")
+_listener_client = None
 
-        db = firestore.Client(project=project_id, credentials=creds)
+def get_listener_client():
+    """
+    Cliente para listeners `on_snapshot`. El AsyncClient no los soporta, así
+    que con Firestore se abre (una sola vez) un cliente síncrono aparte; el
+    backend en memoria los implementa directamente.
+    """
+    global _listener_client
+    client = get_db()
+    if _is_memory(client, "MemoryClient"):
+        return client
+    if _listener_client is None:
+        from google.cloud import firestore
+        _listener_client = _create_firestore_client(firestore.Client)
+    return _listener_client
 
-    print(f"[Firestore] Uso emulador? {USE_EMULATOR}")
-    if not USE_EMULATOR:
-        print(f"[Firestore] Proyecto = {project_id}")
+def transactional(fn):
+    """
+    Equivalente a `firestore.async_transactional` válido para ambos backends:
+    elige la implementación según el tipo de transacción recibida. Los
+    envoltorios se crean en la primera llamada para no importar el SDK al
+    decorar.
+    """
+    wrapped = {}
 
-except Exception:
-    # Capturamos cualquier fallo en la inicialización y lo logeamos
-    print("❌ Error inicializando Firestore:")
-    traceback.print_exc()
-    # Re-lanzamos para que Vercel marque la función como caída y veas el log
-    raise
+    async def wrapper(transaction, *args, **kwargs):
+        if _is_memory(transaction, "MemoryTransaction"):
+            if "memory" not in wrapped:
+                import memory_store
+                wrapped["memory"] = memory_store.transactional(fn)
+            return await wrapped["memory"](transaction, *args, **kwargs)
+        if "firestore" not in wrapped:
+            from google.cloud import firestore
+            wrapped["firestore"] = firestore.async_transactional(fn)
+        return await wrapped["firestore"](transaction, *args, **kwargs)
+    return wrapper
 
 # ————— Función de utilidad: listar colecciones —————
-def list_collections():
-    return [col.id for col in db.collections()]
+async def list_collections():
+    return [col.id async for col in get_db().collections()]
 
 # ————— Función de utilidad: muestreo de documentos —————
-def sample_docs(collection_names=None, limit=1):
+async def sample_docs(collection_names=None, limit=1):
     resp = {}
-    names = collection_names or list_collections()
+    names = collection_names or await list_collections()
     for name in names:
-        docs = db.collection(name).limit(limit).stream()
-        resp[name] = [{**doc.to_dict(), "id": doc.id} for doc in docs] or "colección vacía"
-    return resp
\ No newline at end of file
+        docs = collection(name).limit(limit).stream()
+        resp[name] = [{**doc.to_dict(), "id": doc.id} async for doc in docs] or "colección vacía"
+    return resp
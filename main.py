@@ -1,17 +1,47 @@
-from fastapi import FastAPI, HTTPException, Request, Path, status
+from fastapi import FastAPI, BackgroundTasks, Depends, Header, HTTPException, Request, Path, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import List
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import AsyncIterable, List, Optional, Union
+import asyncio
+import importlib.util
 import logging
-import crud
+import sys
+import time
+import database  # primero: carga .env antes de que los demás módulos lean sus flags
+import cache
+import metrics
+import mirror
+import profiling
+import search
 
 from models import (
     User, Note,
-    TaskCreate, TaskUpdate, TaskInDB,
-    FocusTimeCreate, FocusTimeUpdate, FocusTimeInDB, FocusSummaryOut
+    TaskCreate, TaskUpdate, TaskPartialUpdate, TaskPatchResult, TaskInDB, TaskPage, TaskFilters, TaskBatchUpdate, BatchResult,
+    FocusTimeCreate, FocusTimeUpdate, FocusTimeInDB, FocusTimePage, FocusSummaryOut, FocusStatsOut
 )
 
 from database import list_collections, sample_docs
+from pagination import MAX_PAGE_SIZE
+from responses import FastJSONResponse, dumps, project, project_all
+
+
+def _lazy_import(name: str):
+    """
+    Importa `name` de forma diferida: el módulo se ejecuta en el primer acceso
+    a uno de sus atributos. `crud` arrastra el SDK de Firestore (~250 ms), que
+    un arranque en frío que solo sirve `/` no necesita.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+crud = _lazy_import("crud")
 
 app = FastAPI(
     title="Tasko API",
@@ -30,6 +60,74 @@ app.add_middleware(
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# Métricas por petición: latencia por ruta, RPCs y documentos leídos de
+# Firestore (ver metrics.py). Se exponen en /metrics y, por petición, en la
+# cabecera Server-Timing.
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    stats, token = metrics.start_request()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        elapsed = time.perf_counter() - start
+        response.headers["Server-Timing"] = metrics.server_timing(elapsed, stats)
+        response.headers["Timing-Allow-Origin"] = "*"
+        return response
+    finally:
+        # Plantilla de la ruta (/tasks/{task_id}), no la URL, para acotar las series
+        route = request.scope.get("route")
+        metrics.observe_request(
+            request.method, getattr(route, "path", "sin_ruta"), status_code,
+            time.perf_counter() - start, stats,
+        )
+        metrics.end_request(token)
+
+# Perfilado bajo demanda (solo con TASKO_PROFILE_TOKEN; ver profiling.py)
+if profiling.ENABLED:
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        """Con ?profile=1 y el token, responde con el resumen de cProfile de la petición."""
+        if request.query_params.get("profile") != "1" or \
+                not profiling.authorized(request.headers.get(profiling.TOKEN_HEADER)):
+            return await call_next(request)
+        try:
+            with profiling.RequestProfiler() as profiler:
+                response = await call_next(request)
+                # Consumir el cuerpo dentro del perfil incluye también las respuestas en streaming
+                async for _ in response.body_iterator:
+                    pass
+        except profiling.ProfilerBusy as e:
+            return JSONResponse({"detail": str(e)}, status_code=409)
+        header = f"{request.method} {request.url.path} -> {response.status_code}\n\n"
+        return PlainTextResponse(header + profiler.summary())
+
+# Espejo on_snapshot opcional (TASKO_MIRROR=1)
+@app.on_event("startup")
+def start_mirror():
+    if mirror.MIRROR_ENABLED:
+        # `crud` registra al importarse los listeners que invalidan sus cachés
+        crud.get_dashboard
+    mirror.start()
+
+@app.on_event("shutdown")
+def stop_mirror():
+    mirror.stop()
+
+# Índice de búsqueda: arranque en caliente desde el último snapshot
+@app.on_event("startup")
+def load_search_index():
+    search.index.load()
+
+@app.on_event("shutdown")
+def save_search_index():
+    try:
+        search.index.save()
+    except OSError:
+        logging.exception("No se pudo guardar el snapshot de búsqueda")
 
 # Rutas básicas
 @app.get("/")
@@ -38,11 +136,91 @@ def read_root():
 
 @app.get("/debug/collections")
 async def get_collections():
-    return {"collections": list_collections()}
+    return {"collections": await list_collections()}
 
 @app.get("/debug/sample")
 async def get_sample():
-    return sample_docs(["users", "tareas"])
+    sample = await sample_docs(["users", "tareas"])
+    if isinstance(sample.get("users"), list):
+        sample["users"] = [crud.public_user(u) for u in sample["users"]]
+    return sample
+
+if profiling.ENABLED:
+    @app.get("/debug/profile", include_in_schema=False)
+    async def debug_profile(
+        seconds: float = Query(5, gt=0, le=profiling.MAX_SECONDS, description="Duración del muestreo"),
+        idle: bool = Query(False, description="Incluir hilos que solo esperan (event loop ocioso, pools)"),
+        token: Optional[str] = Header(None, alias=profiling.TOKEN_HEADER),
+    ):
+        """
+        Muestrea las pilas del worker durante `seconds` y devuelve un fichero
+        collapsed (flamegraph.pl, speedscope.app).
+        """
+        if not profiling.authorized(token):
+            raise HTTPException(status_code=403, detail="Token de perfilado inválido")
+        try:
+            stacks = await asyncio.to_thread(profiling.sample, seconds, idle)
+        except profiling.ProfilerBusy as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return PlainTextResponse(stacks, headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'})
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Métricas de este proceso en formato de texto de Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/debug/cache")
+async def get_cache_stats():
+    """Tamaño, TTL y aciertos/fallos de las cachés de lectura del proceso."""
+    return cache.all_stats()
+
+@app.get("/debug/search")
+async def debug_search():
+    """Tamaño del índice de búsqueda en este worker."""
+    return search.index.stats()
+
+@app.get("/debug/mirror")
+async def get_mirror_stats():
+    """Estado del espejo on_snapshot de cada colección."""
+    return {"enabled": mirror.MIRROR_ENABLED, "collections": mirror.stats()}
+
+# Paginación: si el cliente no envía `limit` ni `cursor` se conserva la
+# respuesta completa de siempre; con cualquiera de los dos se pagina.
+def _limit_param():
+    return Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página; activa la paginación por cursor")
+
+def _cursor_param():
+    return Query(None, description="Cursor opaco devuelto en `next_cursor`")
+
+def _paginated(limit: Optional[int], cursor: Optional[str]) -> bool:
+    return limit is not None or cursor is not None
+
+# Exportación en streaming (NDJSON): una línea JSON por documento, escrita a
+# medida que llega del generador de Firestore, sin validar la lista completa.
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def _wants_stream(request: Request, stream: bool) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def _ndjson_response(records: AsyncIterable[dict], model=None) -> StreamingResponse:
+    lines = (dumps(project(r, model) if model else r) + b"\n" async for r in records)
+    return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE)
+
+def _stream_param():
+    return Query(False, description=f"Devuelve la colección completa como {NDJSON_MEDIA_TYPE}")
+
+# Salida rápida: los datos vienen de nuestro almacenamiento, ya validados al
+# escribirse, así que no se re-validan contra el response_model (ver responses.py)
+def _task_out(record: dict, status_code: int = status.HTTP_200_OK) -> FastJSONResponse:
+    return FastJSONResponse(project(record, TaskInDB), status_code=status_code)
+
+def _tasks_out(result) -> FastJSONResponse:
+    if isinstance(result, list):
+        return FastJSONResponse(project_all(result, TaskInDB))
+    return FastJSONResponse({"items": project_all(result["items"], TaskInDB), "next_cursor": result["next_cursor"]})
+
+def _focus_out(record: dict) -> FastJSONResponse:
+    return FastJSONResponse(project(record, FocusTimeInDB))
 
 # Simulación de tiempos
 @app.get("/simular-tiempos")
@@ -62,52 +240,104 @@ async def simular_tiempos(
 
 # Usuarios
 @app.get("/users")
-def list_users():
-    return {"usuarios": crud.get_all_users()}
+async def list_users(limit: Optional[int] = _limit_param(), cursor: Optional[str] = _cursor_param()):
+    if not _paginated(limit, cursor):
+        return {"usuarios": await crud.get_all_users()}
+    page = await crud.get_users_page(limit, cursor)
+    return {"usuarios": page["items"], "next_cursor": page["next_cursor"]}
 
 @app.get("/users/{user_id}")
-def get_user(user_id: str):
-    return crud.get_user_by_id(user_id)
+async def get_user(user_id: str):
+    return await crud.get_user_by_id(user_id)
 
 @app.post("/users")
-def create_user(user: User):
-    return crud.create_user(user)
+async def create_user(user: User):
+    return await crud.create_user(user)
 
 @app.put("/users/{user_id}")
-def update_user(user_id: str, user: User):
-    return crud.update_user(user_id, user)
+async def update_user(user_id: str, user: User):
+    return await crud.update_user(user_id, user)
 
 @app.delete("/users/{user_id}")
-def delete_user(user_id: str):
-    return crud.delete_user(user_id)
+async def delete_user(user_id: str):
+    return await crud.delete_user(user_id)
+
+@app.get("/users/{user_id}/dashboard")
+async def get_dashboard(user_id: str):
+    """
+    Resumen para la pantalla de inicio: contadores de tareas por estado y
+    prioridad, próximas tareas, notas recientes y minutos en foco.
+    """
+    return FastJSONResponse(await crud.get_dashboard(user_id))
 
 @app.post("/login")
-def login(user: User):
+async def login(user: User):
     if not user.email or not user.password:
         raise HTTPException(status_code=400, detail="Email y contraseña requeridos")
-    return crud.login_user(user.email, user.password)
+    return await crud.login_user(user.email, user.password)
 
 # Tareas
-@app.get("/tasks", response_model=List[TaskInDB], summary="Listar todas las tareas")
-async def get_tasks():
+@app.get("/tasks", response_model=Union[TaskPage, List[TaskInDB]], summary="Listar todas las tareas")
+async def get_tasks(
+    request: Request,
+    filters: TaskFilters = Depends(),
+    limit: Optional[int] = _limit_param(),
+    cursor: Optional[str] = _cursor_param(),
+    stream: bool = _stream_param(),
+):
     """
-    Devuelve todas las tareas.
+    Devuelve todas las tareas, o una página {items, next_cursor} si se indica `limit`/`cursor`.
+    Admite filtros (`status`, `priority`, `tag`, `completed`, `due_from`, `due_to`),
+    orden (`order_by`) y proyección (`fields`), resueltos en Firestore. Con `order_by`
+    o un rango de fechas solo se admite uno de `status`, `priority`, `tag` o `completed`.
+    Con `?stream=true` o `Accept: application/x-ndjson` las emite como NDJSON.
     """
     try:
-        records = crud.get_all_tasks()
-        return records
+        if _wants_stream(request, stream) and not filters.active():
+            return _ndjson_response(crud.iter_all_tasks(), TaskInDB)
+        if not filters.active() and not _paginated(limit, cursor):
+            return _tasks_out(await crud.get_all_tasks())
+        result = await crud.query_tasks(filters, limit=limit, cursor=cursor)
+        return _task_listing_response(result, filters)
+    except HTTPException:
+        # Propaga 400 si el cursor no es válido
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _task_listing_response(result, filters: TaskFilters):
+    # Con `fields` las tareas vienen recortadas y se devuelven tal cual
+    if filters.fields:
+        return FastJSONResponse(result)
+    return _tasks_out(result)
+
+
+# Lotes: declarados antes de /tasks/{task_id} para que "batch" no se tome como id
+@app.post("/tasks/batch", response_model=BatchResult, summary="Crear varias tareas")
+async def create_tasks_batch_endpoint(payload: List[TaskCreate]):
+    """
+    Crea varias tareas en una sola petición. Devuelve el resultado de cada ítem.
+    """
+    return await crud.create_tasks_batch(payload)
+
+
+@app.put("/tasks/batch", response_model=BatchResult, summary="Actualizar varias tareas")
+async def update_tasks_batch_endpoint(payload: List[TaskBatchUpdate]):
+    """
+    Actualiza varias tareas completas (cada ítem incluye su `id`). Devuelve el resultado de cada ítem.
+    """
+    return await crud.update_tasks_batch(payload)
+
+
 @app.get("/tasks/{task_id}", response_model=TaskInDB, summary="Obtener tarea por ID")
 async def get_task(task_id: str = Path(..., description="ID de la tarea")):
     """
     Obtiene una tarea por su ID.
     """
     try:
-        record = crud.get_task_by_id(task_id)
-        return record
+        record = await crud.get_task_by_id(task_id)
+        return _task_out(record)
     except HTTPException:
         # Propaga 404 si no existe
         raise
@@ -115,14 +345,47 @@ async def get_task(task_id: str = Path(..., description="ID de la tarea")):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/tasks/user/{user_id}", response_model=List[TaskInDB], summary="Listar tareas de un usuario")
-async def get_tasks_by_user(user_id: str = Path(..., description="ID del usuario")):
+@app.get("/tasks/user/{user_id}", response_model=Union[TaskPage, List[TaskInDB]], summary="Listar tareas de un usuario")
+async def get_tasks_by_user(
+    user_id: str = Path(..., description="ID del usuario"),
+    filters: TaskFilters = Depends(),
+    limit: Optional[int] = _limit_param(),
+    cursor: Optional[str] = _cursor_param(),
+):
+    """
+    Obtiene las tareas asociadas a un usuario (paginadas si se indica `limit`/`cursor`),
+    con los mismos filtros, orden y proyección que /tasks.
+    """
+    try:
+        simple = filters.copy(update={"tag": None, "status": None})
+        if not simple.active() and not _paginated(limit, cursor):
+            # Solo tag/status: listado cacheado
+            return _tasks_out(await crud.get_tasks_by_user(user_id, filters.tag, filters.status))
+        result = await crud.query_tasks(filters, user_id=user_id, limit=limit, cursor=cursor)
+        return _task_listing_response(result, filters)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/tasks/user/{user_id}/due", response_model=Union[TaskPage, List[TaskInDB]], summary="Tareas vencidas o próximas")
+async def get_tasks_due(
+    user_id: str = Path(..., description="ID del usuario"),
+    before: Optional[str] = Query(None, description="Vencen antes de esta fecha (dd-mm-YYYY, exclusiva)"),
+    after: Optional[str] = Query(None, description="Vencen en o después de esta fecha (dd-mm-YYYY)"),
+    include_completed: bool = Query(False, description="Incluir también las tareas completadas"),
+    limit: Optional[int] = _limit_param(),
+    cursor: Optional[str] = _cursor_param(),
+):
     """
-    Obtiene las tareas asociadas a un usuario.
+    Tareas de un usuario por fecha límite, ordenadas de la más próxima a la más lejana.
+    Vencidas: `?before=<hoy>`. Próximos 7 días: `?after=<hoy>&before=<hoy+7>`.
     """
     try:
-        records = crud.get_tasks_by_user(user_id)
-        return records
+        return _tasks_out(await crud.get_tasks_due(user_id, before, after, include_completed, limit, cursor))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -133,8 +396,8 @@ async def create_task_endpoint(payload: TaskCreate):
     Crea una nueva tarea. Devuelve la tarea creada con su ID.
     """
     try:
-        record = crud.create_task(payload)
-        return record
+        record = await crud.create_task(payload)
+        return _task_out(record, status.HTTP_201_CREATED)
     except HTTPException:
         # Propaga validaciones (400, etc.)
         raise
@@ -151,8 +414,8 @@ async def update_task_endpoint(
     Actualiza todos los campos de la tarea indicada. Devuelve la tarea actualizada.
     """
     try:
-        updated = crud.update_task(task_id, payload)
-        return updated
+        updated = await crud.update_task(task_id, payload)
+        return _task_out(updated)
     except HTTPException:
         # Propaga 404 o 400 si falla validación o no existe
         raise
@@ -160,13 +423,31 @@ async def update_task_endpoint(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.patch("/tasks/{task_id}", response_model=TaskPatchResult, summary="Actualizar campos de una tarea")
+async def patch_task_endpoint(
+    task_id: str = Path(..., description="ID de la tarea a actualizar"),
+    payload: TaskPartialUpdate = ...,
+):
+    """
+    Actualiza solo los campos enviados, sin reescribir la tarea completa.
+    `add_tags`/`remove_tags` y `step_updates` modifican etiquetas y pasos de
+    forma atómica. Devuelve el id y la lista de campos escritos.
+    """
+    try:
+        return await crud.patch_task(task_id, payload)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.delete("/tasks/{task_id}", status_code=status.HTTP_200_OK, summary="Eliminar tarea por ID")
 async def delete_task_endpoint(task_id: str = Path(..., description="ID de la tarea a eliminar")):
     """
     Elimina la tarea indicada. Devuelve {"status": "deleted"}.
     """
     try:
-        result = crud.delete_task(task_id)
+        result = await crud.delete_task(task_id)
         return result
     except HTTPException:
         # Propaga 404 si no existe
@@ -174,26 +455,68 @@ async def delete_task_endpoint(task_id: str = Path(..., description="ID de la ta
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Búsqueda
+@app.get("/search")
+async def search_content(
+    user_id: str = Query(..., description="Usuario dueño de las tareas y notas"),
+    q: str = Query(..., min_length=1, description="Texto a buscar (sin tildes ni mayúsculas; casa por prefijo)"),
+    kind: Optional[List[str]] = Query(None, description="Limitar a 'task' y/o 'note'"),
+    limit: int = Query(20, ge=1, le=search.MAX_RESULTS),
+):
+    """
+    Busca en el título y descripción de las tareas y en el título y texto de
+    las notas de un usuario. Devuelve los resultados ordenados por relevancia.
+    """
+    start = time.perf_counter()
+    results = await crud.search_user_content(user_id, q, limit, kind)
+    return FastJSONResponse({"results": results, "took_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+
 # Notas
 @app.get("/notes")
-def list_notes():
-    return crud.get_all_notes()
+async def list_notes(
+    request: Request,
+    user_id: Optional[str] = Query(None, description="Solo notas de este usuario"),
+    tag: Optional[str] = Query(None, description="Solo notas con esta etiqueta"),
+    limit: Optional[int] = _limit_param(),
+    cursor: Optional[str] = _cursor_param(),
+    stream: bool = _stream_param(),
+):
+    if user_id or tag:
+        return FastJSONResponse(await crud.query_notes(user_id, tag, limit, cursor))
+    if _wants_stream(request, stream):
+        return _ndjson_response(crud.iter_all_notes())
+    if _paginated(limit, cursor):
+        return FastJSONResponse(await crud.get_notes_page(limit, cursor))
+    return FastJSONResponse(await crud.get_all_notes())
+
+@app.get("/notes/user/{user_id}")
+async def list_notes_by_user(
+    user_id: str,
+    tag: Optional[str] = Query(None, description="Solo notas con esta etiqueta"),
+    limit: Optional[int] = _limit_param(),
+    cursor: Optional[str] = _cursor_param(),
+):
+    """
+    Notas de un usuario, de la más reciente a la más antigua (paginadas si se indica `limit`/`cursor`).
+    """
+    return FastJSONResponse(await crud.query_notes(user_id, tag, limit, cursor))
 
 @app.get("/notes/{note_id}")
-def read_note(note_id: str):
-    return crud.get_note_by_id(note_id)
+async def read_note(note_id: str):
+    return FastJSONResponse(await crud.get_note_by_id(note_id))
 
 @app.post("/notes")
-def create_note(note: Note):
-    return crud.create_note(note.user_id, note.title, note.texto, note.tags)
+async def create_note(note: Note):
+    return FastJSONResponse(await crud.create_note(note.user_id, note.title, note.texto, note.tags))
 
 @app.put("/notes/{note_id}")
-def update_note(note_id: str, note: Note):
-    return crud.update_note(note_id, note.title, note.texto, note.tags)
+async def update_note(note_id: str, note: Note):
+    return FastJSONResponse(await crud.update_note(note_id, note.title, note.texto, note.tags))
 
 @app.delete("/notes/{note_id}")
-def delete_note(note_id: str):
-    return crud.delete_note(note_id)
+async def delete_note(note_id: str):
+    return await crud.delete_note(note_id)
 
 
 
@@ -208,7 +531,7 @@ async def create_focus(payload: FocusTimeCreate):
     """
     try:
         rec = await crud.create_focus_time(payload)
-        return FocusTimeInDB(**rec)
+        return _focus_out(rec)
     except ValueError as ve:
         # Tarea no encontrada → 404
         raise HTTPException(status_code=404, detail=str(ve))
@@ -217,6 +540,14 @@ async def create_focus(payload: FocusTimeCreate):
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 
+@app.post("/focus-times/batch", response_model=BatchResult)
+async def create_focus_batch(payload: List[FocusTimeCreate]):
+    """
+    Registra varias sesiones de FocusTime en una sola petición.
+    """
+    return await crud.create_focus_times_batch(payload)
+
+
 @app.put("/focus-times/{focus_id}", response_model=FocusTimeInDB)
 async def update_focus(focus_id: str, payload: FocusTimeUpdate):
     """
@@ -224,7 +555,7 @@ async def update_focus(focus_id: str, payload: FocusTimeUpdate):
     """
     try:
         rec = await crud.update_focus_time(focus_id, payload)
-        return FocusTimeInDB(**rec)
+        return _focus_out(rec)
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except Exception:
@@ -232,15 +563,25 @@ async def update_focus(focus_id: str, payload: FocusTimeUpdate):
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 
-@app.get("/tasks/{task_id}/focus-times", response_model=List[FocusTimeInDB])
-async def list_focus_by_task(task_id: str):
+@app.get("/tasks/{task_id}/focus-times", response_model=Union[FocusTimePage, List[FocusTimeInDB]])
+async def list_focus_by_task(
+    task_id: str,
+    background_tasks: BackgroundTasks,
+    limit: Optional[int] = _limit_param(),
+    cursor: Optional[str] = _cursor_param(),
+):
     """
-    Lista todos los FocusTime de una tarea, ordenados por fecha.
+    Lista los FocusTime de una tarea ordenados por fecha, o una página
+    {items, next_cursor} si se indica `limit`/`cursor`.
     """
-    recs = await crud.get_focus_by_task(task_id)
-    if not recs:
+    result = await crud.get_focus_by_task(task_id, limit, cursor, defer=background_tasks.add_task)
+    if isinstance(result, dict):
+        if not result["items"] and cursor is None:
+            raise HTTPException(status_code=404, detail="No se encontraron registros")
+        return FastJSONResponse({"items": project_all(result["items"], FocusTimeInDB), "next_cursor": result["next_cursor"]})
+    if not result:
         raise HTTPException(status_code=404, detail="No se encontraron registros")
-    return recs
+    return FastJSONResponse(project_all(result, FocusTimeInDB))
 
 
 @app.get(
@@ -255,12 +596,38 @@ async def focus_summary_by_user(user_id: str):
     """
     try:
         data = await crud.get_total_focus_time_by_user(user_id)
-        return data
+        return FastJSONResponse(project_all(data, FocusSummaryOut))
     except Exception:
         logger.exception("Error interno al obtener resumen de FocusTime")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 
+@app.get(
+    "/focus-times/stats/{user_id}",
+    response_model=FocusStatsOut,
+    summary="Minutos en foco por periodos",
+    description="Minutos en foco de un usuario por día, semana o mes, opcionalmente por tarea o etiqueta.",
+)
+async def focus_stats_by_user(
+    user_id: str = Path(..., description="ID del usuario"),
+    date_from: Optional[str] = Query(None, alias="from", description="Desde (dd-mm-YYYY o YYYY-MM-DD, inclusive); por defecto hace 30 días"),
+    date_to: Optional[str] = Query(None, alias="to", description="Hasta (dd-mm-YYYY o YYYY-MM-DD, inclusive); por defecto hoy (UTC)"),
+    bucket: str = Query("day", description="Periodo: day, week o month"),
+    group_by: Optional[str] = Query(None, description="Desglose: task o tag"),
+):
+    """
+    Se responde desde los buckets diarios precalculados (`focus_buckets`):
+    una lectura por día con actividad en el rango.
+    """
+    try:
+        return FastJSONResponse(await crud.get_focus_stats(user_id, date_from, date_to, bucket, group_by))
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error interno al obtener estadísticas de FocusTime")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """
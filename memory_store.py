@@ -0,0 +1,738 @@
+"""
+Motor de almacenamiento en memoria con la misma API asíncrona que usa `crud`
+de `firestore.AsyncClient`: colecciones, documentos, consultas con
+`where`/`order_by`/`start_after`/`limit`/`select`, `WriteBatch`,
+transacciones y los sentinelas `Increment`, `ArrayUnion`, `ArrayRemove`,
+`DELETE_FIELD` y `SERVER_TIMESTAMP`.
+
+Se activa con TASKO_STORAGE=memory (ver database.py) y sirve para correr la
+API, los benchmarks y las pruebas sin credenciales ni emulador.
+
+Las igualdades (`==`, `in`) y `array_contains` se resuelven con índices hash
+por campo, creados la primera vez que se consulta ese campo y mantenidos en
+cada escritura. `stats` cuenta RPCs, lecturas y escrituras igual que las
+facturaría Firestore.
+"""
+import random
+import string
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from google.api_core.exceptions import Aborted, AlreadyExists, NotFound
+from google.cloud.firestore_v1.field_path import split_field_path
+from google.cloud.firestore_v1.transforms import (
+    DELETE_FIELD, SERVER_TIMESTAMP, ArrayRemove, ArrayUnion, Increment,
+)
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+
+ASCENDING  = "ASCENDING"
+DESCENDING = "DESCENDING"
+DOC_ID     = "__name__"
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+_MISSING = object()
+
+
+# ——— Utilidades de valores ———
+
+def _copy(value):
+    # Copia profunda mínima: los documentos solo contienen dicts, listas y escalares
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+def _split(field: str) -> Tuple[str, ...]:
+    return tuple(split_field_path(field)) if field != DOC_ID else (DOC_ID,)
+
+def _get_path(data: dict, parts: Tuple[str, ...]):
+    current = data
+    for part in parts:
+        if not isinstance(current, dict) or part not in current:
+            return _MISSING
+        current = current[part]
+    return current
+
+def _set_path(data: dict, parts: Tuple[str, ...], value) -> None:
+    current = data
+    for part in parts[:-1]:
+        nxt = current.get(part)
+        if not isinstance(nxt, dict):
+            nxt = current[part] = {}
+        current = nxt
+    current[parts[-1]] = value
+
+def _delete_path(data: dict, parts: Tuple[str, ...]) -> None:
+    current = data
+    for part in parts[:-1]:
+        current = current.get(part)
+        if not isinstance(current, dict):
+            return
+    current.pop(parts[-1], None)
+
+def _resolve(current, value):
+    """Aplica un sentinela sobre el valor actual del campo (o devuelve `value`)."""
+    if value is SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if isinstance(value, Increment):
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + value.value
+    if isinstance(value, ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        keys = [_sort_key(v) for v in result]
+        for v in value.values:
+            if _sort_key(v) not in keys:
+                result.append(_copy(v))
+                keys.append(_sort_key(v))
+        return result
+    if isinstance(value, ArrayRemove):
+        if not isinstance(current, list):
+            return []
+        removed = {_sort_key(v) for v in value.values}
+        return [v for v in current if _sort_key(v) not in removed]
+    if isinstance(value, dict):
+        return {k: _resolve(_MISSING, v) for k, v in value.items() if v is not DELETE_FIELD}
+    return _copy(value)
+
+def _merge(target: dict, source: dict) -> None:
+    for key, value in source.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = _resolve(target.get(key, _MISSING), value)
+
+
+# Orden entre tipos de Firestore: null < bool < número < fecha < texto < bytes < referencia < array < mapa
+def _sort_key(value):
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value if value.tzinfo else value.replace(tzinfo=timezone.utc))
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, MemoryDocumentReference):
+        return (6, value.path)
+    if isinstance(value, (list, tuple)):
+        return (8, tuple(_sort_key(v) for v in value))
+    if isinstance(value, dict):
+        return (9, tuple(sorted((k, _sort_key(v)) for k, v in value.items())))
+    return (10, repr(value))
+
+
+# ——— Filtros ———
+
+def _matches(value, op: str, target) -> bool:
+    if value is _MISSING:
+        return False
+    if op == "==":
+        return _sort_key(value) == _sort_key(target)
+    if op == "!=":
+        return value is not None and _sort_key(value) != _sort_key(target)
+    if op == "in":
+        return _sort_key(value) in {_sort_key(t) for t in target}
+    if op == "not-in":
+        return value is not None and _sort_key(value) not in {_sort_key(t) for t in target}
+    if op in ("array_contains", "array-contains"):
+        return isinstance(value, list) and _sort_key(target) in {_sort_key(v) for v in value}
+    if op in ("array_contains_any", "array-contains-any"):
+        return isinstance(value, list) and bool({_sort_key(v) for v in value} & {_sort_key(t) for t in target})
+    a, b = _sort_key(value), _sort_key(target)
+    if a[0] != b[0]:
+        return False
+    if op == "<":
+        return a < b
+    if op == "<=":
+        return a <= b
+    if op == ">":
+        return a > b
+    if op == ">=":
+        return a >= b
+    raise ValueError(f"Operador no soportado: {op}")
+
+
+# ——— Almacenamiento por colección con índices ———
+
+class _Doc:
+    __slots__ = ("data", "version", "create_time", "update_time")
+
+    def __init__(self, data: dict, version: int, now: datetime):
+        self.data = data
+        self.version = version
+        self.create_time = now
+        self.update_time = now
+
+
+class _CollectionStore:
+    def __init__(self):
+        self.docs: Dict[str, _Doc] = {}
+        # campo -> clave de valor -> ids
+        self.eq_index: Dict[Tuple[str, ...], Dict[Any, set]] = {}
+        self.array_index: Dict[Tuple[str, ...], Dict[Any, set]] = {}
+
+    def _index_doc(self, doc_id: str, data: dict, add: bool) -> None:
+        for parts, index in self.eq_index.items():
+            value = _get_path(data, parts)
+            if value is not _MISSING:
+                self._index_value(index, _sort_key(value), doc_id, add)
+        for parts, index in self.array_index.items():
+            value = _get_path(data, parts)
+            if isinstance(value, list):
+                for item in value:
+                    self._index_value(index, _sort_key(item), doc_id, add)
+
+    @staticmethod
+    def _index_value(index: Dict[Any, set], key, doc_id: str, add: bool) -> None:
+        if add:
+            index.setdefault(key, set()).add(doc_id)
+        else:
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del index[key]
+
+    def _build(self, parts: Tuple[str, ...], array: bool) -> Dict[Any, set]:
+        index: Dict[Any, set] = {}
+        for doc_id, doc in self.docs.items():
+            value = _get_path(doc.data, parts)
+            if array:
+                if isinstance(value, list):
+                    for item in value:
+                        self._index_value(index, _sort_key(item), doc_id, True)
+            elif value is not _MISSING:
+                self._index_value(index, _sort_key(value), doc_id, True)
+        return index
+
+    def lookup(self, parts: Tuple[str, ...], keys: Iterable, array: bool = False) -> set:
+        indexes = self.array_index if array else self.eq_index
+        index = indexes.get(parts)
+        if index is None:
+            index = indexes[parts] = self._build(parts, array)
+        result: set = set()
+        for key in keys:
+            result |= index.get(key, set())
+        return result
+
+    def put(self, doc_id: str, data: Optional[dict], version: int, now: datetime) -> None:
+        old = self.docs.get(doc_id)
+        if old is not None:
+            self._index_doc(doc_id, old.data, add=False)
+        if data is None:
+            self.docs.pop(doc_id, None)
+            return
+        doc = _Doc(data, version, now)
+        if old is not None:
+            doc.create_time = old.create_time
+        self.docs[doc_id] = doc
+        self._index_doc(doc_id, data, add=True)
+
+
+# ——— Snapshots, referencias y consultas ———
+
+class MemoryDocumentSnapshot:
+    def __init__(self, reference: "MemoryDocumentReference", data: Optional[dict],
+                 create_time: Optional[datetime] = None, update_time: Optional[datetime] = None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return _copy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str):
+        if self._data is None:
+            return None
+        value = _get_path(self._data, _split(field_path))
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return _copy(value)
+
+
+class MemoryQuery:
+    def __init__(self, client: "MemoryClient", collection_id: str,
+                 filters=(), orders=(), limit=None, cursor=None, projection=None):
+        self._client = client
+        self._collection_id = collection_id
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+        self._projection = projection
+
+    def _copy_with(self, **changes) -> "MemoryQuery":
+        params = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                      cursor=self._cursor, projection=self._projection)
+        params.update(changes)
+        return MemoryQuery(self._client, self._collection_id, **params)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None) -> "MemoryQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy_with(filters=self._filters + ((_split(field_path), op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> "MemoryQuery":
+        return self._copy_with(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> "MemoryQuery":
+        return self._copy_with(limit=count)
+
+    def start_after(self, document_fields_or_snapshot) -> "MemoryQuery":
+        return self._copy_with(cursor=document_fields_or_snapshot)
+
+    def select(self, field_paths: Iterable[str]) -> "MemoryQuery":
+        return self._copy_with(projection=[_split(f) for f in field_paths])
+
+    # — Ejecución —
+
+    def _candidates(self, store: _CollectionStore) -> Iterable[str]:
+        best: Optional[set] = None
+        for parts, op, value in self._filters:
+            if parts == (DOC_ID,):
+                continue
+            if op == "==":
+                ids = store.lookup(parts, [_sort_key(value)])
+            elif op == "in":
+                ids = store.lookup(parts, [_sort_key(v) for v in value])
+            elif op in ("array_contains", "array-contains"):
+                ids = store.lookup(parts, [_sort_key(value)], array=True)
+            else:
+                continue
+            if best is None or len(ids) < len(best):
+                best = ids
+            if not best:
+                break
+        return list(best) if best is not None else list(store.docs)
+
+    @staticmethod
+    def _value(doc_id: str, data: dict, field: str):
+        if field == DOC_ID:
+            return doc_id
+        return _get_path(data, _split(field))
+
+    def _cursor_values(self, orders) -> Optional[list]:
+        cursor = self._cursor
+        if cursor is None:
+            return None
+        if isinstance(cursor, MemoryDocumentSnapshot):
+            return [cursor.id if f == DOC_ID else _get_path(cursor._data or {}, _split(f)) for f, _ in orders]
+        values = []
+        for field, _ in orders[:len(cursor)]:
+            value = cursor[field]
+            if field == DOC_ID and isinstance(value, MemoryDocumentReference):
+                value = value.id
+            values.append(value)
+        return values
+
+    def _matches_doc(self, doc_id: str, data: dict) -> bool:
+        return all(
+            _matches(doc_id if parts == (DOC_ID,) else _get_path(data, parts), op, value)
+            for parts, op, value in self._filters
+        )
+
+    def on_snapshot(self, callback) -> "MemoryWatch":
+        """
+        Igual que `Query.on_snapshot` del cliente síncrono: llama a
+        callback(docs, changes, read_time) con el estado inicial y después
+        con cada cambio. Aquí se invoca de forma síncrona tras cada commit.
+        """
+        watch = MemoryWatch(self, callback)
+        self._client._listeners.append(watch)
+        docs = self._run()
+        changes = [DocumentChange(ChangeType.ADDED, d, -1, i) for i, d in enumerate(docs)]
+        callback(docs, changes, datetime.now(timezone.utc))
+        return watch
+
+    def _run(self) -> List[MemoryDocumentSnapshot]:
+        store = self._client._store(self._collection_id)
+        orders = list(self._orders)
+        if DOC_ID not in [f for f, _ in orders]:
+            orders.append((DOC_ID, orders[-1][1] if orders else ASCENDING))
+
+        rows = []
+        for doc_id in self._candidates(store):
+            doc = store.docs.get(doc_id)
+            if doc is None:
+                continue
+            data = doc.data
+            if not self._matches_doc(doc_id, data):
+                continue
+            keys = [self._value(doc_id, data, f) for f, _ in orders]
+            # Como en Firestore, los documentos sin el campo de orden no aparecen
+            if any(k is _MISSING for k in keys):
+                continue
+            rows.append(([_sort_key(k) for k in keys], doc_id, doc))
+
+        # Ordenación estable campo a campo, del último al primero
+        for i in range(len(orders) - 1, -1, -1):
+            rows.sort(key=lambda r: r[0][i], reverse=orders[i][1] == DESCENDING)
+
+        cursor = self._cursor_values(orders)
+        if cursor is not None:
+            cursor_keys = [_sort_key(v) for v in cursor]
+            rows = [r for r in rows if self._after(r[0], cursor_keys, orders)]
+
+        if self._limit is not None:
+            rows = rows[:self._limit]
+
+        collection = self._client.collection(self._collection_id)
+        result = []
+        for _, doc_id, doc in rows:
+            data = doc.data
+            if self._projection is not None:
+                projected: dict = {}
+                for parts in self._projection:
+                    value = _get_path(data, parts)
+                    if value is not _MISSING:
+                        _set_path(projected, parts, value)
+                data = projected
+            result.append(MemoryDocumentSnapshot(collection.document(doc_id), data, doc.create_time, doc.update_time))
+        return result
+
+    @staticmethod
+    def _after(keys: list, cursor_keys: list, orders) -> bool:
+        for key, cursor_key, (_, direction) in zip(keys, cursor_keys, orders):
+            if key == cursor_key:
+                continue
+            return (key > cursor_key) if direction != DESCENDING else (key < cursor_key)
+        return False
+
+    async def stream(self, transaction=None):
+        docs = self._run()
+        self._client._count(rpcs=1, reads=max(len(docs), 1))
+        for doc in docs:
+            yield doc
+
+    async def get(self, transaction=None) -> List[MemoryDocumentSnapshot]:
+        return [doc async for doc in self.stream(transaction=transaction)]
+
+
+class MemoryCollectionReference(MemoryQuery):
+    def __init__(self, client: "MemoryClient", collection_id: str):
+        super().__init__(client, collection_id)
+
+    @property
+    def id(self) -> str:
+        return self._collection_id
+
+    def document(self, document_id: Optional[str] = None) -> "MemoryDocumentReference":
+        if document_id is None:
+            document_id = "".join(random.choices(_ID_ALPHABET, k=20))
+        return MemoryDocumentReference(self._client, self._collection_id, document_id)
+
+    async def add(self, document_data: dict, document_id: Optional[str] = None):
+        ref = self.document(document_id)
+        await ref.create(document_data)
+        return None, ref
+
+
+class MemoryDocumentReference:
+    def __init__(self, client: "MemoryClient", collection_id: str, document_id: str):
+        self._client = client
+        self._collection_id = collection_id
+        self.id = document_id
+
+    @property
+    def path(self) -> str:
+        return f"{self._collection_id}/{self.id}"
+
+    @property
+    def parent(self) -> MemoryCollectionReference:
+        return self._client.collection(self._collection_id)
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def _snapshot(self) -> MemoryDocumentSnapshot:
+        doc = self._client._store(self._collection_id).docs.get(self.id)
+        if doc is None:
+            return MemoryDocumentSnapshot(self, None)
+        return MemoryDocumentSnapshot(self, doc.data, doc.create_time, doc.update_time)
+
+    async def get(self, field_paths=None, transaction=None) -> MemoryDocumentSnapshot:
+        self._client._count(rpcs=1, reads=1)
+        if transaction is not None:
+            transaction._track(self)
+        snap = self._snapshot()
+        if field_paths is not None and snap.exists:
+            projected: dict = {}
+            for field in field_paths:
+                value = _get_path(snap._data, _split(field))
+                if value is not _MISSING:
+                    _set_path(projected, _split(field), value)
+            snap._data = projected
+        return snap
+
+    async def set(self, document_data: dict, merge: bool = False):
+        return await self._client._commit([("set", self, document_data, merge)])
+
+    async def create(self, document_data: dict):
+        return await self._client._commit([("create", self, document_data, None)])
+
+    async def update(self, field_updates: dict, option=None):
+        return await self._client._commit([("update", self, field_updates, option)])
+
+    async def delete(self, option=None):
+        return await self._client._commit([("delete", self, None, option)])
+
+
+class MemoryWatch:
+    def __init__(self, query: MemoryQuery, callback):
+        self._query = query
+        self._callback = callback
+
+    def unsubscribe(self) -> None:
+        listeners = self._query._client._listeners
+        if self in listeners:
+            listeners.remove(self)
+
+    def _notify(self, changed: List[Tuple["MemoryDocumentReference", Optional[dict], Optional[dict]]], now: datetime) -> None:
+        query = self._query
+        changes = []
+        for ref, old, new in changed:
+            if ref._collection_id != query._collection_id:
+                continue
+            was = old is not None and query._matches_doc(ref.id, old)
+            now_in = new is not None and query._matches_doc(ref.id, new)
+            if now_in:
+                kind = ChangeType.MODIFIED if was else ChangeType.ADDED
+                changes.append(DocumentChange(kind, MemoryDocumentSnapshot(ref, new, now, now), -1, -1))
+            elif was:
+                changes.append(DocumentChange(ChangeType.REMOVED, MemoryDocumentSnapshot(ref, old, now, now), -1, -1))
+        if changes:
+            self._callback(_LazyDocs(query), changes, now)
+
+
+class _LazyDocs:
+    """Lista de documentos del snapshot, calculada solo si el callback la recorre."""
+
+    def __init__(self, query: MemoryQuery):
+        self._query = query
+        self._docs = None
+
+    def _load(self) -> list:
+        if self._docs is None:
+            self._docs = self._query._run()
+        return self._docs
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __getitem__(self, index):
+        return self._load()[index]
+
+
+# ——— Escrituras agrupadas y transacciones ———
+
+class MemoryWriteOption:
+    def __init__(self, exists: Optional[bool] = None):
+        self.exists = exists
+
+
+class MemoryWriteBatch:
+    def __init__(self, client: "MemoryClient"):
+        self._client = client
+        self._writes: list = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, document_data: dict, merge: bool = False):
+        self._writes.append(("set", reference, document_data, merge))
+
+    def create(self, reference, document_data: dict):
+        self._writes.append(("create", reference, document_data, None))
+
+    def update(self, reference, field_updates: dict, option=None):
+        self._writes.append(("update", reference, field_updates, option))
+
+    def delete(self, reference, option=None):
+        self._writes.append(("delete", reference, None, option))
+
+    async def commit(self):
+        writes, self._writes = self._writes, []
+        return await self._client._commit(writes)
+
+
+class MemoryTransaction(MemoryWriteBatch):
+    """Transacción optimista: aborta si algún documento leído cambió antes del commit."""
+
+    def __init__(self, client: "MemoryClient", max_attempts: int = 5):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_versions: Dict[str, int] = {}
+
+    def _track(self, reference: MemoryDocumentReference) -> None:
+        doc = self._client._store(reference._collection_id).docs.get(reference.id)
+        self._read_versions.setdefault(reference.path, doc.version if doc else 0)
+
+    def _reset(self) -> None:
+        self._writes = []
+        self._read_versions = {}
+
+    async def get(self, ref_or_query):
+        if isinstance(ref_or_query, MemoryDocumentReference):
+            return await ref_or_query.get(transaction=self)
+        return ref_or_query.stream(transaction=self)
+
+    async def _commit_tracked(self):
+        for path, version in self._read_versions.items():
+            collection_id, doc_id = path.split("/", 1)
+            doc = self._client._store(collection_id).docs.get(doc_id)
+            if (doc.version if doc else 0) != version:
+                raise Aborted("Conflicto de transacción en memoria")
+        return await self.commit()
+
+
+def transactional(fn):
+    """Equivalente en memoria de `firestore.async_transactional`."""
+    async def wrapper(transaction: MemoryTransaction, *args, **kwargs):
+        for _ in range(transaction._max_attempts):
+            transaction._reset()
+            transaction._client._count(rpcs=1)  # BeginTransaction
+            try:
+                result = await fn(transaction, *args, **kwargs)
+            except BaseException:
+                transaction._reset()
+                raise
+            try:
+                await transaction._commit_tracked()
+            except Aborted:
+                continue
+            return result
+        raise Aborted("Transacción abortada tras varios intentos")
+    return wrapper
+
+
+# ——— Cliente ———
+
+class MemoryClient:
+    def __init__(self, project: str = "memory"):
+        self.project = project
+        self._collections: Dict[str, _CollectionStore] = defaultdict(_CollectionStore)
+        self._version = 0
+        self._listeners: List[MemoryWatch] = []
+        self.stats: Counter = Counter()
+        self._observers: List[Callable[[dict], None]] = []
+
+    def _store(self, collection_id: str) -> _CollectionStore:
+        return self._collections[collection_id]
+
+    def _count(self, **counts) -> None:
+        self.stats.update(counts)
+        for fn in self._observers:
+            fn(counts)
+
+    def add_observer(self, fn: Callable[[dict], None]) -> None:
+        """fn(counts) se llama con cada recuento (rpcs, reads, writes), p. ej. para métricas."""
+        self._observers.append(fn)
+
+    def reset_stats(self) -> None:
+        self.stats.clear()
+
+    def collection(self, collection_id: str) -> MemoryCollectionReference:
+        return MemoryCollectionReference(self, collection_id)
+
+    def document(self, document_path: str) -> MemoryDocumentReference:
+        collection_id, document_id = document_path.split("/", 1)
+        return self.collection(collection_id).document(document_id)
+
+    async def collections(self):
+        for name, store in list(self._collections.items()):
+            if store.docs:
+                yield self.collection(name)
+
+    async def get_all(self, references, field_paths=None, transaction=None):
+        references = list(references)
+        self._count(rpcs=1, reads=max(len(references), 1))
+        for ref in references:
+            if transaction is not None:
+                transaction._track(ref)
+            yield ref._snapshot()
+
+    def batch(self) -> MemoryWriteBatch:
+        return MemoryWriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, **kwargs) -> MemoryTransaction:
+        return MemoryTransaction(self, max_attempts=max_attempts)
+
+    def write_option(self, exists: Optional[bool] = None, **kwargs) -> MemoryWriteOption:
+        return MemoryWriteOption(exists=exists)
+
+    def close(self) -> None:
+        pass
+
+    async def _commit(self, writes: list) -> list:
+        """Aplica las escrituras de forma atómica: o todas o ninguna."""
+        self._count(rpcs=1, writes=len(writes))
+        staged: Dict[str, Tuple[MemoryDocumentReference, Optional[dict]]] = {}
+
+        def current(ref: MemoryDocumentReference) -> Optional[dict]:
+            if ref.path in staged:
+                return staged[ref.path][1]
+            doc = self._store(ref._collection_id).docs.get(ref.id)
+            return _copy(doc.data) if doc else None
+
+        for kind, ref, data, extra in writes:
+            existing = current(ref)
+            option = extra if kind in ("update", "delete") else None
+            if option is not None and option.exists is not None and (existing is not None) != option.exists:
+                raise NotFound(f"Documento {ref.path} no encontrado") if option.exists \
+                    else AlreadyExists(f"Documento {ref.path} ya existe")
+            if kind == "create":
+                if existing is not None:
+                    raise AlreadyExists(f"Documento {ref.path} ya existe")
+                new = {}
+                _merge(new, data)
+            elif kind == "set":
+                new = existing if (extra and existing is not None) else {}
+                _merge(new, data)
+            elif kind == "update":
+                if existing is None:
+                    raise NotFound(f"No document to update: {ref.path}")
+                new = existing
+                for field, value in data.items():
+                    parts = _split(field)
+                    if value is DELETE_FIELD:
+                        _delete_path(new, parts)
+                    else:
+                        _set_path(new, parts, _resolve(_get_path(new, parts), value))
+            else:
+                new = None
+            staged[ref.path] = (ref, new)
+
+        now = datetime.now(timezone.utc)
+        changed = []
+        for ref, data in staged.values():
+            self._version += 1
+            store = self._store(ref._collection_id)
+            old = store.docs.get(ref.id)
+            store.put(ref.id, data, self._version, now)
+            changed.append((ref, old.data if old else None, data))
+        for watch in list(self._listeners):
+            watch._notify(changed, now)
+        return [now] * len(writes)
@@ -0,0 +1,293 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cache
+
+
+# ——— Métricas de rendimiento (formato Prometheus) ———
+#
+# Registro mínimo en memoria (sin dependencias) expuesto en GET /metrics:
+#
+#   - latencia por ruta (plantilla de la ruta, no la URL, para acotar series)
+#   - RPCs y documentos leídos de Firestore por petición y por ruta
+#   - RPCs, documentos leídos y latencia por función pública de `crud`
+#   - latencia por método RPC de Firestore
+#   - aciertos y fallos de las cachés de `cache`
+#
+# Los contadores de la petición en curso viajan en un ContextVar, así que
+# cada petición ve solo sus propias RPCs aunque haya muchas concurrentes.
+# Las métricas son por proceso (cada worker expone las suyas).
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [conteos por bucket (no acumulados), suma, total]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = 'le="{}"'.format("+Inf" if bound == float("inf") else _number(bound))
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(round(total, 6))}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "tasko_http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta.",
+    ("method", "route", "status"),
+)
+REQUEST_RPCS = Histogram(
+    "tasko_http_request_firestore_rpcs", "RPCs de Firestore por petición.",
+    ("method", "route"), COUNT_BUCKETS,
+)
+REQUEST_READS = Histogram(
+    "tasko_http_request_documents_read", "Documentos leídos de Firestore por petición.",
+    ("method", "route"), COUNT_BUCKETS,
+)
+OPERATION_SECONDS = Histogram(
+    "tasko_crud_duration_seconds", "Latencia de cada función pública de crud.",
+    ("operation",),
+)
+OPERATION_RPCS = Counter(
+    "tasko_crud_firestore_rpcs_total", "RPCs de Firestore por función de crud ('-' fuera de crud).",
+    ("operation",),
+)
+OPERATION_READS = Counter(
+    "tasko_crud_documents_read_total", "Documentos leídos de Firestore por función de crud.",
+    ("operation",),
+)
+RPC_SECONDS = Histogram(
+    "tasko_firestore_rpc_duration_seconds", "Latencia de las RPCs de Firestore por método.",
+    ("method",),
+)
+
+_METRICS = (REQUEST_SECONDS, REQUEST_RPCS, REQUEST_READS, OPERATION_SECONDS, OPERATION_RPCS, OPERATION_READS, RPC_SECONDS)
+
+
+# ——— Contexto de la petición ———
+
+class RequestStats:
+    __slots__ = ("rpcs", "reads", "rpc_seconds")
+
+    def __init__(self):
+        self.rpcs = 0
+        self.reads = 0
+        self.rpc_seconds = 0.0
+
+_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("tasko_request", default=None)
+_operation: contextvars.ContextVar[str] = contextvars.ContextVar("tasko_operation", default="-")
+
+def start_request() -> Tuple[RequestStats, contextvars.Token]:
+    stats = RequestStats()
+    return stats, _request.set(stats)
+
+def end_request(token: contextvars.Token) -> None:
+    _request.reset(token)
+
+def observe_request(method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+    REQUEST_SECONDS.observe(seconds, method, route, str(status))
+    REQUEST_RPCS.observe(stats.rpcs, method, route)
+    REQUEST_READS.observe(stats.reads, method, route)
+
+def server_timing(seconds: float, stats: RequestStats) -> str:
+    """Valor de la cabecera Server-Timing (visible en las DevTools del navegador)."""
+    return (
+        f"app;dur={seconds * 1000:.1f}, "
+        f'firestore;dur={stats.rpc_seconds * 1000:.1f};desc="{stats.rpcs} rpcs, {stats.reads} docs"'
+    )
+
+def record_rpc(method: str, seconds: float, reads: int = 0) -> None:
+    operation = _operation.get()
+    OPERATION_RPCS.inc(operation)
+    if reads:
+        OPERATION_READS.inc(operation, amount=reads)
+    RPC_SECONDS.observe(seconds, method)
+    stats = _request.get()
+    if stats is not None:
+        stats.rpcs += 1
+        stats.reads += reads
+        stats.rpc_seconds += seconds
+
+
+# ——— Instrumentación de crud ———
+
+def instrument(fn, operation: str):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = _operation.set(operation)
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            OPERATION_SECONDS.observe(time.perf_counter() - start, operation)
+            _operation.reset(token)
+    return wrapper
+
+def instrument_module(module) -> None:
+    """Envuelve las corrutinas públicas definidas en `module` (las llamadas internas también pasan por ellas)."""
+    for name, fn in list(vars(module).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(fn) and fn.__module__ == module.__name__:
+            setattr(module, name, instrument(fn, name))
+
+
+# ——— Instrumentación del almacenamiento ———
+#
+# Firestore: se envuelven los métodos del cliente GAPIC interno del
+# AsyncClient, por donde pasan todas las RPCs (también las de transacciones
+# y reintentos). El backend en memoria avisa de cada RPC que contabiliza.
+
+_UNARY_RPCS = {"commit": "Commit", "begin_transaction": "BeginTransaction", "rollback": "Rollback",
+               "list_collection_ids": "ListCollectionIds"}
+_STREAMING_RPCS = {"batch_get_documents": "BatchGetDocuments", "run_query": "RunQuery",
+                   "run_aggregation_query": "RunAggregationQuery"}
+
+
+class _CountingStream:
+    """Iterador de respuestas de una RPC en streaming que registra lecturas y duración al terminar."""
+
+    def __init__(self, stream, method: str, start: float):
+        self._stream = stream
+        self._iter = stream.__aiter__()
+        self._method = method
+        self._start = start
+        self._reads = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            response = await self._iter.__anext__()
+        except StopAsyncIteration:
+            # Una consulta sin resultados se factura como una lectura
+            record_rpc(self._method, time.perf_counter() - self._start, max(self._reads, 1))
+            raise
+        if self._method != "RunQuery" or "document" in response:
+            self._reads += 1
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def _timed_unary(method: str, call):
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await call(*args, **kwargs)
+        finally:
+            record_rpc(method, time.perf_counter() - start)
+    return wrapper
+
+def _timed_stream(method: str, call):
+    async def wrapper(*args, **kwargs):
+        return _CountingStream(await call(*args, **kwargs), method, time.perf_counter())
+    return wrapper
+
+def _record_memory_counts(counts: dict) -> None:
+    if counts.get("rpcs"):
+        record_rpc("memory", 0.0, counts.get("reads", 0))
+
+def instrument_client(client) -> None:
+    add_observer = getattr(client, "add_observer", None)
+    if add_observer is not None:
+        # MemoryClient: ya cuenta RPCs y lecturas como Firestore
+        add_observer(_record_memory_counts)
+        return
+    try:
+        api = client._firestore_api
+        for attr, method in _UNARY_RPCS.items():
+            setattr(api, attr, _timed_unary(method, getattr(api, attr)))
+        for attr, method in _STREAMING_RPCS.items():
+            setattr(api, attr, _timed_stream(method, getattr(api, attr)))
+    except Exception:
+        logger.warning("No se pudo instrumentar el cliente de Firestore; /metrics no contará RPCs", exc_info=True)
+
+
+# ——— Exposición ———
+
+def _cache_lines() -> List[str]:
+    stats = cache.all_stats()
+    lines = []
+    for metric, key, kind, doc in (
+        ("tasko_cache_hits_total", "hits", "counter", "Aciertos de caché."),
+        ("tasko_cache_misses_total", "misses", "counter", "Fallos de caché."),
+        ("tasko_cache_hit_ratio", "hit_rate", "gauge", "Proporción de aciertos de caché."),
+    ):
+        lines += [f"# HELP {metric} {doc}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{cache="{_escape(name)}"}} {_number(s[key])}' for name, s in sorted(stats.items())]
+    return lines
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines += metric.render()
+    lines += _cache_lines()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,137 @@
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import database
+
+
+# ——— Espejo en memoria mantenido por listeners on_snapshot ———
+#
+# Con TASKO_MIRROR=1 cada worker se suscribe a `tareas`, `notes` y `users`
+# y mantiene una copia local que Firestore actualiza en tiempo casi real.
+# Así los listados se sirven desde memoria, sin lecturas por petición, y las
+# escrituras hechas por otros workers llegan a todos (también se usan para
+# invalidar las cachés locales de `crud`). Las lecturas por id siguen en la
+# caché de `crud`: el listener aplica incluso las escrituras del propio
+# worker con retraso, y un GET justo después de un POST o PUT no debe dar
+# 404 ni datos viejos.
+
+MIRROR_ENABLED = os.getenv("TASKO_MIRROR", "0") == "1"
+MIRRORED_COLLECTIONS = ("tareas", "notes", "users")
+
+logger = logging.getLogger(__name__)
+
+ChangeListener = Callable[[str, Optional[dict], Optional[dict]], None]
+
+
+class CollectionMirror:
+    def __init__(self, name: str, index_fields=("user_id",)):
+        self.name = name
+        self._docs: Dict[str, dict] = {}
+        self._index: Dict[str, Dict[object, set]] = {f: defaultdict(set) for f in index_fields}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._watch = None
+        self._listeners: List[ChangeListener] = []
+        self.changes_applied = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def add_listener(self, fn: ChangeListener) -> None:
+        """fn(doc_id, old, new) se llama por cada documento que cambia (old/new None si no existía)."""
+        self._listeners.append(fn)
+
+    def start(self) -> None:
+        if self._watch is None:
+            collection = database.get_listener_client().collection(self.name)
+            self._watch = collection.on_snapshot(self._on_snapshot)
+
+    def stop(self) -> None:
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self._ready.clear()
+
+    # El callback corre en el hilo del listener de Firestore
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        applied = []
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                old = self._remove(doc.id)
+                new = None
+                if change.type.name != "REMOVED":
+                    new = doc.to_dict()
+                    self._add(doc.id, new)
+                applied.append((doc.id, old, new))
+            self.changes_applied += len(applied)
+        self._ready.set()
+        for doc_id, old, new in applied:
+            for fn in self._listeners:
+                try:
+                    fn(doc_id, old, new)
+                except Exception:
+                    logger.exception("Error en listener del espejo %s", self.name)
+
+    def _add(self, doc_id: str, data: dict) -> None:
+        self._docs[doc_id] = data
+        for field, index in self._index.items():
+            value = data.get(field)
+            if value is not None:
+                index[value].add(doc_id)
+
+    def _remove(self, doc_id: str) -> Optional[dict]:
+        data = self._docs.pop(doc_id, None)
+        if data is not None:
+            for field, index in self._index.items():
+                ids = index.get(data.get(field))
+                if ids is not None:
+                    ids.discard(doc_id)
+        return data
+
+    # — Lecturas (mismo formato que crud: dict del documento + id) —
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        with self._lock:
+            data = self._docs.get(doc_id)
+            return data | {"id": doc_id} if data is not None else None
+
+    def all(self) -> List[dict]:
+        with self._lock:
+            return [self._docs[i] | {"id": i} for i in sorted(self._docs)]
+
+    def where(self, field: str, value) -> List[dict]:
+        with self._lock:
+            ids = self._index[field].get(value, ())
+            return [self._docs[i] | {"id": i} for i in sorted(ids)]
+
+
+mirrors: Dict[str, CollectionMirror] = {name: CollectionMirror(name) for name in MIRRORED_COLLECTIONS}
+
+
+def get_mirror(name: str) -> Optional[CollectionMirror]:
+    """Devuelve el espejo de `name` solo si el modo está activo y ya recibió el estado inicial."""
+    if not MIRROR_ENABLED:
+        return None
+    m = mirrors.get(name)
+    return m if m is not None and m.ready else None
+
+def start() -> None:
+    if MIRROR_ENABLED:
+        for m in mirrors.values():
+            m.start()
+        logger.info("Espejo on_snapshot activo para %s", ", ".join(mirrors))
+
+def stop() -> None:
+    for m in mirrors.values():
+        m.stop()
+
+def stats() -> Dict[str, dict]:
+    return {
+        name: {"ready": m.ready, "documents": len(m._docs), "changes_applied": m.changes_applied}
+        for name, m in mirrors.items()
+    }
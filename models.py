@@ -1,7 +1,7 @@
-from pydantic import BaseModel, Field, constr, validator
+from pydantic import BaseModel, Field, conint, constr, validator
 from enum import Enum
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 
 # Modelo para el usuario
@@ -80,18 +80,28 @@ class TaskCreate(TaskBase):
 class TaskUpdate(TaskBase):
     pass
 
-# Si quisieras PATCH (solo campos opcionales), podrías:
+# Cambio de un paso concreto en PATCH (por posición en `steps`)
+class StepPatch(BaseModel):
+    index: conint(ge=0) = Field(..., description="Posición del paso (desde 0)")
+    description: Optional[constr(min_length=1, max_length=200)] = None
+    completed: Optional[bool] = None
+
+# Modelo para actualización parcial vía PATCH (solo los campos enviados)
 class TaskPartialUpdate(BaseModel):
-    title: Optional[constr(min_length=1, max_length=100)]
-    description: Optional[str]
-    due_date: Optional[constr(min_length=10, max_length=10)]
-    completed: Optional[bool]
-    user_id: Optional[str]
-    status: Optional[Status]
-    priority: Optional[Priority]
-    tags: Optional[List[str]]
-    steps: Optional[List[Step]]
-    justification: Optional[constr(max_length=500)]
+    title: Optional[constr(min_length=1, max_length=100)] = None
+    description: Optional[str] = None
+    due_date: Optional[constr(min_length=10, max_length=10)] = None
+    completed: Optional[bool] = None
+    user_id: Optional[str] = None
+    status: Optional[Status] = None
+    priority: Optional[Priority] = None
+    tags: Optional[List[str]] = None
+    steps: Optional[List[Step]] = None
+    justification: Optional[constr(max_length=500)] = None
+    # Operaciones atómicas (no se combinan con `tags`/`steps` completos)
+    add_tags: Optional[List[constr(min_length=1)]] = Field(None, description="Etiquetas a añadir (ArrayUnion)")
+    remove_tags: Optional[List[constr(min_length=1)]] = Field(None, description="Etiquetas a quitar (ArrayRemove)")
+    step_updates: Optional[List[StepPatch]] = Field(None, description="Cambios en pasos concretos por índice")
 
     @validator('due_date')
     def validate_due_date_format_optional(cls, v):
@@ -103,6 +113,11 @@ class TaskPartialUpdate(BaseModel):
             raise ValueError("La fecha debe estar en el formato dd-mm-YYYY")
         return v
 
+# Respuesta de PATCH: qué campos se escribieron
+class TaskPatchResult(BaseModel):
+    id: str
+    updated: List[str]
+
 # Modelo de respuesta, incluye id y timestamps si quieres:
 class TaskInDB(TaskBase):
     id: str = Field(..., description="ID de la tarea")
@@ -113,6 +128,44 @@ class TaskInDB(TaskBase):
     class Config:
         orm_mode = True
 
+# Ítem de PUT /tasks/batch: la tarea completa más su id
+class TaskBatchUpdate(TaskUpdate):
+    id: str = Field(..., description="ID de la tarea a actualizar")
+
+# Resultado por ítem de las escrituras por lotes
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Posición del ítem en la petición")
+    id: Optional[str] = Field(None, description="ID del documento creado o actualizado")
+    status: str = Field(..., description="created, updated o error")
+    error: Optional[str] = Field(None, description="Motivo del fallo, si lo hubo")
+
+class BatchResult(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
+
+# Filtros, orden y proyección para los listados de tareas (query params)
+class TaskFilters(BaseModel):
+    status: Optional[str] = Field(None, description="Estado: Pendiente, En progreso o Completada")
+    priority: Optional[str] = Field(None, description="Prioridad: Baja, Media o Alta")
+    tag: Optional[str] = Field(None, description="Solo tareas con esta etiqueta")
+    completed: Optional[bool] = Field(None, description="Filtra por tareas completadas o no")
+    due_from: Optional[str] = Field(None, description="Fecha límite desde (dd-mm-YYYY, inclusive)")
+    due_to: Optional[str] = Field(None, description="Fecha límite hasta (dd-mm-YYYY, inclusive)")
+    order_by: Optional[str] = Field(None, description="due_date, title, status o priority; prefijo '-' para descendente")
+    fields: Optional[str] = Field(None, description="Campos a devolver separados por comas (el id siempre se incluye)")
+
+    def active(self) -> bool:
+        return any(v is not None for v in (
+            self.status, self.priority, self.tag, self.completed,
+            self.due_from, self.due_to, self.order_by, self.fields,
+        ))
+
+# Página de tareas para los listados paginados por cursor
+class TaskPage(BaseModel):
+    items: List[TaskInDB] = Field(default_factory=list, description="Tareas de la página")
+    next_cursor: Optional[str] = Field(None, description="Cursor para pedir la siguiente página (None si no hay más)")
+
 
     
    #Modelo de notas
@@ -143,6 +196,10 @@ class FocusTimeInDB(FocusTimeCreate):
     class Config:
         orm_mode = True  # o from_attributes en Pydantic v2
 
+class FocusTimePage(BaseModel):
+    items: List[FocusTimeInDB] = Field(default_factory=list, description="FocusTime de la página")
+    next_cursor: Optional[str] = Field(None, description="Cursor para pedir la siguiente página (None si no hay más)")
+
 # --- Nuevo schema para el resumen ---
 
 class FocusSummaryOut(BaseModel):
@@ -151,4 +208,21 @@ class FocusSummaryOut(BaseModel):
     total_minutes: int
 
     class Config:
-        orm_mode = True  # o from_attributes
\ No newline at end of file
+        orm_mode = True  # o from_attributes
+
+
+# --- Estadísticas de foco por periodos ---
+
+class FocusStatsBucket(BaseModel):
+    start: str = Field(..., description="Primer día del periodo (YYYY-MM-DD)")
+    total_minutes: int = Field(..., description="Minutos en foco del periodo")
+    groups: Optional[Dict[str, int]] = Field(None, description="Minutos por tarea o etiqueta (si se pidió group_by)")
+
+class FocusStatsOut(BaseModel):
+    user_id: str
+    from_: str = Field(..., alias="from", description="Inicio del rango (YYYY-MM-DD)")
+    to: str = Field(..., description="Fin del rango, inclusive (YYYY-MM-DD)")
+    bucket: str = Field(..., description="day, week o month")
+    group_by: Optional[str] = Field(None, description="task, tag o None")
+    total_minutes: int = Field(..., description="Minutos en foco de todo el rango")
+    buckets: List[FocusStatsBucket] = Field(default_factory=list, description="Periodos con actividad, en orden")
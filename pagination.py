@@ -0,0 +1,96 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+
+# ——— Paginación por cursor (keyset) ———
+#
+# El cursor es opaco para el cliente: codifica en base64 los valores de los
+# campos de orden del último documento devuelto (más su id como desempate),
+# de modo que la siguiente página se pide con `start_after(...)` sin tener
+# que releer ni saltar documentos con `offset`.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE     = 500
+
+ASCENDING  = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+DOC_ID = "__name__"
+
+OrderSpec = Sequence[Tuple[str, str]]
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str) -> List[Any]:
+    """Decodifica un cursor; lanza 400 si el token no es válido."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return [_decode_value(v) for v in values]
+
+
+def _order_fields(order_by: OrderSpec) -> List[Tuple[str, str]]:
+    """Añade el id del documento como desempate, con la dirección del último orden."""
+    fields = [(f, d) for f, d in order_by if f != DOC_ID]
+    last_direction = fields[-1][1] if fields else ASCENDING
+    return fields + [(DOC_ID, last_direction)]
+
+
+async def paginate(
+    query,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    order_by: OrderSpec = (),
+) -> Dict[str, Any]:
+    """
+    Aplica orden + cursor + límite a una consulta de Firestore y devuelve
+    {"items": [...], "next_cursor": str | None}.
+    """
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    fields = _order_fields(order_by)
+
+    for field, direction in fields:
+        query = query.order_by(field, direction=direction)
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(fields):
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        query = query.start_after({f: v for (f, _), v in zip(fields, values)})
+
+    # Pedimos uno de más para saber si existe una página siguiente
+    docs = [doc async for doc in query.limit(limit + 1).stream()]
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    items = [doc.to_dict() | {"id": doc.id} for doc in docs]
+    next_cursor = None
+    if has_more and docs:
+        last = items[-1]
+        next_cursor = encode_cursor([
+            last["id"] if f == DOC_ID else last.get(f) for f, _ in fields
+        ])
+    return {"items": items, "next_cursor": next_cursor}
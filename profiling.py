@@ -0,0 +1,122 @@
+import hmac
+import io
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+
+# ——— Perfilado bajo demanda de un worker en vivo ———
+#
+# Solo existe si se define TASKO_PROFILE_TOKEN: sin token no se registra ni
+# la ruta ni el middleware, así que desactivado no cuesta nada. Las
+# peticiones deben enviar el token en la cabecera `X-Profile-Token`.
+#
+#   GET /debug/profile?seconds=N   muestrea las pilas de todos los hilos del
+#                                  proceso durante N segundos y devuelve el
+#                                  formato "collapsed" de flamegraph.pl /
+#                                  speedscope (una línea `f1;f2;f3 <muestras>`)
+#   ?profile=1 en cualquier ruta   devuelve el resumen de cProfile de esa
+#                                  petición en lugar de su respuesta
+#
+# El muestreo corre en un hilo aparte con sys._current_frames(): no
+# instrumenta ninguna llamada, así que el coste es el de leer las pilas
+# cada TASKO_PROFILE_INTERVAL_MS milisegundos.
+
+TOKEN = os.getenv("TASKO_PROFILE_TOKEN", "")
+ENABLED = bool(TOKEN)
+TOKEN_HEADER = "X-Profile-Token"
+
+INTERVAL = float(os.getenv("TASKO_PROFILE_INTERVAL_MS", "5")) / 1000
+MAX_SECONDS = float(os.getenv("TASKO_PROFILE_MAX_SECONDS", "30"))
+CPROFILE_TOP = 40
+
+# Hojas de pila de un hilo que solo espera (event loop sin trabajo, pools ociosos)
+_IDLE_LEAVES = {("selectors.py", "select"), ("threading.py", "wait"), ("queue.py", "get"),
+                ("thread.py", "_worker")}
+
+_busy = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Ya hay un perfilado en curso en este worker (muestreo o ?profile=1)."""
+
+
+def authorized(token: Optional[str]) -> bool:
+    return ENABLED and token is not None and hmac.compare_digest(token.encode(), TOKEN.encode())
+
+
+def _frame_label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)})"
+
+def _collapse(frame) -> Optional[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(stack)) if stack else None
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_LEAVES
+
+def sample(seconds: float, include_idle: bool = False) -> str:
+    """
+    Muestrea las pilas de todos los hilos durante `seconds` y devuelve el
+    texto collapsed ordenado por número de muestras. Bloquea el hilo que lo
+    llama: desde el event loop, ejecutarlo en un hilo aparte.
+    """
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("Ya hay un perfilado en curso")
+    try:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not include_idle and _is_idle(frame)):
+                    continue
+                stack = _collapse(frame)
+                if stack:
+                    stacks[f"{names.get(ident, ident)};{stack}"] += 1
+            time.sleep(INTERVAL)
+    finally:
+        _busy.release()
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    cProfile de una sola petición (todo lo que corre en el hilo del event loop
+    mientras dura). Comparte `_busy` con `sample`: dos ?profile=1 concurrentes
+    se pisarían el perfilador del hilo, así que el segundo recibe ProfilerBusy.
+    """
+
+    def __init__(self):
+        import cProfile
+        self._profile = cProfile.Profile()
+
+    def __enter__(self):
+        if not _busy.acquire(blocking=False):
+            raise ProfilerBusy("Ya hay un perfilado en curso")
+        try:
+            self._profile.enable()
+        except BaseException:
+            _busy.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self._profile.disable()
+        finally:
+            _busy.release()
+
+    def summary(self, sort: str = "cumulative", limit: int = CPROFILE_TOP) -> str:
+        import pstats
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
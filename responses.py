@@ -0,0 +1,74 @@
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional, Type
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson está en requirements.txt
+    orjson = None
+
+
+# ——— Respuestas rápidas para datos propios ———
+#
+# Los documentos que leemos de nuestro almacenamiento ya pasaron la
+# validación al escribirse, así que volver a validarlos contra el
+# response_model en cada respuesta (validators, constr, Step anidados...)
+# solo gasta CPU. Estas respuestas se devuelven tal cual: FastAPI no
+# aplica el response_model a un Response, que queda solo para la
+# documentación OpenAPI.
+#
+# `project()` reproduce lo que haría el response_model: mismos campos y
+# en el mismo orden, con los valores por defecto del modelo para los que
+# falten y sin los campos internos (due_date_iso, focus_total_minutes...).
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializada con orjson (o json si no está instalado)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _is_required(field) -> bool:
+    # Pydantic v1 (ModelField.required) y v2 (FieldInfo.is_required())
+    required = getattr(field, "is_required", None)
+    return required() if callable(required) else bool(getattr(field, "required", False))
+
+def _output_spec(model: Type[BaseModel]) -> List[tuple]:
+    """[(campo, factoría del valor por defecto)] en el orden del modelo."""
+    spec = []
+    for name, field in model.__fields__.items():
+        factory: Optional[Callable[[], Any]] = getattr(field, "default_factory", None)
+        if factory is None:
+            default = None if _is_required(field) else field.default
+            factory = (lambda d: (lambda: d))(default)
+        spec.append((name, factory))
+    return spec
+
+_specs: Dict[type, List[tuple]] = {}
+
+def project(record: dict, model: Type[BaseModel]) -> dict:
+    spec = _specs.get(model)
+    if spec is None:
+        spec = _specs[model] = _output_spec(model)
+    return {name: record[name] if name in record else factory() for name, factory in spec}
+
+def project_all(records: Iterable[dict], model: Type[BaseModel]) -> List[dict]:
+    return [project(r, model) for r in records]
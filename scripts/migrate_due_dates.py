@@ -0,0 +1,30 @@
+"""
+Rellena `due_date_iso` (YYYY-MM-DD) en las tareas creadas antes de que se
+guardara junto a `due_date`. Sin ese campo las tareas no aparecen en los
+filtros por rango ni en /tasks/user/{id}/due.
+
+Es idempotente; ejecutar una vez tras desplegar:
+
+    python -m scripts.migrate_due_dates              # todas las tareas
+    python -m scripts.migrate_due_dates --user <id>  # solo un usuario
+    python -m scripts.migrate_due_dates --dry-run    # solo cuenta
+"""
+import argparse
+import asyncio
+
+import crud
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", dest="user_id", help="Migrar solo las tareas de este usuario")
+    parser.add_argument("--dry-run", action="store_true", help="No escribe; solo informa de lo que cambiaría")
+    args = parser.parse_args()
+
+    result = asyncio.run(crud.migrate_due_dates(args.user_id, dry_run=args.dry_run))
+    action = "por actualizar" if args.dry_run else "actualizadas"
+    print(f"✅ {result['scanned']} tareas revisadas, {result['updated']} {action}, {result['invalid']} con fecha inválida")
+
+
+if __name__ == "__main__":
+    main()
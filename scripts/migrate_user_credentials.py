@@ -0,0 +1,29 @@
+"""
+Hashea (scrypt) las contraseñas guardadas en texto plano, normaliza los
+emails a minúsculas y construye la colección `email_index` que usa /login.
+
+Los usuarios sin migrar siguen pudiendo entrar (se migran en su primer
+login), pero hasta entonces cada login de ese usuario cuesta una consulta.
+Es idempotente:
+
+    python -m scripts.migrate_user_credentials
+    python -m scripts.migrate_user_credentials --dry-run
+"""
+import argparse
+import asyncio
+
+import crud
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="No escribe; solo informa de lo que cambiaría")
+    args = parser.parse_args()
+
+    result = asyncio.run(crud.migrate_user_credentials(dry_run=args.dry_run))
+    print(f"✅ {result['scanned']} usuarios revisados, {result['indexed']} indexados, "
+          f"{result['conflicts']} con email vacío o duplicado")
+
+
+if __name__ == "__main__":
+    main()
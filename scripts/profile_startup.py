@@ -0,0 +1,108 @@
+"""
+Informe del coste de arranque en frío de la API: cuánto tarda `import main`
+(desglosado por paquete con `python -X importtime`) y la primera petición
+a una ruta que no toca la base de datos.
+
+Cada medición corre en un proceso nuevo, como un arranque en frío real:
+
+    python -m scripts.profile_startup                 # 5 arranques, ruta /
+    python -m scripts.profile_startup --runs 10 --top 20
+    python -m scripts.profile_startup --path /debug/search
+
+Las variables de entorno (TASKO_STORAGE, SERVICE_ACCOUNT_KEY...) se heredan,
+así que el informe refleja la configuración con la que se lance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en el proceso hijo: importa la app y sirve una petición ASGI a
+# mano (sin TestClient, para no medir también httpx)
+_CHILD = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+async def first_request(path):
+    sent = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        sent.append(message)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+    }
+    await main.app(scope, receive, send)
+    return sent[0]["status"]
+
+status = asyncio.run(first_request(sys.argv[1]))
+t2 = time.perf_counter()
+heavy = sorted(m for m in sys.modules if m.startswith(("google", "grpc")))
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "request_ms": (t2 - t1) * 1000,
+                  "status": status, "google_modules": len(heavy)}))
+"""
+
+
+def _run_child(path: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, path],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _importtime() -> Tuple[float, Dict[str, float]]:
+    """(total µs de `import main`, µs propios agregados por paquete raíz)."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    by_package: Dict[str, float] = defaultdict(float)
+    total = 0.0
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        by_package[module.split(".")[0]] += int(self_us)
+        if module == "main":
+            total = int(cumulative_us)
+    return total, by_package
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Arranques en frío a medir")
+    parser.add_argument("--top", type=int, default=12, help="Paquetes a mostrar en el desglose")
+    parser.add_argument("--path", default="/", help="Ruta de la primera petición")
+    args = parser.parse_args()
+
+    runs: List[dict] = [_run_child(args.path) for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in runs)
+    request_ms = statistics.median(r["request_ms"] for r in runs)
+
+    total_us, by_package = _importtime()
+    print(f"🧊 Arranque en frío ({args.runs} procesos, mediana)")
+    print(f"   import main            {import_ms:8.1f} ms")
+    print(f"   primera petición       {request_ms:8.1f} ms  (GET {args.path} -> {runs[-1]['status']})")
+    print(f"   total                  {import_ms + request_ms:8.1f} ms")
+    print(f"   módulos google/grpc cargados: {runs[-1]['google_modules']}")
+    print()
+    print(f"📦 Desglose de import main (-X importtime, {total_us / 1000:.1f} ms)")
+    for package, us in sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[: args.top]:
+        print(f"   {package:<28}{us / 1000:8.1f} ms  {us / max(total_us, 1):6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Reconstruye los documentos `dashboards/{user_id}` desde las tareas y notas
+(TASKO_DASHBOARD=1). Sirve para repararlos si se han desviado, p. ej. tras
+recompute_focus_rollups, migraciones o escrituras hechas fuera de la API:
+
+    python -m scripts.rebuild_dashboards              # todos los usuarios
+    python -m scripts.rebuild_dashboards --user <id>  # solo un usuario
+"""
+import argparse
+import asyncio
+
+import crud
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", dest="user_id", help="Reconstruir solo el dashboard de este usuario")
+    args = parser.parse_args()
+
+    rebuilt = asyncio.run(crud.rebuild_dashboards(args.user_id))
+    print(f"✅ Dashboards reconstruidos: {rebuilt}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Recalcula los buckets diarios de minutos en foco (`focus_buckets`) desde
+`focus_times`. Necesario una vez para las sesiones registradas antes de que
+existieran, y para repararlos si se han desviado:
+
+    python -m scripts.rebuild_focus_buckets              # todos los usuarios
+    python -m scripts.rebuild_focus_buckets --user <id>  # solo un usuario
+"""
+import argparse
+import asyncio
+
+import crud
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", dest="user_id", help="Recalcular solo los buckets de este usuario")
+    args = parser.parse_args()
+
+    written = asyncio.run(crud.rebuild_focus_buckets(args.user_id))
+    print(f"✅ Buckets de foco escritos: {written}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Recalcula el total de minutos en foco (`focus_total_minutes`) de cada tarea
+a partir de la colección `focus_times`.
+
+Ejecutar una vez tras desplegar los totales incrementales, y cuando se
+sospeche de desviaciones:
+
+    python -m scripts.recompute_focus_rollups              # todas las tareas
+    python -m scripts.recompute_focus_rollups --user <id>  # solo un usuario
+"""
+import argparse
+import asyncio
+
+import crud
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", dest="user_id", help="Recalcular solo las tareas de este usuario")
+    args = parser.parse_args()
+
+    changed = asyncio.run(crud.recompute_focus_rollups(args.user_id))
+    print(f"✅ Totales de foco recalculados: {changed} tareas actualizadas")
+
+
+if __name__ == "__main__":
+    main()
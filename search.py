@@ -0,0 +1,424 @@
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import cache
+import database
+import mirror
+
+
+# ——— Búsqueda de texto en notas y tareas ———
+#
+# Índice invertido en memoria, particionado por usuario (una búsqueda solo
+# recorre los términos de ese usuario). Se alimenta desde las escrituras de
+# `crud` (y del espejo on_snapshot si está activo) y se guarda en disco como
+# snapshot JSON para arrancar en caliente.
+#
+# Con varios workers, cada uno solo ve sus propias escrituras: sin el espejo,
+# la partición de un usuario caduca a los TASKO_SEARCH_TTL segundos de
+# construirse y se reconstruye en la siguiente búsqueda (como la caché de
+# listados de `crud`). Con el espejo listo, sus listeners reindexan también
+# las escrituras de los demás workers y las particiones construidas así no
+# caducan. Las cargadas de un snapshot caducan siempre, contando desde que
+# se construyeron: el snapshot no sabe qué cambió después.
+#
+# Tokenización para español: minúsculas, sin tildes ni diéresis (también
+# ñ -> n), sin palabras vacías y con plurales regulares (-s, -es).
+# Cada término de la consulta casa por prefijo ("reun" encuentra "reunión"),
+# y todos los términos deben aparecer (AND). Ranking tipo TF-IDF con más peso
+# para el título y para las coincidencias exactas.
+#
+# Configuración:
+#   TASKO_SEARCH_DIR            carpeta de snapshots (por defecto en /tmp); guarda
+#                               títulos y textos, así que se crea con permisos 0700
+#                               y se ignora si pertenece a otro usuario
+#   TASKO_SEARCH_SAVE_INTERVAL  segundos mínimos entre guardados (60)
+#   TASKO_SEARCH_TTL            vida de una partición sin espejo (TASKO_CACHE_TTL)
+
+SNAPSHOT_DIR = os.getenv("TASKO_SEARCH_DIR", os.path.join(tempfile.gettempdir(), "tasko-search"))
+SNAPSHOT_FILE = os.path.join(SNAPSHOT_DIR, "index.json")
+SNAPSHOT_VERSION = 2
+SAVE_INTERVAL = float(os.getenv("TASKO_SEARCH_SAVE_INTERVAL", "60"))
+PARTITION_TTL = float(os.getenv("TASKO_SEARCH_TTL", str(cache.DEFAULT_TTL)))
+
+TITLE_WEIGHT = 3.0
+PREFIX_PENALTY = 0.5
+MAX_RESULTS = 100
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aun bajo cada como con contra cual cuando
+de del desde donde dos e el ella ellas ellos en entre era eran es esa esas ese eso esos esta estan
+estas este esto estos fue fueron ha hay hasta la las le les lo los mas me mi mis muy nada ni no nos
+o os otra otras otro otros para pero poco por porque que quien se sea segun ser si sin sobre solo
+son su sus tambien tan tanto te tiene tienen todo todos tu tus u un una unas uno unos y ya yo
+""".split())
+
+# Cómo se indexa cada tipo: campo del documento -> campo del índice
+FIELDS = {
+    "task": {"title": "title", "description": "body"},
+    "note": {"title": "title", "texto": "body"},
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_VOWELS = frozenset("aeiou")
+
+
+def _private_dir(path: str) -> None:
+    """Crea `path` accesible solo para el usuario del proceso; OSError si pertenece a otro."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise PermissionError(f"{path} pertenece a otro usuario")
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin marcas diacríticas ("Reunión" -> "reunion")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+# Consonantes tras las que el plural es -es (reunion-es, papel-es, flor-es, reloj-es)
+_ES_PLURAL_AFTER = frozenset("lnrj")
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("es") and token[-3] in _ES_PLURAL_AFTER:
+        return token[:-2]
+    # Plural regular tras vocal: tareas -> tarea, clases -> clase
+    if len(token) > 3 and token[-1] == "s" and token[-2] in _VOWELS:
+        return token[:-1]
+    return token
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [_stem(t) for t in _WORD_RE.findall(fold(text)) if t not in STOPWORDS]
+
+
+class _UserIndex:
+    """Índice de un usuario: documentos, postings y términos ordenados (para prefijos)."""
+
+    def __init__(self, built_at: Optional[float] = None, expires_at: Optional[float] = None):
+        self.docs: Dict[Tuple[str, str], dict] = {}
+        self.postings: Dict[str, Dict[Tuple[str, str], float]] = defaultdict(dict)
+        self._terms: List[str] = []
+        self._terms_dirty = False
+        # built_at: time.time() al empezar a construirla; expires_at: monotonic (None = no caduca)
+        self.built_at = time.time() if built_at is None else built_at
+        self.expires_at = expires_at
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def put(self, key: Tuple[str, str], doc: dict) -> None:
+        self.remove(key)
+        weights: Counter = Counter()
+        for token in tokenize(doc.get("title")):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(doc.get("body")):
+            weights[token] += 1.0
+        length_norm = 1.0 / math.sqrt(max(sum(weights.values()), 1.0))
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self._terms_dirty = True
+            self.postings[token][key] = weight * length_norm
+        self.docs[key] = doc | {"terms": list(weights)}
+
+    def remove(self, key: Tuple[str, str]) -> Optional[dict]:
+        doc = self.docs.pop(key, None)
+        if doc is not None:
+            for token in doc["terms"]:
+                posting = self.postings.get(token)
+                if posting is not None:
+                    posting.pop(key, None)
+                    if not posting:
+                        del self.postings[token]
+                        self._terms_dirty = True
+        return doc
+
+    def _expand(self, prefix: str) -> List[str]:
+        if self._terms_dirty:
+            self._terms = sorted(self.postings)
+            self._terms_dirty = False
+        i = bisect_left(self._terms, prefix)
+        out = []
+        while i < len(self._terms) and self._terms[i].startswith(prefix):
+            out.append(self._terms[i])
+            i += 1
+        return out
+
+    def search(self, tokens: List[str], kinds: Optional[Iterable[str]], limit: int) -> List[dict]:
+        total = max(len(self.docs), 1)
+        scores: Optional[Dict[Tuple[str, str], float]] = None
+        for token in dict.fromkeys(tokens):
+            token_scores: Dict[Tuple[str, str], float] = defaultdict(float)
+            for term in self._expand(token):
+                posting = self.postings[term]
+                idf = math.log(1 + total / len(posting))
+                factor = idf if term == token else idf * PREFIX_PENALTY
+                for key, weight in posting.items():
+                    token_scores[key] = max(token_scores[key], weight * factor)
+            # AND: solo siguen los documentos que contienen todos los términos
+            scores = token_scores if scores is None else {k: s + token_scores[k] for k, s in scores.items() if k in token_scores}
+            if not scores:
+                return []
+        kinds = set(kinds) if kinds else None
+        ranked = heapq.nsmallest(
+            limit,
+            ((s, k) for k, s in (scores or {}).items() if kinds is None or k[0] in kinds),
+            key=lambda item: (-item[0], item[1]),
+        )
+        return [
+            {"kind": kind, "id": doc_id, "title": self.docs[(kind, doc_id)].get("title"), "score": round(score, 4)}
+            for score, (kind, doc_id) in ranked
+        ]
+
+
+def _fed_by_mirror() -> bool:
+    # Con el espejo listo, los listeners de `crud` reindexan todas las escrituras
+    return all(mirror.get_mirror(name) is not None for name in ("tareas", "notes"))
+
+def _merge_record(kind: str, base: Optional[dict], record: dict) -> dict:
+    """Documento del índice con los campos presentes en `record` sobre `base` (actualizaciones parciales)."""
+    doc = {f: (base or {}).get(f) for f in ("title", "body")}
+    for source, target in FIELDS[kind].items():
+        if source in record:
+            doc[target] = record[source]
+    return doc
+
+
+class SearchIndex:
+    def __init__(self):
+        self._users: Dict[str, _UserIndex] = {}
+        self._owners: Dict[Tuple[str, str], str] = {}
+        # Escrituras vistas mientras se construye la partición de un usuario,
+        # para aplicarlas después sobre lo que devolvió la consulta
+        self._build_logs: Dict[str, List[tuple]] = {}
+        self._builds: Counter = Counter()
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_save = 0.0
+        self._saving = False
+        self.loaded_from_snapshot = False
+
+    # — Escrituras —
+
+    def _log(self, user_id: Optional[str], kind: str, doc_id: str, record: Optional[dict]) -> None:
+        # Dueño desconocido: puede ser de cualquier partición en construcción
+        for uid, log in self._build_logs.items():
+            if user_id is None or uid == user_id:
+                log.append((kind, doc_id, record))
+
+    def index_record(self, kind: str, doc_id: str, record: dict) -> None:
+        """
+        Indexa (o actualiza con los campos presentes) una tarea o nota. Los
+        usuarios cuyo índice aún no se ha construido se ignoran: se
+        construirán completos en su primera búsqueda.
+        """
+        key = (kind, doc_id)
+        with self._lock:
+            old_owner = self._owners.get(key)
+            old = self._users[old_owner].docs.get(key) if old_owner in self._users else None
+            user_id = record.get("user_id") or old_owner
+            self._log(user_id, kind, doc_id, record)
+            if user_id is None:
+                return
+            if old_owner is not None and old_owner != user_id:
+                self.remove(kind, doc_id)
+            index = self._users.get(user_id)
+            if index is None:
+                return
+            index.put(key, _merge_record(kind, old, record))
+            self._owners[key] = user_id
+            self._dirty = True
+        self.maybe_save()
+
+    def remove(self, kind: str, doc_id: str) -> None:
+        key = (kind, doc_id)
+        with self._lock:
+            owner = self._owners.pop(key, None)
+            self._log(owner, kind, doc_id, None)
+            if owner in self._users:
+                self._users[owner].remove(key)
+                self._dirty = True
+
+    def drop_user(self, user_id: str) -> None:
+        with self._lock:
+            index = self._users.pop(user_id, None)
+            if index is not None:
+                self._forget(index)
+                self._dirty = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+            self._owners.clear()
+            self._dirty = True
+
+    def _forget(self, index: _UserIndex) -> None:
+        for key in index.docs:
+            self._owners.pop(key, None)
+
+    # — Construcción y búsqueda —
+
+    async def _build_user(self, user_id: str) -> _UserIndex:
+        index = _UserIndex(expires_at=None if _fed_by_mirror() else time.monotonic() + PARTITION_TTL)
+        with self._lock:
+            log = self._build_logs.setdefault(user_id, [])
+            start = len(log)
+            self._builds[user_id] += 1
+        try:
+            for kind, collection_name in (("task", "tareas"), ("note", "notes")):
+                fields = list(FIELDS[kind])
+                query = database.collection(collection_name).where("user_id", "==", user_id).select(fields)
+                async for doc in query.stream():
+                    data = doc.to_dict()
+                    index.put((kind, doc.id), {target: data.get(source) for source, target in FIELDS[kind].items()})
+        finally:
+            with self._lock:
+                pending = log[start:]
+                self._builds[user_id] -= 1
+                if not self._builds[user_id]:
+                    del self._builds[user_id]
+                    del self._build_logs[user_id]
+
+        with self._lock:
+            # Lo escrito durante la consulta puede no estar en su resultado
+            for kind, doc_id, record in pending:
+                key = (kind, doc_id)
+                owner = None if record is None else record.get("user_id")
+                if record is None or owner not in (None, user_id):
+                    index.remove(key)
+                elif owner == user_id or key in index.docs:
+                    index.put(key, _merge_record(kind, index.docs.get(key), record))
+            current = self._users.get(user_id)
+            if current is not None and current.built_at > index.built_at:
+                return current  # otro build más reciente llegó antes
+            if current is not None:
+                self._forget(current)
+            self._users[user_id] = index
+            for key in index.docs:
+                self._owners[key] = user_id
+            self._dirty = True
+        self.maybe_save()
+        return index
+
+    async def search(self, user_id: str, q: str, limit: int = 20, kinds: Optional[Iterable[str]] = None) -> List[dict]:
+        tokens = tokenize(q)
+        if not tokens:
+            return []
+        index = self._users.get(user_id)
+        if index is None or index.expired():
+            # Se busca en la partición construida aunque un clear(), drop_user()
+            # o su caducidad la saquen de _users mientras tanto
+            index = await self._build_user(user_id)
+        with self._lock:
+            return index.search(tokens, kinds, min(limit, MAX_RESULTS))
+
+    # — Snapshots —
+    #
+    # Un único fichero para todos los workers: al guardar se combina con lo
+    # que haya (por usuario gana la partición construida más tarde). Si dos
+    # workers guardan a la vez puede perderse alguna partición del otro, que
+    # simplemente se reconstruirá en su próxima búsqueda.
+
+    @staticmethod
+    def _read_snapshot() -> Dict[str, dict]:
+        try:
+            _private_dir(SNAPSHOT_DIR)
+            with open(SNAPSHOT_FILE, encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if payload.get("version") != SNAPSHOT_VERSION:
+            return {}
+        now = time.time()
+        return {uid: p for uid, p in payload["users"].items() if now - p["built_at"] < PARTITION_TTL}
+
+    def save(self) -> None:
+        with self._lock:
+            users = {
+                uid: {
+                    "built_at": index.built_at,
+                    "docs": [[kind, doc_id, doc.get("title"), doc.get("body")] for (kind, doc_id), doc in index.docs.items()],
+                }
+                for uid, index in self._users.items() if not index.expired()
+            }
+            self._dirty = False
+            self._last_save = time.monotonic()
+        for uid, partition in self._read_snapshot().items():
+            if uid not in users or partition["built_at"] > users[uid]["built_at"]:
+                users[uid] = partition
+        payload = {"version": SNAPSHOT_VERSION, "saved_at": time.time(), "users": users}
+        _private_dir(SNAPSHOT_DIR)
+        fd, tmp = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, SNAPSHOT_FILE)
+
+    def maybe_save(self) -> None:
+        """Guarda en un hilo aparte si hay cambios y pasó SAVE_INTERVAL desde el último guardado."""
+        with self._lock:
+            if not self._dirty or self._saving or time.monotonic() - self._last_save < SAVE_INTERVAL:
+                return
+            self._saving = True
+        threading.Thread(target=self._save_in_background, name="search-snapshot", daemon=True).start()
+
+    def _save_in_background(self) -> None:
+        try:
+            self.save()
+        except OSError:
+            logger.exception("No se pudo guardar el snapshot de búsqueda")
+        finally:
+            self._saving = False
+
+    def load(self) -> bool:
+        """
+        Carga las particiones del snapshot que aún no han caducado. Caducan a
+        los PARTITION_TTL segundos de haberse construido, como las demás.
+        """
+        partitions = self._read_snapshot()
+        if not partitions:
+            return False
+        now = time.time()
+        with self._lock:
+            for uid, partition in partitions.items():
+                if uid in self._users:
+                    continue
+                age = now - partition["built_at"]
+                index = _UserIndex(partition["built_at"], time.monotonic() + PARTITION_TTL - age)
+                for kind, doc_id, title, body in partition["docs"]:
+                    index.put((kind, doc_id), {"title": title, "body": body})
+                    self._owners[(kind, doc_id)] = uid
+                self._users[uid] = index
+            self._last_save = time.monotonic()
+        self.loaded_from_snapshot = True
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "documents": len(self._owners),
+                "terms": sum(len(i.postings) for i in self._users.values()),
+                "expired": sum(1 for i in self._users.values() if i.expired()),
+                "partition_ttl": PARTITION_TTL,
+                "fed_by_mirror": _fed_by_mirror(),
+                "loaded_from_snapshot": self.loaded_from_snapshot,
+                "snapshot": SNAPSHOT_FILE,
+            }
+
+
+index = SearchIndex()
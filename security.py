@@ -0,0 +1,75 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+
+# ——— Hash de contraseñas ———
+#
+# scrypt de la librería estándar (hashlib), sin dependencias nativas extra.
+# Formato guardado:  scrypt$<n>$<r>$<p>$<sal base64>$<hash base64>
+# Los parámetros viajan con el hash, así que se pueden endurecer más
+# adelante: verify_password indica cuándo conviene re-hashear.
+#
+# El cálculo es CPU intensivo (~50 ms y 16 MB con los valores por defecto),
+# así que las variantes async lo ejecutan en un pool de hilos acotado
+# (TASKO_HASH_WORKERS) para no bloquear el event loop.
+
+SCHEME = "scrypt"
+SCRYPT_N = int(os.getenv("TASKO_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TASKO_HASH_WORKERS", "4")),
+    thread_name_prefix="password-hash",
+)
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r + 1024 * 1024, dklen=HASH_BYTES,
+    )
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+def is_hashed(stored: Optional[str]) -> bool:
+    return bool(stored) and stored.startswith(SCHEME + "$")
+
+def hash_password(password: str) -> str:
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{SCHEME}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+def verify_password(password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+    """
+    Devuelve (válida, requiere_rehash). Acepta también contraseñas antiguas
+    en texto plano, que siempre requieren rehash.
+    """
+    if not stored:
+        return False, False
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")), True
+    try:
+        _, n, r, p, salt, expected = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+        digest = _scrypt(password, base64.b64decode(salt), n, r, p)
+    except (ValueError, TypeError):
+        return False, False
+    ok = hmac.compare_digest(digest, base64.b64decode(expected))
+    return ok, ok and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_pool, hash_password, password)
+
+async def verify_password_async(password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+    return await asyncio.get_running_loop().run_in_executor(_pool, verify_password, password, stored)
@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+# Antes de importar la app: backend en memoria, scrypt barato y snapshots
+# de búsqueda fuera de /tmp compartido
+os.environ["TASKO_STORAGE"] = "memory"
+os.environ.setdefault("TASKO_SCRYPT_N", "1024")
+os.environ.setdefault("TASKO_SEARCH_DIR", tempfile.mkdtemp(prefix="tasko-search-test-"))
+
+import pytest  # noqa: E402
+
+import cache  # noqa: E402
+import crud  # noqa: E402
+import database  # noqa: E402
+import memory_store  # noqa: E402
+import search  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def db():
+    """Un MemoryClient limpio (y cachés e índice vacíos) por prueba."""
+    client = memory_store.MemoryClient()
+    database.set_db(client)
+    cache.clear_all()
+    search.index.clear()
+    yield client
+    database.set_db(None)
+
+
+@pytest.fixture
+def dashboard(monkeypatch):
+    monkeypatch.setattr(crud, "DASHBOARD_ENABLED", True)
+
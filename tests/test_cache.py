@@ -0,0 +1,42 @@
+from cache import MISSING, TTLCache
+
+
+def test_lru_evicts_least_recently_used():
+    c = TTLCache("t", maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1
+    c.set("c", 3)
+    assert c.get("b") is MISSING
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert c.evictions == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    c = TTLCache("t", maxsize=10, ttl=5)
+    c.set("a", 1)
+    now[0] += 4
+    assert c.get("a") == 1
+    now[0] += 2
+    assert c.get("a") is MISSING
+
+
+def test_invalidate_tag_removes_every_tagged_entry():
+    c = TTLCache("t", maxsize=10, ttl=60)
+    c.set(("u1", None), [1, 2], tags=[("user", "u1"), ("task", "t1"), ("task", "t2")])
+    c.set(("u1", "x"), [2], tags=[("user", "u1"), ("task", "t2")])
+    c.set(("u2", None), [3], tags=[("user", "u2"), ("task", "t3")])
+    c.invalidate_tag(("task", "t2"))
+    assert c.get(("u1", None)) is MISSING and c.get(("u1", "x")) is MISSING
+    assert c.get(("u2", None)) == [3]
+    # Las etiquetas de las entradas borradas no se quedan colgando
+    c.invalidate_tag(("user", "u1"))
+    assert c.stats()["size"] == 1
+
+
+def test_size_zero_disables_cache():
+    c = TTLCache("t", maxsize=0, ttl=60)
+    c.set("a", 1)
+    assert c.get("a") is MISSING
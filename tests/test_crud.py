@@ -0,0 +1,232 @@
+import pytest
+from fastapi import HTTPException
+
+import crud
+from models import FocusTimeCreate, FocusTimeUpdate, TaskCreate, TaskFilters, TaskPartialUpdate, TaskUpdate, User
+
+pytestmark = pytest.mark.anyio
+
+
+def _task(user_id="u1", **fields) -> TaskCreate:
+    return TaskCreate(**{"title": "Tarea", "due_date": "15-03-2025", "user_id": user_id, **fields})
+
+
+# ——— Tareas y cachés ———
+
+async def test_task_lookup_is_cached_and_invalidated_on_write(db):
+    task = await crud.create_task(_task(title="Antes"))
+    assert (await crud.get_task_by_id(task["id"]))["title"] == "Antes"
+    db.reset_stats()
+    await crud.get_task_by_id(task["id"])
+    assert db.stats["reads"] == 0
+
+    await crud.update_task(task["id"], TaskUpdate(**{**task, "title": "Después"}))
+    assert (await crud.get_task_by_id(task["id"]))["title"] == "Después"
+
+
+async def test_user_listing_sees_new_updated_and_deleted_tasks():
+    a = await crud.create_task(_task(status="Pendiente"))
+    assert [t["id"] for t in await crud.get_tasks_by_user("u1", status="Pendiente")] == [a["id"]]
+
+    b = await crud.create_task(_task(status="Pendiente"))
+    assert len(await crud.get_tasks_by_user("u1", status="Pendiente")) == 2
+
+    await crud.update_task(a["id"], TaskUpdate(**{**a, "status": "Completada"}))
+    assert [t["id"] for t in await crud.get_tasks_by_user("u1", status="Pendiente")] == [b["id"]]
+    assert [t["id"] for t in await crud.get_tasks_by_user("u1", status="Completada")] == [a["id"]]
+
+    await crud.delete_task(b["id"])
+    assert await crud.get_tasks_by_user("u1", status="Pendiente") == []
+
+
+async def test_patch_writes_only_sent_fields():
+    task = await crud.create_task(_task(tags=["a"], steps=[{"description": "uno"}, {"description": "dos"}]))
+    result = await crud.patch_task(task["id"], TaskPartialUpdate(
+        title="Nuevo", add_tags=["b"], step_updates=[{"index": 1, "completed": True}],
+    ))
+    assert result["updated"] == ["steps", "tags", "title"]
+    stored = await crud.get_task_by_id(task["id"])
+    assert stored["title"] == "Nuevo" and stored["tags"] == ["a", "b"]
+    assert [s["completed"] for s in stored["steps"]] == [False, True]
+
+    with pytest.raises(HTTPException) as exc:
+        await crud.patch_task("no-existe", TaskPartialUpdate(title="x"))
+    assert exc.value.status_code == 404
+
+
+async def test_query_tasks_filters_orders_and_projects():
+    for title, prio, due in (("b", "Alta", "10-01-2025"), ("a", "Baja", "05-01-2025"), ("c", "Alta", "01-02-2025")):
+        await crud.create_task(_task(title=title, priority=prio, due_date=due))
+    await crud.create_task(_task("u2", title="otro"))
+
+    rows = await crud.query_tasks(TaskFilters(order_by="-title", fields="title"), user_id="u1")
+    assert [r["title"] for r in rows] == ["c", "b", "a"]
+    assert set(rows[0]) == {"id", "title"}
+
+    rows = await crud.query_tasks(TaskFilters(priority="alta", order_by="due_date"), user_id="u1")
+    assert [r["title"] for r in rows] == ["b", "c"]
+
+    rows = await crud.query_tasks(TaskFilters(due_from="06-01-2025", due_to="2025-01-31"), user_id="u1")
+    assert [r["title"] for r in rows] == ["b"]
+
+    page = await crud.query_tasks(TaskFilters(order_by="title"), user_id="u1", limit=2)
+    rest = await crud.query_tasks(TaskFilters(order_by="title"), user_id="u1", limit=2, cursor=page["next_cursor"])
+    assert [r["title"] for r in page["items"] + rest["items"]] == ["a", "b", "c"]
+    assert rest["next_cursor"] is None
+
+
+async def test_fields_projection_hides_order_fields():
+    for title, due in (("b", "10-01-2025"), ("a", "05-01-2025"), ("c", "01-02-2025")):
+        await crud.create_task(_task(title=title, due_date=due))
+    filters = TaskFilters(order_by="due_date", fields="title")
+
+    rows = await crud.query_tasks(filters, user_id="u1")
+    assert [r["title"] for r in rows] == ["a", "b", "c"]
+    assert all(set(r) == {"id", "title"} for r in rows)
+
+    # El cursor se sigue construyendo con el campo de orden aunque no se devuelva
+    page = await crud.query_tasks(filters, user_id="u1", limit=2)
+    rest = await crud.query_tasks(filters, user_id="u1", limit=2, cursor=page["next_cursor"])
+    assert [r["title"] for r in page["items"] + rest["items"]] == ["a", "b", "c"]
+    assert all(set(r) == {"id", "title"} for r in page["items"] + rest["items"])
+
+
+# ——— Usuarios y login ———
+
+async def test_login_with_hashed_password_and_email_normalization():
+    user = await crud.create_user(User(email="Ana@Example.com", password="secreto"))
+    assert (await crud.login_user(" ana@example.COM", "secreto"))["user_id"] == user["id"]
+    with pytest.raises(HTTPException) as exc:
+        await crud.login_user("ana@example.com", "otra")
+    assert exc.value.status_code == 401
+    with pytest.raises(HTTPException) as exc:
+        await crud.create_user(User(email="ana@example.com", password="xxxx"))
+    assert exc.value.status_code == 409
+
+
+async def test_password_change_and_delete_revoke_old_credentials():
+    user = await crud.create_user(User(email="ana@example.com", password="vieja"))
+    await crud.login_user("ana@example.com", "vieja")
+    await crud.update_user(user["id"], User(email="ana@example.com", password="nueva"))
+    with pytest.raises(HTTPException):
+        await crud.login_user("ana@example.com", "vieja")
+    assert (await crud.login_user("ana@example.com", "nueva"))["user_id"] == user["id"]
+
+    await crud.delete_user(user["id"])
+    with pytest.raises(HTTPException):
+        await crud.login_user("ana@example.com", "nueva")
+
+
+async def test_legacy_plaintext_user_is_rehashed_on_login(db):
+    await db.collection("users").document("old").set({"email": "old@example.com", "password": "plano"})
+    assert (await crud.login_user("old@example.com", "plano"))["user_id"] == "old"
+    stored = (await db.collection("users").document("old").get()).to_dict()
+    assert stored["password"].startswith("scrypt$")
+    assert (await db.collection(crud.EMAIL_INDEX).document("old@example.com").get()).exists
+
+
+# ——— Foco ———
+
+async def test_focus_totals_and_stats_follow_writes():
+    task = await crud.create_task(_task(tags=["trabajo"]))
+    first = await crud.create_focus_time(FocusTimeCreate(task_id=task["id"], minutes=25))
+    await crud.create_focus_times_batch([FocusTimeCreate(task_id=task["id"], minutes=10)])
+    await crud.update_focus_time(first["id"], FocusTimeUpdate(minutes=30))
+
+    summary = await crud.get_total_focus_time_by_user("u1")
+    assert summary == [{"task_id": task["id"], "task_title": "Tarea", "total_minutes": 40}]
+
+    stats = await crud.get_focus_stats("u1", group_by="tag")
+    assert stats["total_minutes"] == 40
+    assert [b["groups"] for b in stats["buckets"]] == [{"trabajo": 40}]
+    # Los buckets mantenidos en cada escritura coinciden con los recalculados
+    await crud.rebuild_focus_buckets("u1")
+    assert await crud.get_focus_stats("u1", group_by="tag") == stats
+
+
+async def test_focus_stats_numpy_matches_python(monkeypatch):
+    pytest.importorskip("numpy")
+    days = [
+        {"day": f"2025-0{m}-{d:02d}", "total_minutes": m * d, "by_task": {f"t{d % 3}": m * d}}
+        for m in (1, 2, 3) for d in range(1, 29, 3)
+    ]
+    for bucket in crud.FOCUS_STATS_BUCKETS:
+        expected = crud._merge_focus_buckets(days, bucket, "by_task")
+        got = crud._merge_focus_buckets_numpy(crud._numpy(), days, bucket, "by_task")
+        assert [(b["start"], b["total_minutes"], dict(b["groups"])) for b in expected] == \
+               [(b["start"], b["total_minutes"], b["groups"]) for b in got]
+
+
+# ——— Dashboard ———
+
+def _without_timestamps(dash: dict) -> dict:
+    return {k: v for k, v in dash.items() if k != "updated_at"}
+
+async def test_dashboard_deltas_match_a_rebuild(dashboard, monkeypatch):
+    monkeypatch.setattr(crud, "DASHBOARD_UPCOMING", 2)
+    await crud.get_dashboard("u1")  # crea el documento
+    tasks = [
+        await crud.create_task(_task(title=f"t{i}", due_date=f"{10 + i:02d}-03-2025", priority=p))
+        for i, p in enumerate(("Alta", "Baja", "Media", "Alta"))
+    ]
+    await crud.patch_task(tasks[0]["id"], TaskPartialUpdate(completed=True, status="Completada"))
+    await crud.update_task(tasks[1]["id"], TaskUpdate(**{**tasks[1], "user_id": "u2"}))
+    await crud.delete_task(tasks[2]["id"])
+    await crud.create_note("u1", "Nota", "texto")
+    await crud.create_focus_time(FocusTimeCreate(task_id=tasks[3]["id"], minutes=15))
+
+    stored = await crud.get_dashboard("u1")
+    assert _without_timestamps(stored) == _without_timestamps(await crud._build_dashboard("u1"))
+    assert stored["tasks"]["total"] == 2 and stored["focus_total_minutes"] == 15
+    assert [e["title"] for e in stored["upcoming"]] == ["t3"]
+
+
+async def test_user_responses_never_include_the_password_hash():
+    user = await crud.create_user(User(email="ana@example.com", password="secreto"))
+    assert set(user) == {"id", "email"}
+    assert "password" not in await crud.get_user_by_id(user["id"])
+    assert all("password" not in u for u in await crud.get_all_users())
+    assert all("password" not in u for u in (await crud.get_users_page(10))["items"])
+
+
+async def test_login_cache_expires_quickly_after_changes_elsewhere(db, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    user = await crud.create_user(User(email="ana@example.com", password="vieja"))
+    await crud.login_user("ana@example.com", "vieja")
+    # Otro worker cambia la contraseña: la caché de este no se entera
+    entry = {"user_id": user["id"], "password": await crud.hash_password_async("nueva")}
+    await db.collection(crud.EMAIL_INDEX).document("ana@example.com").set(entry)
+
+    now[0] += crud.LOGIN_CACHE_TTL + 0.1
+    with pytest.raises(HTTPException):
+        await crud.login_user("ana@example.com", "vieja")
+    assert (await crud.login_user("ana@example.com", "nueva"))["user_id"] == user["id"]
+
+
+@pytest.mark.parametrize("warm_task_cache", [True, False])
+async def test_patch_refreshes_listings_for_other_filter_values(warm_task_cache):
+    task = await crud.create_task(_task(tags=["x"]))
+    if warm_task_cache:
+        await crud.get_task_by_id(task["id"])
+    assert await crud.get_tasks_by_user("u1", tag="y") == []
+    assert await crud.get_tasks_by_user("u1", status="Completada") == []
+
+    await crud.patch_task(task["id"], TaskPartialUpdate(add_tags=["y"], status="Completada"))
+    assert [t["id"] for t in await crud.get_tasks_by_user("u1", tag="y")] == [task["id"]]
+    assert [t["id"] for t in await crud.get_tasks_by_user("u1", status="Completada")] == [task["id"]]
+
+
+@pytest.mark.parametrize("step_updates", [None, [{"index": 0, "completed": True}]])
+async def test_cold_patch_only_drops_the_owners_listings(db, step_updates):
+    task = await crud.create_task(_task(steps=[{"description": "uno"}]))
+    other = await crud.create_task(_task("u2"))
+    assert await crud.get_tasks_by_user("u1", status="Completada") == []
+    await crud.get_tasks_by_user("u2")
+    crud.task_cache.clear()  # el dueño no está en caché
+
+    await crud.patch_task(task["id"], TaskPartialUpdate(status="Completada", step_updates=step_updates))
+    assert [t["id"] for t in await crud.get_tasks_by_user("u1", status="Completada")] == [task["id"]]
+    db.reset_stats()
+    assert [t["id"] for t in await crud.get_tasks_by_user("u2")] == [other["id"]]
+    assert db.stats["reads"] == 0
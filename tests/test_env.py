@@ -0,0 +1,27 @@
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_dotenv_flags_are_seen_by_modules_read_at_import(tmp_path):
+    # Copia de la app con un .env propio (load_dotenv busca junto a database.py)
+    for path in glob.glob(os.path.join(ROOT, "*.py")):
+        shutil.copy(path, tmp_path)
+    (tmp_path / ".env").write_text(
+        "TASKO_STORAGE=memory\nTASKO_MIRROR=1\nTASKO_DASHBOARD=1\nTASKO_CACHE_TASKS_TTL=7\n"
+    )
+    env = {k: v for k, v in os.environ.items() if not k.startswith("TASKO_")}
+    out = subprocess.run(
+        [sys.executable, "-c", (
+            "import json, main, crud, database, mirror; "
+            "print(json.dumps([database.storage_backend(), mirror.MIRROR_ENABLED, "
+            "crud.DASHBOARD_ENABLED, crud.task_cache.ttl]))"
+        )],
+        cwd=tmp_path, env=env, capture_output=True, text=True, check=True,
+    )
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == ["memory", True, True, 7.0]
@@ -0,0 +1,79 @@
+import itertools
+import json
+import os
+
+import pytest
+from fastapi import HTTPException
+
+import crud
+from models import TaskFilters
+
+pytestmark = pytest.mark.anyio
+
+INDEXES_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "firestore.indexes.json")
+
+FILTER_VALUES = {"tag": "x", "status": "Pendiente", "priority": "Alta", "completed": False}
+ORDERS = [None] + [prefix + name for name in crud.TASK_ORDER_FIELDS for prefix in ("", "-")]
+
+
+def _declared_indexes():
+    with open(INDEXES_FILE) as f:
+        indexes = json.load(f)["indexes"]
+    return {
+        (frozenset(f["fieldPath"] for f in index["fields"][:-1]), index["fields"][-1]["fieldPath"], index["fields"][-1].get("order"))
+        for index in indexes if index["collectionGroup"] == "tareas"
+    }
+
+
+def _shapes():
+    for user_id in (None, "u1"):
+        for n in range(len(FILTER_VALUES) + 1):
+            for names in itertools.combinations(FILTER_VALUES, n):
+                for due in (False, True):
+                    for order_by in ORDERS:
+                        filters = {name: FILTER_VALUES[name] for name in names}
+                        if due:
+                            filters["due_from"] = "01-01-2025"
+                        yield user_id, TaskFilters(**filters, order_by=order_by)
+
+
+async def test_every_accepted_task_query_has_an_index(monkeypatch):
+    captured = {}
+
+    async def fake_paginate(query, limit=None, cursor=None, order_by=()):
+        captured["query"], captured["order"] = query, list(order_by)
+        return {"items": [], "next_cursor": None}
+
+    monkeypatch.setattr(crud, "paginate", fake_paginate)
+    declared = _declared_indexes()
+    accepted = missing = 0
+    for user_id, filters in _shapes():
+        try:
+            await crud.query_tasks(filters, user_id=user_id, limit=10)
+        except HTTPException as e:
+            assert e.status_code == 400
+            continue
+        accepted += 1
+        equality = frozenset(
+            ".".join(parts) for parts, op, _ in captured["query"]._filters
+            if op in ("==", "array_contains")
+        )
+        for field, direction in captured["order"]:
+            # Solo igualdades, o un único campo: bastan los índices simples
+            if equality and (equality, field, direction) not in declared:
+                missing += 1
+                print("sin índice:", user_id, filters)
+    assert accepted > 100
+    assert missing == 0
+
+
+async def test_two_filters_with_order_are_rejected():
+    with pytest.raises(HTTPException) as exc:
+        await crud.query_tasks(TaskFilters(status="Pendiente", tag="x", order_by="title"))
+    assert exc.value.status_code == 400
+
+
+async def test_order_by_a_filtered_field_is_dropped():
+    await crud.create_task(crud.TaskCreate(title="a", due_date="01-01-2025", user_id="u1", status="Pendiente", priority="Alta"))
+    rows = await crud.query_tasks(TaskFilters(status="Pendiente", priority="Alta", order_by="status"), user_id="u1")
+    assert [r["title"] for r in rows] == ["a"]
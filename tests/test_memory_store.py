@@ -0,0 +1,133 @@
+import pytest
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import ArrayRemove, ArrayUnion, DELETE_FIELD, Increment
+
+import memory_store
+
+pytestmark = pytest.mark.anyio
+
+
+async def _seed(db):
+    docs = {
+        "a": {"user_id": "u1", "n": 3, "tags": ["x", "y"], "meta": {"k": 1}},
+        "b": {"user_id": "u1", "n": 1, "tags": ["y"]},
+        "c": {"user_id": "u2", "n": 2, "tags": []},
+        "d": {"user_id": "u1"},
+    }
+    for doc_id, data in docs.items():
+        await db.collection("items").document(doc_id).set(data)
+
+
+async def _ids(query):
+    return [doc.id async for doc in query.stream()]
+
+
+async def test_filters(db):
+    await _seed(db)
+    items = db.collection("items")
+    assert await _ids(items.where("user_id", "==", "u1")) == ["a", "b", "d"]
+    assert await _ids(items.where("user_id", "in", ["u2", "u3"])) == ["c"]
+    assert await _ids(items.where("tags", "array_contains", "y")) == ["a", "b"]
+    assert await _ids(items.where("n", ">=", 2)) == ["a", "c"]
+    assert await _ids(items.where("meta.k", "==", 1)) == ["a"]
+    # `!=` y los rangos no incluyen documentos sin el campo
+    assert await _ids(items.where("n", "!=", 1)) == ["a", "c"]
+
+
+async def test_order_limit_and_start_after(db):
+    await _seed(db)
+    query = db.collection("items").order_by("n", direction=memory_store.DESCENDING)
+    # Los documentos sin el campo de orden no aparecen, como en Firestore
+    assert await _ids(query) == ["a", "c", "b"]
+    assert await _ids(query.limit(2)) == ["a", "c"]
+    assert await _ids(query.start_after({"n": 3})) == ["c", "b"]
+
+
+async def test_indexes_follow_writes(db):
+    await _seed(db)
+    items = db.collection("items")
+    assert await _ids(items.where("user_id", "==", "u2")) == ["c"]
+    await items.document("a").update({"user_id": "u2"})
+    await items.document("c").delete()
+    assert await _ids(items.where("user_id", "==", "u2")) == ["a"]
+
+
+async def test_select_projects_fields(db):
+    await _seed(db)
+    docs = [doc async for doc in db.collection("items").where("user_id", "==", "u1").select(["n"]).stream()]
+    assert [d.to_dict() for d in docs] == [{"n": 3}, {"n": 1}, {}]
+
+
+async def test_transforms(db):
+    ref = db.collection("items").document("t")
+    await ref.set({"n": 1, "tags": ["x"], "gone": True})
+    await ref.update({"n": Increment(4), "tags": ArrayUnion(["x", "y"]), "gone": DELETE_FIELD})
+    assert (await ref.get()).to_dict() == {"n": 5, "tags": ["x", "y"]}
+    await ref.update({"tags": ArrayRemove(["x"])})
+    await ref.set({"counts": {"a": Increment(2)}}, merge=True)
+    await ref.set({"counts": {"a": Increment(3), "b": Increment(1)}}, merge=True)
+    assert (await ref.get()).to_dict() == {"n": 5, "tags": ["y"], "counts": {"a": 5, "b": 1}}
+
+
+async def test_write_preconditions(db):
+    items = db.collection("items")
+    with pytest.raises(NotFound):
+        await items.document("nope").update({"n": 1})
+    with pytest.raises(NotFound):
+        await items.document("nope").delete(option=db.write_option(exists=True))
+    await items.document("x").create({"n": 1})
+    with pytest.raises(AlreadyExists):
+        await items.document("x").create({"n": 2})
+
+
+async def test_batch_is_atomic(db):
+    items = db.collection("items")
+    await items.document("x").create({"n": 1})
+    batch = db.batch()
+    batch.set(items.document("y"), {"n": 2})
+    batch.create(items.document("x"), {"n": 3})
+    with pytest.raises(AlreadyExists):
+        await batch.commit()
+    assert not (await items.document("y").get()).exists
+    assert (await items.document("x").get()).to_dict() == {"n": 1}
+
+
+async def test_transaction_retries_on_conflict(db):
+    ref = db.collection("items").document("counter")
+    await ref.set({"n": 0})
+    attempts = []
+
+    @memory_store.transactional
+    async def bump(transaction):
+        snap = await ref.get(transaction=transaction)
+        attempts.append(1)
+        if len(attempts) == 1:
+            # Escritura concurrente entre la lectura y el commit
+            await ref.update({"n": Increment(10)})
+        transaction.update(ref, {"n": snap.to_dict()["n"] + 1})
+
+    await bump(db.transaction())
+    assert len(attempts) == 2
+    assert (await ref.get()).to_dict() == {"n": 11}
+
+
+async def test_stats_count_like_firestore(db):
+    await _seed(db)
+    db.reset_stats()
+    await _ids(db.collection("items").where("user_id", "==", "u1"))
+    await _ids(db.collection("items").where("user_id", "==", "nadie"))
+    # Una consulta vacía se factura como una lectura
+    assert db.stats["rpcs"] == 2
+    assert db.stats["reads"] == 4
+
+
+async def test_on_snapshot(db):
+    events = []
+    watch = db.collection("items").where("user_id", "==", "u1").on_snapshot(
+        lambda docs, changes, read_time: events.append([(c.type.name, c.document.id) for c in changes])
+    )
+    await db.collection("items").document("a").set({"user_id": "u1"})
+    await db.collection("items").document("a").update({"user_id": "u2"})
+    watch.unsubscribe()
+    await db.collection("items").document("b").set({"user_id": "u1"})
+    assert events == [[], [("ADDED", "a")], [("REMOVED", "a")]]
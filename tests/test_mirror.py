@@ -0,0 +1,59 @@
+import pytest
+
+import crud
+import mirror
+from models import TaskCreate, TaskUpdate, User
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def mirrored(monkeypatch):
+    monkeypatch.setattr(mirror, "MIRROR_ENABLED", True)
+    mirror.start()
+    yield mirror.mirrors
+    mirror.stop()
+    for m in mirror.mirrors.values():
+        m._docs.clear()
+        for index in m._index.values():
+            index.clear()
+
+
+def _lagging(m):
+    """Deja de aplicar cambios al espejo sin marcarlo como no listo (listener con retraso)."""
+    m._watch.unsubscribe()
+
+
+def _task(**fields) -> TaskCreate:
+    return TaskCreate(**{"title": "Tarea", "due_date": "15-03-2025", "user_id": "u1", **fields})
+
+
+async def test_listings_come_from_the_mirror(db, mirrored):
+    task = await crud.create_task(_task())
+    db.reset_stats()
+    assert [t["id"] for t in await crud.get_tasks_by_user("u1")] == [task["id"]]
+    assert db.stats["rpcs"] == 0
+
+
+async def test_lookup_by_id_sees_own_writes_before_the_listener(mirrored):
+    _lagging(mirrored["tareas"])
+    task = await crud.create_task(_task(title="Antes"))
+    assert (await crud.get_task_by_id(task["id"]))["title"] == "Antes"
+    await crud.update_task(task["id"], TaskUpdate(**{**task, "title": "Después"}))
+    assert (await crud.get_task_by_id(task["id"]))["title"] == "Después"
+
+    _lagging(mirrored["notes"])
+    note = await crud.create_note("u1", "Nota", "texto")
+    assert (await crud.get_note_by_id(note["id"]))["title"] == "Nota"
+
+    _lagging(mirrored["users"])
+    user = await crud.create_user(User(email="ana@example.com", password="secreto"))
+    assert (await crud.get_user_by_id(user["id"]))["email"] == "ana@example.com"
+
+
+async def test_other_workers_writes_invalidate_the_cache(db, mirrored):
+    task = await crud.create_task(_task(title="Antes"))
+    await crud.get_task_by_id(task["id"])
+    # Escritura hecha por otro worker: solo llega a través del listener
+    await db.collection("tareas").document(task["id"]).update({"title": "Después"})
+    assert (await crud.get_task_by_id(task["id"]))["title"] == "Después"
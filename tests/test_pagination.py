@@ -0,0 +1,47 @@
+import base64
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from pagination import DESCENDING, decode_cursor, encode_cursor, paginate
+
+pytestmark = pytest.mark.anyio
+
+
+def test_cursor_roundtrip():
+    values = ["abc", 3, None, datetime(2025, 3, 15, 10, 30)]
+    assert decode_cursor(encode_cursor(values)) == values
+
+
+@pytest.mark.parametrize("raw", [b"%%%", b"no es json", b'{"no": "es una lista"}'])
+def test_invalid_cursor_is_400(raw):
+    token = base64.urlsafe_b64encode(raw).decode().rstrip("=") if raw != b"%%%" else "%%%"
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(token)
+    assert exc.value.status_code == 400
+
+
+async def test_paginate_walks_every_document_once(db):
+    # Valores de orden repetidos: el id desempata sin saltar ni repetir
+    for i in range(7):
+        await db.collection("items").document(f"d{i}").set({"rank": i % 3})
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = await paginate(db.collection("items"), 3, cursor, [("rank", DESCENDING)])
+        seen += [item["id"] for item in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["d5", "d2", "d4", "d1", "d6", "d3", "d0"]
+    assert pages == 3
+
+
+async def test_cursor_from_other_order_is_rejected(db):
+    await db.collection("items").document("a").set({"rank": 1})
+    await db.collection("items").document("b").set({"rank": 2})
+    page = await paginate(db.collection("items"), 1)
+    with pytest.raises(HTTPException) as exc:
+        await paginate(db.collection("items"), 1, page["next_cursor"], [("rank", DESCENDING)])
+    assert exc.value.status_code == 400
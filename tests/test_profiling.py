@@ -0,0 +1,20 @@
+import pytest
+
+import profiling
+
+
+def test_request_profiles_do_not_overlap():
+    with profiling.RequestProfiler():
+        with pytest.raises(profiling.ProfilerBusy):
+            with profiling.RequestProfiler():
+                pass
+        # El muestreo comparte el mismo cerrojo
+        with pytest.raises(profiling.ProfilerBusy):
+            profiling.sample(0.01)
+    # Al salir se libera, también si la petición falla
+    with pytest.raises(ValueError):
+        with profiling.RequestProfiler():
+            raise ValueError
+    with profiling.RequestProfiler() as profiler:
+        sum(range(10))
+    assert "function calls" in profiler.summary()
@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+
+import crud
+import search
+from models import TaskCreate
+
+pytestmark = pytest.mark.anyio
+
+
+def test_tokenize_folds_accents_stopwords_and_plurals():
+    assert search.tokenize("Reuniones con el Cliente en Peñíscola") == ["reunion", "cliente", "peniscola"]
+    assert search.tokenize("tareas clases papeles") == ["tarea", "clase", "papel"]
+    assert search.tokenize(None) == []
+
+
+def _index(*docs):
+    index = search._UserIndex()
+    for kind, doc_id, title, body in docs:
+        index.put((kind, doc_id), {"title": title, "body": body})
+    return index
+
+
+def test_prefix_and_all_terms_must_match():
+    index = _index(
+        ("task", "t1", "Reunión semanal", "con el equipo de diseño"),
+        ("note", "n1", "Diseño", "ideas para la reunión"),
+        ("task", "t2", "Factura", "enviar al cliente"),
+    )
+    ids = lambda q, kinds=None: [r["id"] for r in index.search(search.tokenize(q), kinds, 10)]
+    assert sorted(ids("reun")) == ["n1", "t1"]
+    assert sorted(ids("reunion disen")) == ["n1", "t1"]
+    assert ids("reunion factura") == []
+    assert ids("reunion", kinds=["note"]) == ["n1"]
+
+
+def test_title_matches_rank_first():
+    index = _index(
+        ("note", "body", "Notas", "revisar el informe"),
+        ("note", "title", "Informe", "revisar"),
+    )
+    assert [r["id"] for r in index.search(["informe"], None, 10)] == ["title", "body"]
+
+
+async def test_index_follows_crud_writes():
+    task = await crud.create_task(TaskCreate(title="Llamar al cliente", due_date="15-03-2025", user_id="u1"))
+    assert [r["id"] for r in await crud.search_user_content("u1", "cliente")] == [task["id"]]
+
+    await crud.create_note("u1", "Presupuesto", "cliente nuevo")
+    assert len(await crud.search_user_content("u1", "cliente")) == 2
+
+    await crud.delete_task(task["id"])
+    hits = await crud.search_user_content("u1", "cliente")
+    assert [r["kind"] for r in hits] == ["note"]
+    assert await crud.search_user_content("u2", "cliente") == []
+
+
+async def _add_task(db, doc_id, title, user_id="u1"):
+    # Escritura hecha por "otro worker": va al almacén pero no a este índice
+    await db.collection("tareas").document(doc_id).set({"title": title, "description": "", "user_id": user_id})
+
+
+async def test_partitions_expire_so_other_workers_writes_show_up(db, monkeypatch):
+    monkeypatch.setattr(search, "PARTITION_TTL", 0.2)
+    worker_a, worker_b = search.SearchIndex(), search.SearchIndex()
+    await _add_task(db, "t1", "Informe mensual")
+    assert len(await worker_a.search("u1", "informe")) == 1
+
+    await _add_task(db, "t2", "Informe anual")
+    worker_b.index_record("task", "t2", {"title": "Informe anual", "user_id": "u1"})
+    assert len(await worker_a.search("u1", "informe")) == 1  # aún dentro del TTL
+
+    await asyncio.sleep(0.25)
+    assert len(await worker_a.search("u1", "informe")) == 2
+
+
+async def test_partitions_fed_by_the_mirror_do_not_expire(db, monkeypatch):
+    import mirror
+    monkeypatch.setattr(mirror, "MIRROR_ENABLED", True)
+    monkeypatch.setattr(search, "PARTITION_TTL", 0)
+    mirror.start()
+    try:
+        await _add_task(db, "t1", "Informe mensual")
+        assert len(await crud.search_user_content("u1", "informe")) == 1
+        db.reset_stats()
+        await _add_task(db, "t2", "Informe anual")  # otro worker; llega por el listener
+        assert len(await crud.search_user_content("u1", "informe")) == 2
+        assert db.stats["reads"] == 0
+    finally:
+        mirror.stop()
+        for m in mirror.mirrors.values():
+            m._docs.clear()
+            for index in m._index.values():
+                index.clear()
+
+
+async def test_writes_during_a_build_are_not_lost(db, monkeypatch):
+    await _add_task(db, "t1", "Informe mensual")
+    index = search.SearchIndex()
+    collection = search.database.collection
+
+    class Racing:
+        def __init__(self, name):
+            self.query = collection(name)
+        def where(self, *args):
+            self.query = self.query.where(*args)
+            return self
+        def select(self, fields):
+            self.query = self.query.select(fields)
+            return self
+        async def stream(self):
+            async for doc in self.query.stream():
+                yield doc
+            # Escrituras de este worker que la consulta ya no ve
+            index.index_record("task", "t2", {"title": "Informe anual", "user_id": "u1"})
+            index.index_record("task", "t1", {"title": "Factura"})
+
+    monkeypatch.setattr(search.database, "collection", Racing)
+    await index._build_user("u1")
+    monkeypatch.setattr(search.database, "collection", collection)
+    assert [r["id"] for r in await index.search("u1", "informe")] == ["t2"]
+    assert [r["id"] for r in await index.search("u1", "factura")] == ["t1"]
+
+
+async def test_snapshot_merges_workers_and_skips_expired_partitions(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(search, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(search, "SNAPSHOT_FILE", str(tmp_path / "index.json"))
+    await _add_task(db, "t1", "Informe", "u1")
+    await _add_task(db, "t2", "Factura", "u2")
+    worker_a, worker_b = search.SearchIndex(), search.SearchIndex()
+    await worker_a.search("u1", "informe")
+    await worker_b.search("u2", "factura")
+    worker_a.save()
+    worker_b.save()  # no pisa la partición de u1
+
+    fresh = search.SearchIndex()
+    assert fresh.load()
+    assert fresh.stats()["users"] == 2
+
+    monkeypatch.setattr(search, "PARTITION_TTL", 0)
+    assert not search.SearchIndex().load()
+
+
+async def test_search_survives_clear_during_build(db, monkeypatch):
+    await _add_task(db, "t1", "Informe mensual")
+    index = search.SearchIndex()
+    build = index._build_user
+
+    async def build_then_clear(user_id):
+        built = await build(user_id)
+        index.clear()  # p. ej. otra petición, o la partición caduca justo después
+        return built
+
+    monkeypatch.setattr(index, "_build_user", build_then_clear)
+    assert [r["id"] for r in await index.search("u1", "informe")] == ["t1"]
+
+
+async def test_snapshot_dir_is_private(db, monkeypatch, tmp_path):
+    target = tmp_path / "snapshots"
+    monkeypatch.setattr(search, "SNAPSHOT_DIR", str(target))
+    monkeypatch.setattr(search, "SNAPSHOT_FILE", str(target / "index.json"))
+    await _add_task(db, "t1", "Informe", "u1")
+    index = search.SearchIndex()
+    await index.search("u1", "informe")
+    index.save()
+    assert target.stat().st_mode & 0o777 == 0o700
+
+    # Una carpeta que ya existía con permisos abiertos se restringe
+    target.chmod(0o755)
+    index.save()
+    assert target.stat().st_mode & 0o777 == 0o700
@@ -0,0 +1,25 @@
+import security
+
+
+def test_hash_and_verify():
+    stored = security.hash_password("secreto")
+    assert security.is_hashed(stored)
+    assert stored != security.hash_password("secreto")  # sal aleatoria
+    assert security.verify_password("secreto", stored) == (True, False)
+    assert security.verify_password("otro", stored) == (False, False)
+
+
+def test_plaintext_passwords_verify_and_ask_for_rehash():
+    assert security.verify_password("secreto", "secreto") == (True, True)
+    assert security.verify_password("otro", "secreto") == (False, True)
+    assert security.verify_password("secreto", None) == (False, False)
+
+
+def test_old_parameters_ask_for_rehash(monkeypatch):
+    stored = security.hash_password("secreto")
+    monkeypatch.setattr(security, "SCRYPT_N", security.SCRYPT_N * 2)
+    assert security.verify_password("secreto", stored) == (True, True)
+
+
+def test_malformed_hash_does_not_verify():
+    assert security.verify_password("secreto", "scrypt$roto") == (False, False)